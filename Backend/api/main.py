@@ -2,7 +2,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import os
+from core.logging_config import configure_logging
+configure_logging()
+
 from api.routes import task, status
+from core.wrappers import shutdown_orchestration
+from core.state_manager import get_state_manager, close_state_manager
 
 # Lifespan handles startup and shutdown logic
 @asynccontextmanager
@@ -10,10 +16,19 @@ async def lifespan(app: FastAPI):
     # Startup logic
     print("Starting up the Agentic Assistant API...")
     # Add database connection initialization or model loading here
+    state_manager = get_state_manager()
+    # Tasks that were running when the previous process stopped can never finish.
+    # Off by default: with several workers sharing one task database, a starting worker
+    # would also fail tasks the others are still running. Enable only for a single worker.
+    if os.getenv("TASK_RECOVER_ON_STARTUP", "false").lower() == "true":
+        state_manager.recover_interrupted_tasks()
+    state_manager.start_reaper(float(os.getenv("TASK_REAPER_INTERVAL", "30")))
     yield  # Serve the application
     # Shutdown logic
     print("Shutting down the Agentic Assistant API...")
     # Add resource cleanup logic here
+    await shutdown_orchestration()
+    close_state_manager()
 
 # Create FastAPI instance with lifespan context
 app = FastAPI(
@@ -1,17 +1,20 @@
 """
 Assistant routes for processing text and voice commands.
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from pydantic import BaseModel
 from typing import Optional
 import logging
-import os
-import tempfile
 
 from tools.auth import Auth
+from core.intent_router import get_intent_router
+from core.audio_normalizer import AudioNormalizationError
+from core.transcription_pipeline import get_transcription_pipeline
+from core.audio_upload import (
+    SUPPORTED_FORMATS, MAX_UPLOAD_BYTES, MULTIPART_OVERHEAD_BYTES, AudioUpload, AudioUploadError,
+    MultipartAudioStream, detect_format, receive_audio
+)
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("assistant_routes")
 
 router = APIRouter()
@@ -32,25 +35,19 @@ async def process_command(
     """
     Process a text-based command from the user.
     """
-    logger.info(f"Processing command for user {current_user.get('email')}: {request.command}")
+    logger.info("Processing command for user %s: %s", current_user.get('email'), request.command)
     
     try:
         # Here you would integrate with your AI model (GPT-4, etc.)
         # For now, we'll return a simulated response
         
-        command_lower = request.command.lower()
-        
-        # Simple command processing
-        if "hello" in command_lower or "hi" in command_lower:
-            response_text = f"Hello {current_user.get('name')}! How can I assist you today?"
-        elif "weather" in command_lower:
-            response_text = "I can help you check the weather, but I need integration with a weather API first."
-        elif "order" in command_lower and "food" in command_lower:
-            response_text = "I can help you order food! Please specify what you'd like to order."
-        else:
+        # Known intents are answered from the shared intent table
+        match = get_intent_router().match(request.command)
+        response_text = match.render_response(user_name=current_user.get("name")) if match else None
+        if response_text is None:
             response_text = f"I received your command: '{request.command}'. I'm processing it now..."
         
-        logger.info(f"Command processed successfully for {current_user.get('email')}")
+        logger.info("Command processed successfully for %s", current_user.get('email'))
         
         return {
             "response": response_text,
@@ -58,48 +55,114 @@ async def process_command(
         }
     
     except Exception as e:
-        logger.error(f"Error processing command: {str(e)}")
+        logger.error("Error processing command: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to process command: {str(e)}")
 
-@router.post("/voice", response_model=CommandResponse)
+async def _respond_to_voice(upload: AudioUpload, current_user: dict) -> dict:
+    """
+    Transcribes a received voice upload and builds the assistant's reply.
+    """
+    try:
+        transcription = await get_transcription_pipeline().transcribe_async(upload.path, upload.format)
+    except AudioNormalizationError as e:
+        logger.warning("Could not decode voice upload: %s", e)
+        raise HTTPException(status_code=422, detail=f"Could not decode audio: {str(e)}")
+    
+    transcribed_text = transcription["text"]
+    logger.info("Voice command transcribed (%.1fs of speech): %s", transcription['speech_duration'], transcribed_text)
+    
+    # Process the transcribed command
+    if transcribed_text:
+        response_text = f"I heard: '{transcribed_text}'. I'm processing your request..."
+    else:
+        response_text = "I couldn't hear any speech in that recording. Please try again."
+    
+    return {
+        "response": response_text,
+        "status": "success"
+    }
+
+def _content_length(request: Request) -> Optional[int]:
+    content_length = request.headers.get("content-length")
+    return int(content_length) if content_length and content_length.isdigit() else None
+
+# The multipart body is parsed by hand, so describe the form for the OpenAPI docs
+VOICE_FORM_SCHEMA = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "required": ["audio"],
+    "properties": {"audio": {"type": "string", "format": "binary"}}
+}}}}}
+
+@router.post("/voice", response_model=CommandResponse, openapi_extra=VOICE_FORM_SCHEMA)
 async def process_voice_command(
-    audio: UploadFile = File(...),
+    request: Request,
     current_user: dict = Depends(Auth.get_current_user)
 ):
     """
     Process a voice command from the user.
-    Accepts an audio file and transcribes it to text.
+    Accepts an audio file (form field "audio") and transcribes it to text. The
+    multipart body is parsed as it arrives and the file is written to disk in a
+    single pass, so oversized or overlong audio is rejected early.
     """
-    logger.info(f"Processing voice command for user {current_user.get('email')}")
+    logger.info("Processing voice command for user %s", current_user.get('email'))
     
     try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-            content = await audio.read()
-            temp_audio.write(content)
-            temp_audio_path = temp_audio.name
-        
-        try:
-            # Here you would integrate with speech-to-text service (Whisper, etc.)
-            # For now, we'll return a simulated response
-            
-            transcribed_text = "This is a simulated transcription of your voice command"
-            
-            logger.info(f"Voice command transcribed: {transcribed_text}")
-            
-            # Process the transcribed command
-            response_text = f"I heard: '{transcribed_text}'. I'm processing your request..."
-            
-            return {
-                "response": response_text,
-                "status": "success"
-            }
-        
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_audio_path):
-                os.unlink(temp_audio_path)
+        content_length = _content_length(request)
+        if content_length is not None and content_length > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+            raise AudioUploadError(f"Audio upload exceeds {MAX_UPLOAD_BYTES} bytes", status_code=413)
+        form = MultipartAudioStream(request.stream(), request.headers.get("content-type"), field_name="audio")
+        await form.start()
+        audio_format = detect_format(form.filename, form.content_type, default="wav")
+        upload = await receive_audio(form.chunks(), audio_format)
+    except AudioUploadError as e:
+        logger.warning("Voice upload rejected: %s", e)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    try:
+        return await _respond_to_voice(upload, current_user)
+    
+    except HTTPException:
+        raise
     
     except Exception as e:
-        logger.error(f"Error processing voice command: {str(e)}")
+        logger.error("Error processing voice command: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to process voice command: {str(e)}")
+    
+    finally:
+        # Clean up temporary file
+        upload.cleanup()
+
+@router.post("/voice/stream", response_model=CommandResponse)
+async def process_voice_stream(
+    request: Request,
+    requested_format: Optional[str] = Query(None, alias="format"),
+    current_user: dict = Depends(Auth.get_current_user)
+):
+    """
+    Process a voice command sent as the raw request body (e.g. Content-Type: audio/wav).
+    The body is streamed to disk as it arrives, so oversized or overlong audio is
+    rejected without receiving the rest of it.
+    """
+    logger.info("Processing streamed voice command for user %s", current_user.get('email'))
+    
+    try:
+        audio_format = requested_format.lower() if requested_format else detect_format(content_type=request.headers.get("content-type"))
+        if audio_format not in SUPPORTED_FORMATS:
+            raise AudioUploadError(f"Unsupported audio format: {audio_format}", status_code=415)
+        upload = await receive_audio(request.stream(), audio_format, content_length=_content_length(request))
+    except AudioUploadError as e:
+        logger.warning("Voice upload rejected: %s", e)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    try:
+        return await _respond_to_voice(upload, current_user)
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        logger.error("Error processing voice command: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to process voice command: {str(e)}")
+    
+    finally:
+        upload.cleanup()
@@ -3,21 +3,19 @@ Authentication routes for user login, registration, and token validation.
 """
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Optional, Tuple
 from datetime import timedelta
+import asyncio
 import logging
 
-from tools.auth import Auth
+from tools.auth import Auth, oauth2_scheme
+from tools.password_hasher import get_password_hasher, HasherOverloadedError
+from core.user_store import get_user_store, UserExistsError
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("auth_routes")
 
 router = APIRouter()
 
-# In-memory user storage (replace with database in production)
-users_db = {}
-
 # Request/Response Models
 class UserRegister(BaseModel):
     name: str
@@ -36,39 +34,50 @@ class ValidationResponse(BaseModel):
     valid: bool
     user: Optional[dict] = None
 
-# Password hashing utility
-from passlib.context import CryptContext
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
+# Password hashing runs in a process pool so bcrypt never blocks the event loop
+async def hash_password(password: str) -> str:
     """Hash a password for storing."""
-    return pwd_context.hash(password)
+    try:
+        return await get_password_hasher().hash(password)
+    except HasherOverloadedError as e:
+        raise HTTPException(status_code=503, detail="Server busy, please retry",
+                            headers={"Retry-After": str(e.retry_after)})
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a stored password against one provided by user."""
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a stored password against one provided by user.
+    Also returns a replacement hash if the stored one uses an outdated cost factor.
+    """
+    try:
+        return await get_password_hasher().verify(plain_password, hashed_password)
+    except HasherOverloadedError as e:
+        raise HTTPException(status_code=503, detail="Server busy, please retry",
+                            headers={"Retry-After": str(e.retry_after)})
 
 @router.post("/register", status_code=201)
 async def register_user(user_data: UserRegister):
     """
     Register a new user with name, email, and password.
     """
-    logger.info(f"Registration attempt for email: {user_data.email}")
+    logger.info("Registration attempt for email: %s", user_data.email)
     
-    # Check if user already exists
-    if user_data.email in users_db:
-        logger.warning(f"Registration failed: Email {user_data.email} already exists")
+    user_store = get_user_store()
+
+    # Check if user already exists (cheap indexed lookup before paying for a hash)
+    if await user_store.get_by_email_async(user_data.email) is not None:
+        logger.warning("Registration failed: Email %s already exists", user_data.email)
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash the password and store user
-    hashed_password = hash_password(user_data.password)
-    users_db[user_data.email] = {
-        "name": user_data.name,
-        "email": user_data.email,
-        "password": hashed_password
-    }
+    hashed_password = await hash_password(user_data.password)
+    try:
+        await user_store.create_async(user_data.name, user_data.email, hashed_password)
+    except UserExistsError:
+        # Registered concurrently by another request or worker
+        logger.warning("Registration failed: Email %s already exists", user_data.email)
+        raise HTTPException(status_code=400, detail="Email already registered")
     
-    logger.info(f"User registered successfully: {user_data.email}")
+    logger.info("User registered successfully: %s", user_data.email)
     return {
         "message": "User registered successfully",
         "user": {
@@ -82,27 +91,31 @@ async def login_user(credentials: UserLogin):
     """
     Authenticate user and return JWT token.
     """
-    logger.info(f"Login attempt for email: {credentials.email}")
+    logger.info("Login attempt for email: %s", credentials.email)
     
     # Check if user exists
-    user = users_db.get(credentials.email)
+    user_store = get_user_store()
+    user = await user_store.get_by_email_async(credentials.email)
     if not user:
-        logger.warning(f"Login failed: User {credentials.email} not found")
+        logger.warning("Login failed: User %s not found", credentials.email)
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify password
-    if not verify_password(credentials.password, user["password"]):
-        logger.warning(f"Login failed: Invalid password for {credentials.email}")
+    verified, new_hash = await verify_password(credentials.password, user["password"])
+    if not verified:
+        logger.warning("Login failed: Invalid password for %s", credentials.email)
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        await user_store.update_password_async(user["email"], new_hash)
     
     # Create access token
-    token_data = {"email": user["email"], "name": user["name"]}
+    token_data = {"email": user["email"], "name": user["name"], "user_id": user["user_id"]}
     access_token = Auth.create_access_token(
         data=token_data,
         expires_delta=timedelta(hours=24)
     )
     
-    logger.info(f"User logged in successfully: {credentials.email}")
+    logger.info("User logged in successfully: %s", credentials.email)
     return {
         "token": access_token,
         "user": {
@@ -116,12 +129,12 @@ async def validate_token(current_user: dict = Depends(Auth.get_current_user)):
     """
     Validate JWT token and return user information.
     """
-    logger.info(f"Token validation for user: {current_user.get('email')}")
+    logger.debug("Token validation for user: %s", current_user.get('email'))
     
     # Check if user still exists
     email = current_user.get("email")
-    if email not in users_db:
-        logger.warning(f"Token validation failed: User {email} not found")
+    if await get_user_store().get_by_email_async(email) is None:
+        logger.warning("Token validation failed: User %s not found", email)
         raise HTTPException(status_code=401, detail="User not found")
     
     return {
@@ -131,3 +144,19 @@ async def validate_token(current_user: dict = Depends(Auth.get_current_user)):
             "email": current_user.get("email")
         }
     }
+
+
+@router.post("/logout")
+async def logout_user(all_sessions: bool = False, token: str = Depends(oauth2_scheme)):
+    """
+    Revoke the presented JWT token, or every token of its user when `all_sessions` is set.
+    """
+    current_user = Auth.verify_access_token(token)
+    # Revocations are written to the shared store, so keep that I/O off the event loop
+    if all_sessions:
+        await asyncio.to_thread(Auth.revoke_user_tokens, current_user.get("email"))
+    else:
+        await asyncio.to_thread(Auth.revoke_token, token)
+
+    logger.info("User logged out: %s", current_user.get('email'))
+    return {"message": "Logged out successfully"}
@@ -1,65 +1,247 @@
 # Endpoint for querying task states
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 
-# Assuming the same task_db from task.py
-from api.routes.task import task_db
+from core.state_manager import get_state_manager
+from core.metrics import registry
+from core.circuit_breaker import tool_guard_stats
+from core.retry_mechanism import get_retry_budget
+from core.logging_config import logging_stats
+from core.transcription_pipeline import transcription_status, transcription_stats
+from core.wrappers import planner_status, coalescing_stats, plan_cache
+from tools.password_hasher import get_password_hasher
+from tools.http_pool import http_pool_metrics
+from tools.zomato_wrapper import response_cache_stats
 
 router = APIRouter()
 
 # Define response models
-class AllTasksResponse(BaseModel):
-    task_id: str  # Unique ID for the task
-    status: str  # Current status of the task
-    details: Optional[Dict] = None  # Optional additional details
+class TaskPageResponse(BaseModel):
+    tasks: List[Dict[str, Any]]  # Tasks in this page, newest first, with the requested fields
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page; None on the last page
 
 class HealthStatusResponse(BaseModel):
     service: str  # Name of the service
     status: str  # Overall status (e.g., "healthy", "degraded", "down")
     version: str  # API version
     tasks_in_progress: int  # Number of in-progress tasks
+    task_counts: Dict[str, int]  # Number of tasks per status, as of the last store flush
+    task_counts_pending_writes: int  # Buffered task writes not yet reflected in task_counts
+    dependencies: Dict[str, Any]  # Tool breakers, queue depths, ASR and planner availability
 
-@router.get("/tasks", response_model=List[AllTasksResponse])
-async def list_all_tasks():
+# Fields a listing can project; those not stored as columns require the task payload
+TASK_FIELDS = ("task_id", "status", "user_id", "created_at", "updated_at", "data", "details", "trace")
+PAYLOAD_FIELDS = {"user_id", "data", "details", "trace"}
+DEFAULT_TASK_FIELDS = "task_id,status,details"
+MAX_PAGE_SIZE = 500
+
+def _parse_fields(fields: str) -> List[str]:
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in TASK_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}; choose from {list(TASK_FIELDS)}")
+    return selected
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Task timestamps are naive UTC; aware query parameters are converted to match."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _project(record: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    task = {}
+    for name in fields:
+        if name == "user_id":
+            value = (record.get("data") or {}).get("user_id")
+        else:
+            value = record.get(name)
+        task[name] = value.isoformat() if isinstance(value, datetime) else value
+    return task
+
+# A plain function so FastAPI runs it in the threadpool: queries may flush and read SQLite
+@router.get("/tasks", response_model=TaskPageResponse)
+def list_all_tasks(
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    fields: str = DEFAULT_TASK_FIELDS,
+    output_format: str = Query("json", alias="format", pattern="^(json|ndjson)$")
+):
     """
-    Endpoint to list all submitted tasks and their statuses.
-    Returns an array of task information for monitoring.
+    Endpoint to list submitted tasks, newest first, for monitoring.
+    Results are paginated with an opaque cursor and can be filtered by status, user
+    and creation time. `fields` selects the returned fields (e.g. "task_id,status" to
+    skip details). With format=ndjson every matching task is streamed, one JSON object
+    per line, ignoring `limit` and `cursor`.
     """
-    task_list = [
-        {
-            "task_id": task_id,
-            "status": task_data["status"],
-            "details": task_data["details"]
-        }
-        for task_id, task_data in task_db.items()
-    ]
+    selected = _parse_fields(fields)
+    filters = {
+        "status": status,
+        "user_id": user_id,
+        "created_after": _naive_utc(created_after),
+        "created_before": _naive_utc(created_before),
+        "with_payload": bool(PAYLOAD_FIELDS.intersection(selected))
+    }
+    state_manager = get_state_manager()
+
+    if output_format == "ndjson":
+        def export():
+            for record in state_manager.iter_tasks(page_size=MAX_PAGE_SIZE, **filters):
+                yield json.dumps(_project(record, selected), default=str) + "\n"
+        return StreamingResponse(export(), media_type="application/x-ndjson")
 
-    return task_list
+    try:
+        records, next_cursor = state_manager.query_tasks(limit=limit, cursor=cursor, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"tasks": [_project(record, selected) for record in records], "next_cursor": next_cursor}
 
 @router.get("/health", response_model=HealthStatusResponse)
 async def health_check():
     """
     Endpoint to check the health of the system.
-    Useful for monitoring and ensuring the service is operational.
+    Useful for monitoring and ensuring the service is operational. Everything reported
+    is read from counters and state kept by the components themselves, so a probe
+    does no I/O and does not scan the task store.
     """
-    tasks_in_progress = sum(1 for task in task_db.values() if task["status"] == "in_progress")
+    state_manager = get_state_manager()
+    task_counts = state_manager.count_tasks()
+    breakers = {tool: stats["breaker"]["state"] for tool, stats in tool_guard_stats().items()}
+    hasher = get_password_hasher().metrics()
+    asr = transcription_status()
 
+    # Open breakers or an ASR backend that failed to load mean part of the API is failing fast
+    degraded = any(state == "open" for state in breakers.values()) or not asr["ready"]
     return {
         "service": "Agentic Assistant API",
-        "status": "healthy",
+        "status": "degraded" if degraded else "healthy",
         "version": "1.0.0",
-        "tasks_in_progress": tasks_in_progress
+        "tasks_in_progress": task_counts.get("in_progress", 0),
+        "task_counts": task_counts,
+        "task_counts_pending_writes": state_manager.pending_writes(),
+        "dependencies": {
+            "tool_breakers": breakers,
+            "queues": {
+                "password_hashing": hasher["queue_depth"],
+                "logging": logging_stats()["queued"]
+            },
+            "asr": asr,
+            "planner": planner_status()
+        }
     }
 
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+def _collect_dependency_metrics():
+    """
+    Refreshes gauges that mirror state owned by other components, just before a scrape.
+    Components that have not been created yet are skipped rather than built.
+    """
+    breaker_state = registry.gauge("assistant_circuit_breaker_state",
+                                   "Circuit breaker state per tool (0 closed, 1 half-open, 2 open).", ("tool",))
+    bulkhead_active = registry.gauge("assistant_bulkhead_active_calls", "Calls in flight per tool.", ("tool",))
+    for tool, stats in tool_guard_stats().items():
+        breaker_state.set(BREAKER_STATE_VALUES[stats["breaker"]["state"]], tool=tool)
+        bulkhead_active.set(stats["bulkhead"]["active"], tool=tool)
+
+    registry.gauge("assistant_retry_budget_tokens", "Retries currently allowed by the retry budget.").set(
+        get_retry_budget().stats()["tokens"])
+
+    hasher = get_password_hasher().metrics()
+    registry.gauge("assistant_password_hash_queue_depth", "Password hashes waiting or running.").set(
+        hasher["queue_depth"])
+
+    flight_calls = registry.gauge("assistant_single_flight_calls",
+                                  "Calls per coalescing group by kind (calls, executions, coalesced).",
+                                  ("flight", "kind"))
+    flight_in_flight = registry.gauge("assistant_single_flight_in_flight",
+                                      "Distinct calls currently executing per coalescing group.", ("flight",))
+    for flight, stats in coalescing_stats().items():
+        for kind in ("calls", "executions", "coalesced"):
+            flight_calls.set(stats[kind], flight=flight, kind=kind)
+        flight_in_flight.set(stats["in_flight"], flight=flight)
+
+    http_requests = registry.gauge("assistant_http_pool_requests",
+                                   "Outbound HTTP requests per host by outcome (sent, error).", ("host", "outcome"))
+    http_in_flight = registry.gauge("assistant_http_pool_in_flight", "Outbound HTTP requests in flight per host.",
+                                    ("host",))
+    http_opened = registry.gauge("assistant_http_pool_connections_opened",
+                                 "TCP connections opened by the sync pools per host.", ("host",))
+    pool = http_pool_metrics()
+    for host, stats in (pool["hosts"] if pool is not None else {}).items():
+        if "requests" in stats:
+            http_requests.set(stats["requests"], host=host, outcome="sent")
+            http_requests.set(stats["errors"], host=host, outcome="error")
+            http_in_flight.set(stats["in_flight"], host=host)
+        if "connections_opened" in stats:
+            http_opened.set(stats["connections_opened"], host=host)
+
+    cache_lookups = registry.gauge("assistant_cache_lookups",
+                                   "Cache lookups by result (hit, similar_hit, miss).", ("cache", "result"))
+    cache_entries = registry.gauge("assistant_cache_entries", "Entries held per cache.", ("cache",))
+    cache_evictions = registry.gauge("assistant_cache_evictions", "Entries evicted for space per cache.", ("cache",))
+    cache_bytes = registry.gauge("assistant_cache_bytes", "Bytes held per cache.", ("cache",))
+
+    tool_cache = response_cache_stats()
+    if tool_cache is not None:
+        cache_lookups.set(tool_cache["hits"], cache="tool", result="hit")
+        cache_lookups.set(tool_cache["misses"], cache="tool", result="miss")
+        cache_entries.set(tool_cache["entries"], cache="tool")
+        cache_evictions.set(tool_cache["evictions"], cache="tool")
+        cache_bytes.set(tool_cache["bytes"], cache="tool")
+
+    plans = plan_cache.stats()
+    cache_lookups.set(plans["exact_hits"], cache="plan", result="hit")
+    cache_lookups.set(plans["similar_hits"], cache="plan", result="similar_hit")
+    cache_lookups.set(plans["misses"], cache="plan", result="miss")
+    cache_entries.set(plans["entries"], cache="plan")
+
+    asr = transcription_stats()
+    if asr["cache"] is not None:
+        cache_lookups.set(asr["cache"]["hits"], cache="transcription", result="hit")
+        cache_lookups.set(asr["cache"]["misses"], cache="transcription", result="miss")
+        cache_entries.set(asr["cache"]["entries"], cache="transcription")
+        cache_evictions.set(asr["cache"]["evictions"], cache="transcription")
+        cache_bytes.set(asr["cache"]["bytes"], cache="transcription")
+    if asr["batcher"] is not None:
+        registry.gauge("assistant_asr_batches", "Batches dispatched by the ASR batcher.").set(asr["batcher"]["batches"])
+        registry.gauge("assistant_asr_batch_items", "Requests dispatched by the ASR batcher.").set(
+            asr["batcher"]["items"])
+        registry.gauge("assistant_asr_batch_queue_depth", "Requests waiting for an ASR batch.").set(
+            asr["batcher"]["queued"])
+
+# A plain function so FastAPI runs it in the threadpool: collection reads every component's stats
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Endpoint exposing latency histograms, counters and gauges in the Prometheus text format.
+    """
+    _collect_dependency_metrics()
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/metrics/latency")
+async def latency_summary():
+    """
+    Endpoint returning count, mean and estimated p50/p95/p99 for every latency histogram.
+    """
+    return registry.latency_summary()
+
 @router.delete("/tasks/{task_id}", status_code=204)
 async def delete_task(task_id: str):
     """
     Endpoint to delete a task from the system.
     In production, this might soft-delete or archive the task.
     """
-    if task_id in task_db:
-        del task_db[task_id]
+    try:
+        await asyncio.to_thread(get_state_manager().delete_task, task_id)
         return  # HTTP 204 No Content
-    else:
+    except KeyError:
         raise HTTPException(status_code=404, detail="Task not found")
\ No newline at end of file
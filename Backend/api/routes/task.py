@@ -1,10 +1,18 @@
 # Endpoint for submitting tasks
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import asyncio
+import json
+import os
+import time
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, AsyncIterator, Dict, Set, Any
 
 # Import wrapper functions instead of direct imports
-from core.wrappers import process_task, orchestrate_task
+from core.wrappers import process_task_async, orchestrate_task_async
+from core.task_events import task_event_bus, TERMINAL_EVENTS
+from core.state_manager import get_state_manager
+from core.tracing import get_tracer, current_span, Trace
 
 router = APIRouter()
 
@@ -19,47 +27,88 @@ class TaskResponse(BaseModel):
     status: str  # Current status of the task
     details: Optional[Dict] = None  # Optional info about task processing steps or results
 
-# In-memory task queue or database replacement for development
-task_db = {}
+# Strong references to in-flight orchestration jobs so they are not garbage collected
+_background_jobs: Set[asyncio.Task] = set()
+
+# Traces of tasks still running, so their partial span tree can be inspected
+_active_traces: Dict[str, Trace] = {}
+
+# Seconds between SSE keep-alive comments while a task is idle
+SSE_KEEPALIVE_SECONDS = 15
+
+# Seconds between state checks when following a task that runs in another worker
+TASK_EVENTS_POLL_SECONDS = float(os.getenv("TASK_EVENTS_POLL_SECONDS", "1.0"))
 
 @router.post("/", response_model=TaskResponse)
-async def create_task(task_request: TaskRequest, background_tasks: BackgroundTasks):
+async def create_task(task_request: TaskRequest):
     """
     Endpoint to submit a high-level task.
     1. Translates the human-readable task into actionable subtasks using the task planner.
     2. Orchestrates steps, sends requests to APIs, and processes responses.
     """
 
-    # Sample unique ID generation for task (you can replace this with UUIDs)
-    task_id = f"task_{len(task_db) + 1}"
+    state_manager = get_state_manager()
 
-    # Add task to task_db with initial status
-    task_db[task_id] = {
-        "task": task_request.task,
-        "status": "in_progress",
-        "details": None
-    }
+    # Persist the task with its initial status
+    task_id = await asyncio.to_thread(
+        state_manager.create_task,
+        {"task": task_request.task, "user_id": task_request.user_id},
+        status="in_progress"
+    )
+    task_event_bus.register(task_id)
+
+    # Process task on the event loop; planner and tool calls are awaited, not run on threads
+    async def process_and_orchestrate():
+        tracer = get_tracer()
+        with tracer.start_trace("task", task_id=task_id) as trace:
+            if trace is not None:
+                _active_traces[task_id] = trace
+            await run_task(tracer)
+        if trace is not None:
+            # Keep serving the live trace until the finished tree is stored
+            try:
+                await asyncio.to_thread(state_manager.set_task_trace, task_id, trace.to_dict())
+            except KeyError:
+                pass  # Task was deleted while it was running
+            finally:
+                _active_traces.pop(task_id, None)
 
-    # Process task in the background to avoid blocking the API response
-    def process_and_orchestrate():
+    async def run_task(tracer):
         try:
             # Step 1: Break down the task using the task planner
-            subtasks = process_task(task_request.task)
+            with tracer.span("plan") as span:
+                subtasks = await process_task_async(task_request.task)
+                if span is not None:
+                    span.set_attribute("subtasks", len(subtasks))
+            task_event_bus.publish(task_id, "planned", {"subtasks": subtasks})
 
             # Step 2: Execute tasks dynamically using the orchestrator
-            results = orchestrate_task(subtasks)
+            with tracer.span("orchestrate"):
+                results = await orchestrate_task_async(
+                    subtasks,
+                    on_event=lambda event_type, data: task_event_bus.publish(task_id, event_type, data)
+                )
 
             # Update task status and details
-            task_db[task_id]["status"] = "completed"
-            task_db[task_id]["details"] = results
+            await asyncio.to_thread(state_manager.update_task_status, task_id, "completed", results)
+            task_event_bus.publish(task_id, "completed", {"details": results})
 
         except Exception as e:
-            # Handle exceptions and mark the task as failed
-            task_db[task_id]["status"] = "failed"
-            task_db[task_id]["details"] = {"error": str(e)}
+            # Handle exceptions and mark the task (and its root span) as failed
+            details = {"error": str(e)}
+            span = current_span()
+            if span is not None:
+                span.set_error(f"{type(e).__name__}: {e}")
+            try:
+                await asyncio.to_thread(state_manager.update_task_status, task_id, "failed", details)
+            except KeyError:
+                pass  # Task was deleted while it was running
+            task_event_bus.publish(task_id, "failed", {"details": details})
 
-    # Assign the background processing task
-    background_tasks.add_task(process_and_orchestrate)
+    # Schedule the processing job without waiting for it
+    job = asyncio.create_task(process_and_orchestrate())
+    _background_jobs.add(job)
+    job.add_done_callback(_background_jobs.discard)
 
     # Return the initial response to user
     return {
@@ -68,13 +117,22 @@ async def create_task(task_request: TaskRequest, background_tasks: BackgroundTas
         "details": None
     }
 
+def _load_task(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the stored task state, or None if the task does not exist.
+    """
+    try:
+        return get_state_manager().get_task(task_id)
+    except KeyError:
+        return None
+
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task_status(task_id: str):
     """
     Endpoint to check the status of a submitted task.
     Retrieves the current state of task execution and provides feedback.
     """
-    task = task_db.get(task_id)
+    task = await asyncio.to_thread(_load_task, task_id)
 
     if not task:
         # Return error if task is not found
@@ -85,4 +143,128 @@ async def get_task_status(task_id: str):
         "task_id": task_id,
         "status": task["status"],
         "details": task["details"]
-    }
\ No newline at end of file
+    }
+
+@router.get("/{task_id}/trace")
+async def get_task_trace(task_id: str):
+    """
+    Endpoint returning the span tree recorded for a task: planning, each subtask,
+    each retry attempt and each upstream HTTP call, with their durations.
+    For a running task the spans finished so far are returned.
+    """
+    active = _active_traces.get(task_id)
+    if active is not None:
+        return {"task_id": task_id, "complete": False, **active.to_dict()}
+
+    task = await asyncio.to_thread(_load_task, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if not task.get("trace"):
+        raise HTTPException(status_code=404, detail="No trace recorded for this task")
+    return {"task_id": task_id, "complete": True, **task["trace"]}
+
+def _snapshot_event(task_id: str, task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builds a terminal event from stored state for tasks whose event history has expired.
+    """
+    return {"task_id": task_id, "seq": 0, "type": task["status"], "data": {"details": task["details"]}}
+
+async def _poll_task_events(task_id: str, task: Dict[str, Any]) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Follows a task whose events are not published in this process (it runs in
+    another worker, or its history has expired) by polling the state manager.
+    Yields a "status" event whenever the stored status changes, None after each
+    poll without a change, and ends with a terminal snapshot event.
+    """
+    status = task["status"]
+    while status not in TERMINAL_EVENTS:
+        await asyncio.sleep(TASK_EVENTS_POLL_SECONDS)
+        task = await asyncio.to_thread(_load_task, task_id)
+        if task is None:
+            yield {"task_id": task_id, "seq": 0, "type": "disconnected", "data": {"reason": "task deleted"}}
+            return
+        if task["status"] == status:
+            yield None
+            continue
+        status = task["status"]
+        if status not in TERMINAL_EVENTS:
+            yield {"task_id": task_id, "seq": 0, "type": "status", "data": {"status": status}}
+    yield _snapshot_event(task_id, task)
+
+@router.get("/{task_id}/events")
+async def stream_task_events(task_id: str):
+    """
+    Streams task progress as Server-Sent Events until the task completes or fails.
+    Events already emitted are replayed first, so clients may connect at any time.
+    Tasks running in another worker are followed by polling their stored status,
+    so only status changes and the final result are streamed for them.
+    """
+    task = await asyncio.to_thread(_load_task, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    def format_sse(event: Dict[str, Any]) -> str:
+        return f"id: {event.get('seq', 0)}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    async def event_stream():
+        if not task_event_bus.is_local(task_id):
+            last_sent = time.monotonic()
+            async for event in _poll_task_events(task_id, task):
+                if event is not None:
+                    yield format_sse(event)
+                elif time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                else:
+                    continue
+                last_sent = time.monotonic()
+            return
+
+        subscription = task_event_bus.subscribe(task_id)
+        try:
+            while True:
+                event = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+                if event["type"] in TERMINAL_EVENTS or event["type"] == "disconnected":
+                    return
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/{task_id}/ws")
+async def task_events_websocket(websocket: WebSocket, task_id: str):
+    """
+    WebSocket variant of the task event stream; sends each event as a JSON message.
+    """
+    task = await asyncio.to_thread(_load_task, task_id)
+    if not task:
+        await websocket.close(code=4404, reason="Task not found")
+        return
+
+    await websocket.accept()
+    if not task_event_bus.is_local(task_id):
+        try:
+            async for event in _poll_task_events(task_id, task):
+                if event is not None:
+                    await websocket.send_text(json.dumps(event, default=str))
+            await websocket.close()
+        except WebSocketDisconnect:
+            pass
+        return
+
+    subscription = task_event_bus.subscribe(task_id)
+    try:
+        async for event in subscription:
+            await websocket.send_text(json.dumps(event, default=str))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
@@ -2,24 +2,58 @@
 Main entry point for the FastAPI Assistant Application.
 Starts the backend server for the Assistant App.
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import os
+import re
+import time
 import uvicorn
 
+# Logging is configured before anything else is imported, so import-time messages go through it
+from core.logging_config import configure_logging
+configure_logging()
+
 # Import routers
 from api.routes import task, status
 from api.routes.auth import router as auth_router
 from api.routes.assistant import router as assistant_router
+from core.wrappers import shutdown_orchestration
+from core.state_manager import get_state_manager, close_state_manager
+from tools.password_hasher import shutdown_password_hasher
+from core.user_store import close_user_store
+from tools.auth import start_revocation_sync, stop_revocation_sync
+from core.transcription_pipeline import warm_up_transcription_pipeline, close_transcription_pipeline
+from core.metrics import HTTP_REQUEST_DURATION
+from core.tracing import close_tracer
 
 # Lifespan handles startup and shutdown logic
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
     print("Starting up the Assistant API...")
+    state_manager = get_state_manager()
+    # Tasks that were running when the previous process stopped can never finish.
+    # Off by default: with several workers sharing one task database, a starting worker
+    # would also fail tasks the others are still running. Enable only for a single worker.
+    if os.getenv("TASK_RECOVER_ON_STARTUP", "false").lower() == "true":
+        state_manager.recover_interrupted_tasks()
+    state_manager.start_reaper(float(os.getenv("TASK_REAPER_INTERVAL", "30")))
+    # Logouts on other workers are replayed into this worker's token cache
+    start_revocation_sync()
+    # Load an on-device ASR model once, off the event loop
+    await asyncio.to_thread(warm_up_transcription_pipeline)
     yield  # Serve the application
     # Shutdown logic
     print("Shutting down the Assistant API...")
+    await shutdown_orchestration()
+    close_state_manager()
+    shutdown_password_hasher()
+    stop_revocation_sync()
+    close_user_store()
+    close_transcription_pipeline()
+    close_tracer()
 
 # Create FastAPI instance with lifespan context
 app = FastAPI(
@@ -38,6 +72,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_PATH_PARAM = re.compile(r"\{(\w+)(?::\w+)?\}")
+
+def _route_template(request: Request) -> str:
+    """
+    Returns the full route template of a request (e.g. "/tasks/{task_id}"), keeping
+    metric labels bounded. Matched routes may report their path relative to the
+    router prefix, so the prefix is recovered from the concrete request path.
+    """
+    route = request.scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    params = request.scope.get("path_params", {})
+    concrete = _PATH_PARAM.sub(lambda match: str(params.get(match.group(1), match.group(0))), template)
+    path = request.url.path
+    if concrete and path.endswith(concrete):
+        return path[:len(path) - len(concrete)] + template
+    return template
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """
+    Records the latency of every request, labelled by route template rather than raw path.
+    """
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=_route_template(request),
+            status=status_code
+        )
+
 # Include API routes
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(assistant_router, prefix="/assistant", tags=["Assistant"])
@@ -0,0 +1,224 @@
+# Audio normalization for speech recognition
+# Decodes an audio file once, downmixes to mono and resamples to the ASR target
+# rate in memory, and reports the duration from the same pass.
+import io
+import mmap
+import os
+import shutil
+import subprocess
+import wave
+import logging
+from typing import Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger("audio_normalizer")
+
+ASR_SAMPLE_RATE = int(os.getenv("ASR_SAMPLE_RATE", "16000"))
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+# Taps of the anti-aliasing filter applied before downsampling
+_LOWPASS_TAPS = 63
+
+AudioSource = Union[str, bytes, bytearray, memoryview, mmap.mmap]
+
+class AudioNormalizationError(Exception):
+    """Raised when audio cannot be decoded or normalized."""
+    pass
+
+class NormalizedAudio:
+    """
+    Mono float32 samples in [-1, 1] at `sample_rate`, plus metadata about the source.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int, source_format: str,
+                 source_sample_rate: int, source_channels: int):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.source_format = source_format
+        self.source_sample_rate = source_sample_rate
+        self.source_channels = source_channels
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds."""
+        return len(self.samples) / self.sample_rate if self.sample_rate else 0.0
+
+    def pcm16(self) -> bytes:
+        """Samples as 16-bit little-endian PCM."""
+        return (np.clip(self.samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+    def to_wav_bytes(self) -> bytes:
+        """Encodes the samples as an in-memory 16-bit mono WAV file."""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(self.pcm16())
+        return buffer.getvalue()
+
+    def slice(self, start: int, end: int) -> "NormalizedAudio":
+        """Returns the samples in [start, end) as a new NormalizedAudio (sharing memory)."""
+        return NormalizedAudio(self.samples[start:end], self.sample_rate, self.source_format,
+                               self.source_sample_rate, self.source_channels)
+
+    def __repr__(self) -> str:
+        return f"NormalizedAudio(duration={self.duration:.2f}s, sample_rate={self.sample_rate})"
+
+def _pcm_to_float(frames: bytes, sample_width: int, channels: int) -> np.ndarray:
+    """
+    Converts interleaved PCM frames to a (samples, channels) float32 array.
+    """
+    if sample_width == 1:
+        data = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        data = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        data = ints.astype(np.float32) / 8388608.0
+    elif sample_width == 4:
+        data = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise AudioNormalizationError(f"Unsupported sample width: {sample_width} bytes")
+    return data.reshape(-1, channels)
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """
+    Averages a (samples, channels) array to mono.
+    """
+    if samples.ndim == 1:
+        return samples
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    return samples.mean(axis=1, dtype=np.float32)
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resamples mono audio by linear interpolation, low-pass filtering first when
+    downsampling so content above the new Nyquist frequency does not alias.
+    """
+    if source_rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+
+    if target_rate < source_rate:
+        cutoff = 0.5 * target_rate / source_rate  # Normalized to the source sample rate
+        n = np.arange(_LOWPASS_TAPS) - (_LOWPASS_TAPS - 1) / 2
+        taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hanning(_LOWPASS_TAPS)
+        taps /= taps.sum()
+        samples = np.convolve(samples, taps.astype(np.float32), mode="same")
+
+    target_length = int(round(len(samples) * target_rate / source_rate))
+    positions = np.arange(target_length, dtype=np.float64) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+class AudioNormalizer:
+    """
+    Converts uploaded audio into the format expected by ASR backends in a single decode.
+    WAV is decoded with the standard library; other formats are decoded by an ffmpeg
+    process reading from and writing to pipes, so no intermediate files are written.
+    """
+
+    def __init__(self, target_sample_rate: int = ASR_SAMPLE_RATE, ffmpeg_binary: str = FFMPEG_BINARY):
+        """
+        Args:
+            target_sample_rate (int): Sample rate of the normalized audio.
+            ffmpeg_binary (str): ffmpeg executable used for compressed formats.
+        """
+        self.target_sample_rate = target_sample_rate
+        self.ffmpeg_binary = ffmpeg_binary
+
+    def normalize(self, source: AudioSource, audio_format: Optional[str] = None) -> NormalizedAudio:
+        """
+        Decodes, downmixes and resamples audio.
+        Args:
+            source (AudioSource): A file path (memory-mapped, not copied) or an in-memory buffer.
+            audio_format (Optional[str]): e.g. "wav" or "mp3"; taken from the path's extension if omitted.
+
+        Returns:
+            NormalizedAudio: Mono samples at the target rate with their duration.
+
+        Raises:
+            AudioNormalizationError: If the audio cannot be decoded.
+        """
+        if isinstance(source, str):
+            audio_format = audio_format or source.rsplit(".", 1)[-1].lower()
+            if audio_format != "wav":
+                # ffmpeg reads the file itself; containers like MP4 need random access
+                return self._decode_ffmpeg(None, audio_format, path=source)
+            try:
+                with open(source, "rb") as f:
+                    if os.fstat(f.fileno()).st_size == 0:
+                        raise AudioNormalizationError(f"Empty audio file: {source}")
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        return self._normalize_buffer(mapped, audio_format)
+            except OSError as e:
+                raise AudioNormalizationError(f"Could not read audio file {source}: {e}")
+
+        return self._normalize_buffer(source, (audio_format or "wav").lower())
+
+    def _normalize_buffer(self, buffer, audio_format: str) -> NormalizedAudio:
+        if audio_format == "wav":
+            try:
+                return self._decode_wav(buffer)
+            except (wave.Error, EOFError) as e:
+                # WAV variants the wave module cannot read (e.g. float or compressed) go through ffmpeg
+                logger.debug("Falling back to ffmpeg for WAV input: %s", e)
+        return self._decode_ffmpeg(buffer, audio_format)
+
+    def _decode_wav(self, buffer) -> NormalizedAudio:
+        stream = buffer if isinstance(buffer, mmap.mmap) else io.BytesIO(buffer)
+        stream.seek(0)
+        with wave.open(stream, "rb") as wav_file:
+            channels = wav_file.getnchannels()
+            sample_width = wav_file.getsampwidth()
+            source_rate = wav_file.getframerate()
+            frames = wav_file.readframes(wav_file.getnframes())
+
+        samples = downmix(_pcm_to_float(frames, sample_width, channels))
+        samples = resample(samples, source_rate, self.target_sample_rate)
+        return NormalizedAudio(samples, self.target_sample_rate, "wav", source_rate, channels)
+
+    def _decode_ffmpeg(self, buffer, audio_format: str, path: Optional[str] = None) -> NormalizedAudio:
+        if shutil.which(self.ffmpeg_binary) is None:
+            raise AudioNormalizationError(f"ffmpeg is required to decode {audio_format} audio")
+
+        # ffmpeg resamples and downmixes while decoding, emitting raw float32 mono samples
+        if path is not None:
+            source_args = ["-i", path]
+        else:
+            source_args = ["-f", audio_format if audio_format != "m4a" else "mp4", "-i", "pipe:0"]
+        command = [
+            self.ffmpeg_binary, "-nostdin", "-hide_banner", "-loglevel", "error", *source_args,
+            "-ac", "1", "-ar", str(self.target_sample_rate), "-f", "f32le", "pipe:1"
+        ]
+        try:
+            completed = subprocess.run(
+                command,
+                input=memoryview(buffer) if path is None else None,
+                capture_output=True,
+                check=False
+            )
+        except OSError as e:
+            raise AudioNormalizationError(f"Failed to run ffmpeg: {e}")
+        if completed.returncode != 0:
+            raise AudioNormalizationError(
+                f"ffmpeg could not decode {audio_format} audio: {completed.stderr.decode(errors='replace').strip()}"
+            )
+
+        samples = np.frombuffer(completed.stdout, dtype="<f4")
+        # Source rate and channel count are not reported on this path
+        return NormalizedAudio(samples, self.target_sample_rate, audio_format, self.target_sample_rate, 1)
+
+_normalizer: Optional[AudioNormalizer] = None
+
+def get_audio_normalizer() -> AudioNormalizer:
+    """
+    Returns the process-wide AudioNormalizer.
+    """
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = AudioNormalizer()
+    return _normalizer
@@ -0,0 +1,314 @@
+# Streaming audio uploads
+# Receives voice uploads chunk by chunk straight to a temporary file, enforcing
+# size and duration limits while the body is still arriving.
+import asyncio
+import os
+import struct
+import tempfile
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger("audio_upload")
+
+SUPPORTED_FORMATS = ["wav", "mp3", "m4a", "flac", "ogg"]
+
+CONTENT_TYPE_FORMATS = {
+    "audio/wav": "wav", "audio/x-wav": "wav", "audio/wave": "wav", "audio/vnd.wave": "wav",
+    "audio/mpeg": "mp3", "audio/mp3": "mp3",
+    "audio/mp4": "m4a", "audio/x-m4a": "m4a", "audio/m4a": "m4a",
+    "audio/flac": "flac", "audio/x-flac": "flac",
+    "audio/ogg": "ogg"
+}
+
+MAX_UPLOAD_BYTES = int(os.getenv("VOICE_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MAX_DURATION_SECONDS = float(os.getenv("VOICE_MAX_DURATION_SECONDS", "300"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("VOICE_UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+# Room for multipart boundaries, part headers and small form fields around the audio
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# WAV headers are tiny; give up looking for the data chunk after this many bytes
+_WAV_HEADER_LIMIT = 64 * 1024
+_UNKNOWN_WAV_SIZES = (0, 0xFFFFFFFF)
+
+class AudioUploadError(Exception):
+    """Raised when an upload is rejected. `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def detect_format(filename: Optional[str] = None, content_type: Optional[str] = None,
+                  default: Optional[str] = None) -> str:
+    """
+    Determines the audio format from the file extension, falling back to the content type
+    and then to `default`.
+    Raises:
+        AudioUploadError: If the format is not supported and no default is given.
+    """
+    if filename and "." in filename:
+        file_ext = filename.rsplit(".", 1)[-1].lower()
+        if file_ext in SUPPORTED_FORMATS:
+            return file_ext
+    if content_type:
+        audio_format = CONTENT_TYPE_FORMATS.get(content_type.split(";")[0].strip().lower())
+        if audio_format:
+            return audio_format
+    if default is not None:
+        return default
+    raise AudioUploadError(f"Unsupported audio format: {filename or content_type}", status_code=415)
+
+class _WavHeaderSniffer:
+    """
+    Incrementally parses a RIFF/WAVE header from the first bytes of an upload to
+    learn the byte rate and where sample data starts.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.byte_rate: Optional[int] = None
+        self.data_offset: Optional[int] = None
+        self.declared_data_size: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: bytes):
+        if self.done:
+            return
+        self.buffer.extend(chunk[:_WAV_HEADER_LIMIT - len(self.buffer)])
+        if len(self.buffer) < 12:
+            return
+        if self.buffer[:4] != b"RIFF" or self.buffer[8:12] != b"WAVE":
+            raise AudioUploadError("Invalid WAV file: missing RIFF/WAVE header", status_code=415)
+
+        offset = 12
+        while offset + 8 <= len(self.buffer):
+            chunk_id = bytes(self.buffer[offset:offset + 4])
+            chunk_size = struct.unpack_from("<I", self.buffer, offset + 4)[0]
+            body = offset + 8
+            if chunk_id == b"fmt ":
+                if body + 16 > len(self.buffer):
+                    return  # Wait for the rest of the fmt chunk
+                self.byte_rate = struct.unpack_from("<I", self.buffer, body + 8)[0]
+            elif chunk_id == b"data":
+                self.data_offset = body
+                if chunk_size not in _UNKNOWN_WAV_SIZES:
+                    self.declared_data_size = chunk_size
+                break
+            offset = body + chunk_size + (chunk_size & 1)
+
+        if self.data_offset is not None or len(self.buffer) >= _WAV_HEADER_LIMIT:
+            if self.byte_rate in (None, 0):
+                raise AudioUploadError("Invalid WAV file: missing format information", status_code=415)
+            self.done = True
+            self.buffer = bytearray()
+
+    def duration(self, total_bytes: int) -> Optional[float]:
+        """Duration implied by the declared data size or the bytes received so far, whichever is larger."""
+        if not self.done or self.data_offset is None:
+            return None
+        data_bytes = max(self.declared_data_size or 0, total_bytes - self.data_offset)
+        return max(data_bytes, 0) / self.byte_rate
+
+class AudioUpload:
+    """
+    An audio upload stored in a temporary file. Call `cleanup()` when done.
+    """
+
+    def __init__(self, path: str, audio_format: str, size: int, duration: Optional[float]):
+        self.path = path
+        self.format = audio_format
+        self.size = size
+        self.duration = duration  # Known for WAV uploads only; None otherwise
+
+    def cleanup(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __repr__(self) -> str:
+        return f"AudioUpload(path={self.path!r}, format={self.format!r}, size={self.size}, duration={self.duration})"
+
+async def receive_audio(
+    chunks: AsyncIterator[bytes],
+    audio_format: str,
+    content_length: Optional[int] = None,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    max_duration: float = MAX_DURATION_SECONDS
+) -> AudioUpload:
+    """
+    Writes an audio stream to a temporary file one chunk at a time.
+    Only one chunk is held in memory at once, and the upload is rejected as soon as
+    it exceeds `max_bytes` or (for WAV) `max_duration`, without reading the rest.
+    Args:
+        chunks (AsyncIterator[bytes]): The request body.
+        audio_format (str): One of SUPPORTED_FORMATS.
+        content_length (Optional[int]): Declared body size, checked before reading anything.
+        max_bytes (int): Maximum accepted upload size.
+        max_duration (float): Maximum accepted duration in seconds.
+
+    Returns:
+        AudioUpload: The stored upload.
+
+    Raises:
+        AudioUploadError: If a limit is exceeded or the audio is malformed.
+    """
+    if content_length is not None and content_length > max_bytes:
+        raise AudioUploadError(f"Audio upload exceeds {max_bytes} bytes", status_code=413)
+
+    sniffer = _WavHeaderSniffer() if audio_format == "wav" else None
+    temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix=f".{audio_format}")
+    size = 0
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise AudioUploadError(f"Audio upload exceeds {max_bytes} bytes", status_code=413)
+            if sniffer is not None:
+                sniffer.feed(chunk)
+                duration = sniffer.duration(size)
+                if duration is not None and duration > max_duration:
+                    raise AudioUploadError(f"Audio exceeds {max_duration:g} seconds", status_code=413)
+            await asyncio.to_thread(temp_audio.write, chunk)
+
+        if size == 0:
+            raise AudioUploadError("Empty audio upload")
+        if sniffer is not None and not sniffer.done:
+            raise AudioUploadError("Invalid WAV file: truncated header", status_code=415)
+        temp_audio.close()
+    except BaseException:
+        temp_audio.close()
+        os.unlink(temp_audio.name)
+        raise
+
+    duration = sniffer.duration(size) if sniffer is not None else None
+    if sniffer is not None and sniffer.declared_data_size is not None:
+        # Prefer what actually arrived over the header's claim
+        duration = min(duration, max(size - sniffer.data_offset, 0) / sniffer.byte_rate)
+    logger.info("Received %s upload: %d bytes", audio_format, size)
+    return AudioUpload(temp_audio.name, audio_format, size, duration)
+
+class MultipartAudioStream:
+    """
+    Extracts one file field from a multipart/form-data body while the body is
+    still arriving, so the file's bytes can go straight to `receive_audio` instead
+    of being spooled by the framework first. Other fields are skipped.
+    """
+
+    def __init__(self, body: AsyncIterator[bytes], content_type: Optional[str], field_name: str = "audio"):
+        """
+        Args:
+            body (AsyncIterator[bytes]): The raw request body, e.g. `request.stream()`.
+            content_type (Optional[str]): The request's Content-Type header.
+            field_name (str): Form field holding the file.
+
+        Raises:
+            AudioUploadError: If the body is not multipart/form-data.
+        """
+        media_type, options = parse_options_header(content_type or "")
+        boundary = options.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise AudioUploadError("Expected a multipart/form-data body", status_code=415)
+        self.field_name = field_name.encode()
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+
+        self._body = body.__aiter__()
+        self._pending: List[bytes] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_field = False
+        self._found = False
+        self._field_done = False
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if not self._found and options.get(b"name") == self.field_name:
+            self._found = self._in_field = True
+            filename = options.get(b"filename")
+            self.filename = filename.decode("utf-8", "replace") if filename else None
+            content_type = self._headers.get(b"content-type")
+            self.content_type = content_type.decode("latin-1") if content_type else None
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_field:
+            self._pending.append(bytes(data[start:end]))
+
+    def _on_part_end(self):
+        if self._in_field:
+            self._in_field = False
+            self._field_done = True
+
+    async def _feed(self) -> bool:
+        """
+        Parses the next body chunk; returns False at the end of the body.
+        Raises:
+            AudioUploadError: If the body is not valid multipart data.
+        """
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            return False
+        if chunk:
+            try:
+                self._parser.write(chunk)
+            except MultipartParseError as e:
+                raise AudioUploadError("Malformed multipart body") from e
+        return True
+
+    async def start(self):
+        """
+        Reads the body up to the start of the file field, making `filename` and
+        `content_type` available.
+        Raises:
+            AudioUploadError: If the body ends without the field.
+        """
+        while not self._found:
+            if not await self._feed():
+                raise AudioUploadError(f"Missing '{self.field_name.decode()}' file field", status_code=422)
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """
+        Yields the file field's content as it is parsed from the body.
+        Raises:
+            AudioUploadError: If the body ends before the field does.
+        """
+        while True:
+            if self._pending:
+                data = b"".join(self._pending)
+                self._pending.clear()
+                yield data
+            if self._field_done:
+                return
+            if not await self._feed():
+                raise AudioUploadError("Truncated multipart body")
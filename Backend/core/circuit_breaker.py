@@ -0,0 +1,431 @@
+# Circuit breakers and bulkheads for external tools
+# A degraded tool fails fast instead of tying up workers, and can only ever use
+# its own slice of the service's concurrency.
+import asyncio
+import os
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from core.retry_mechanism import is_retryable
+
+logger = logging.getLogger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Returned by CircuitBreaker.allow: (state generation the call was admitted in, whether it is a probe)
+Permit = Tuple[int, bool]
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a tool whose circuit breaker is open."""
+
+    # Retrying would only hit the open breaker again
+    retryable = False
+
+    def __init__(self, tool: str, retry_after: float):
+        super().__init__(f"Tool '{tool}' is temporarily unavailable (circuit open)")
+        self.tool = tool
+        self.retry_after = retry_after
+
+class BulkheadFullError(Exception):
+    """Raised when a tool already has its maximum number of calls in flight."""
+
+    retryable = False
+
+    def __init__(self, tool: str, max_concurrent: int):
+        super().__init__(f"Tool '{tool}' is at capacity ({max_concurrent} concurrent calls)")
+        self.tool = tool
+        self.max_concurrent = max_concurrent
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker over a rolling time window of call outcomes.
+
+    The breaker opens when, with at least `min_calls` calls in the window, the
+    failure rate or the slow-call rate reaches its threshold. After `open_seconds`
+    it lets `half_open_max_calls` probe calls through: if they all succeed the
+    breaker closes, otherwise it opens again.
+
+    Every state change starts a new generation, and each admitted call carries the
+    generation it was admitted in. Late results from an earlier generation, such as
+    calls admitted while closed that finish after the breaker opened, are ignored,
+    so only the probes themselves decide whether a half-open breaker closes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        slow_call_rate_threshold: float = 0.5,
+        window_seconds: int = 30,
+        min_calls: int = 10,
+        open_seconds: float = 15.0,
+        half_open_max_calls: int = 1,
+        is_failure: Callable[[BaseException], bool] = is_retryable
+    ):
+        """
+        Args:
+            name (str): Tool the breaker protects.
+            failure_rate_threshold (float): Fraction of failed calls that opens the breaker.
+            slow_call_seconds (float): Calls taking at least this long count as slow.
+            slow_call_rate_threshold (float): Fraction of slow calls that opens the breaker.
+            window_seconds (int): Length of the rolling window, in one-second buckets.
+            min_calls (int): Calls needed in the window before rates are evaluated.
+            open_seconds (float): Time spent open before probing the tool again.
+            half_open_max_calls (int): Probe calls allowed while half-open.
+            is_failure (Callable[[BaseException], bool]): Decides whether an error reflects tool
+                health. Defaults to the retry classifier, so client errors such as 404 do not count.
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.window_seconds = max(int(window_seconds), 1)
+        self.min_calls = max(min_calls, 1)
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = max(half_open_max_calls, 1)
+        self.is_failure = is_failure
+
+        self._state = CLOSED
+        self._generation = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._buckets: Deque[List[int]] = deque()  # [second, calls, failures, slow]
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float):
+        # Called with the lock held
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._generation += 1
+            self._probes = 0
+            self._probe_successes = 0
+            logger.info("Circuit for '%s' is half-open; probing", self.name)
+
+    def _open(self, now: float, reason: str):
+        # Called with the lock held
+        self._state = OPEN
+        self._generation += 1
+        self._opened_at = now
+        self._buckets.clear()
+        self.times_opened += 1
+        logger.warning("Circuit for '%s' opened: %s", self.name, reason)
+
+    def allow(self) -> Permit:
+        """
+        Reserves permission for one call. The caller must pass the returned permit
+        to exactly one of `record` or `cancel`.
+        Returns:
+            Permit: Token identifying the admission.
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with all probes in flight.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_half_open(now)
+            if self._state == CLOSED:
+                return self._generation, False
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return self._generation, True
+            self.rejected += 1
+            retry_after = max(self.open_seconds - (now - self._opened_at), 0.0) if self._state == OPEN else 1.0
+        raise CircuitOpenError(self.name, round(retry_after, 1))
+
+    def cancel(self, permit: Permit):
+        """
+        Gives back a permit whose call ended without an outcome (e.g. it was cancelled),
+        freeing its probe slot if it was a probe.
+        """
+        generation, probe = permit
+        with self._lock:
+            if probe and generation == self._generation and self._state == HALF_OPEN:
+                self._probes -= 1
+
+    def record(self, permit: Permit, duration: float, error: Optional[BaseException] = None):
+        """
+        Records the outcome of a call admitted by `allow`.
+        Args:
+            permit (Permit): The permit returned by `allow` for this call.
+            duration (float): Call duration in seconds.
+            error (Optional[BaseException]): The error raised by the call, if any.
+        """
+        generation, probe = permit
+        failed = error is not None and self.is_failure(error)
+        slow = duration >= self.slow_call_seconds
+        now = time.monotonic()
+        with self._lock:
+            if generation != self._generation:
+                return  # Late result of a call admitted before the last state change
+            if probe:
+                if failed or slow:
+                    self._open(now, "probe call failed" if failed else f"probe call took {duration:.1f}s")
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_max_calls:
+                        self._state = CLOSED
+                        self._generation += 1
+                        self._buckets.clear()
+                        logger.info("Circuit for '%s' closed", self.name)
+                return
+
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0, 0])
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += failed
+            bucket[3] += slow
+            while self._buckets and self._buckets[0][0] <= second - self.window_seconds:
+                self._buckets.popleft()
+
+            calls = sum(b[1] for b in self._buckets)
+            if calls < self.min_calls:
+                return
+            failure_rate = sum(b[2] for b in self._buckets) / calls
+            slow_rate = sum(b[3] for b in self._buckets) / calls
+            if failure_rate >= self.failure_rate_threshold:
+                self._open(now, f"failure rate {failure_rate:.0%} over {calls} calls")
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._open(now, f"slow call rate {slow_rate:.0%} over {calls} calls")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            calls = sum(b[1] for b in self._buckets)
+            return {
+                "state": self._state,
+                "calls": calls,
+                "failures": sum(b[2] for b in self._buckets),
+                "slow_calls": sum(b[3] for b in self._buckets),
+                "rejected": self.rejected,
+                "times_opened": self.times_opened
+            }
+
+class Bulkhead:
+    """
+    Caps the calls in flight to one tool. A call beyond the cap waits up to
+    `max_wait` seconds for a slot and is then rejected, so short bursts queue
+    briefly while a slow tool still cannot absorb the worker threads or
+    event-loop capacity shared with every other tool. Threads use `acquire`
+    and coroutines `acquire_async`; both draw on the same slots.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = 10, max_wait: float = 0.5):
+        """
+        Args:
+            name (str): Tool the bulkhead protects.
+            max_concurrent (int): Maximum concurrent calls.
+            max_wait (float): Seconds a call waits for a free slot before it is rejected.
+        """
+        self.name = name
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_wait = max(max_wait, 0.0)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self.rejected = 0
+
+    def _reject(self):
+        # Called with the lock held
+        self.rejected += 1
+        raise BulkheadFullError(self.name, self.max_concurrent)
+
+    def acquire(self):
+        """
+        Takes a slot, blocking the calling thread for up to `max_wait` seconds.
+        Raises:
+            BulkheadFullError: If no slot frees up in time.
+        """
+        deadline = time.monotonic() + self.max_wait
+        with self._lock:
+            while self._active >= self.max_concurrent:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject()
+                self._slot_freed.wait(remaining)
+            self._active += 1
+
+    async def acquire_async(self):
+        """
+        Takes a slot, waiting on the event loop for up to `max_wait` seconds.
+        Raises:
+            BulkheadFullError: If no slot frees up in time.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while True:
+            with self._lock:
+                if self._active < self.max_concurrent:
+                    self._active += 1
+                    return
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._reject()
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter[1], remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            # Wake one waiting thread and one waiting coroutine; whichever loses re-checks and waits again
+            self._slot_freed.notify()
+            while self._async_waiters:
+                loop, future = self._async_waiters.popleft()
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(_resolve, future)
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"active": self._active, "max_concurrent": self.max_concurrent, "rejected": self.rejected}
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class ToolGuard:
+    """
+    Runs tool calls through a tool's bulkhead and circuit breaker, recording
+    each call's outcome and duration. Async calls are also bounded by `timeout`.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, bulkhead: Bulkhead, timeout: Optional[float] = None):
+        """
+        Args:
+            name (str): Tool name.
+            breaker (CircuitBreaker): Breaker tracking the tool's health.
+            bulkhead (Bulkhead): Concurrency cap for the tool.
+            timeout (Optional[float]): Seconds after which an async call is cancelled and counted as failed.
+        """
+        self.name = name
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        self.timeout = timeout
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Calls `func` if the breaker and bulkhead admit it.
+        Raises:
+            CircuitOpenError: If the breaker is open.
+            BulkheadFullError: If the tool is at capacity.
+        """
+        # The bulkhead is taken first so that a rejection there cannot strand a probe permit
+        self.bulkhead.acquire()
+        try:
+            permit = self.breaker.allow()
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.breaker.record(permit, time.perf_counter() - start, e)
+                raise
+            except BaseException:
+                self.breaker.cancel(permit)
+                raise
+            self.breaker.record(permit, time.perf_counter() - start)
+            return result
+        finally:
+            self.bulkhead.release()
+
+    async def call_async(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Awaitable variant of `call` for coroutine functions.
+        Raises:
+            CircuitOpenError: If the breaker is open.
+            BulkheadFullError: If the tool is at capacity.
+            asyncio.TimeoutError: If the call exceeds `timeout`.
+        """
+        await self.bulkhead.acquire_async()
+        try:
+            permit = self.breaker.allow()
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(func(*args, **kwargs), self.timeout)
+            except Exception as e:
+                self.breaker.record(permit, time.perf_counter() - start, e)
+                raise
+            except BaseException:
+                # Cancellation says nothing about the tool's health; just free the permit
+                self.breaker.cancel(permit)
+                raise
+            self.breaker.record(permit, time.perf_counter() - start)
+            return result
+        finally:
+            self.bulkhead.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"breaker": self.breaker.stats(), "bulkhead": self.bulkhead.stats()}
+
+def _tool_setting(tool: str, name: str, default: str) -> str:
+    """
+    Reads <TOOL>_<NAME> (e.g. ZOMATO_CIRCUIT_OPEN_SECONDS), falling back to <NAME>.
+    """
+    return os.getenv(f"{tool.upper()}_{name}", os.getenv(name, default))
+
+def create_tool_guard(tool: str) -> ToolGuard:
+    """
+    Builds a guard for `tool` from CIRCUIT_*, BULKHEAD_* and TOOL_CALL_TIMEOUT, each of
+    which can be overridden per tool by prefixing the tool name. The bulkhead defaults
+    to the HTTP pool's per-host size, so it admits as many calls as there are connections.
+    """
+    breaker = CircuitBreaker(
+        tool,
+        failure_rate_threshold=float(_tool_setting(tool, "CIRCUIT_FAILURE_RATE", "0.5")),
+        slow_call_seconds=float(_tool_setting(tool, "CIRCUIT_SLOW_CALL_SECONDS", "5")),
+        slow_call_rate_threshold=float(_tool_setting(tool, "CIRCUIT_SLOW_CALL_RATE", "0.5")),
+        window_seconds=int(_tool_setting(tool, "CIRCUIT_WINDOW_SECONDS", "30")),
+        min_calls=int(_tool_setting(tool, "CIRCUIT_MIN_CALLS", "10")),
+        open_seconds=float(_tool_setting(tool, "CIRCUIT_OPEN_SECONDS", "15")),
+        half_open_max_calls=int(_tool_setting(tool, "CIRCUIT_HALF_OPEN_CALLS", "1"))
+    )
+    bulkhead = Bulkhead(
+        tool,
+        max_concurrent=int(_tool_setting(tool, "BULKHEAD_MAX_CONCURRENT", os.getenv("HTTP_POOL_MAXSIZE", "10"))),
+        max_wait=float(_tool_setting(tool, "BULKHEAD_MAX_WAIT_SECONDS", "0.5"))
+    )
+    return ToolGuard(tool, breaker, bulkhead, timeout=float(_tool_setting(tool, "TOOL_CALL_TIMEOUT", "15")))
+
+_guards: Dict[str, ToolGuard] = {}
+_guards_lock = threading.Lock()
+
+def get_tool_guard(tool: str) -> ToolGuard:
+    """
+    Returns the process-wide guard for `tool`, shared by every orchestrator.
+    """
+    guard = _guards.get(tool)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(tool)
+            if guard is None:
+                guard = _guards[tool] = create_tool_guard(tool)
+    return guard
+
+def tool_guard_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Reports breaker and bulkhead state for every tool called so far.
+    """
+    return {tool: guard.stats() for tool, guard in list(_guards.items())}
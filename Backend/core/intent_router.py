@@ -0,0 +1,217 @@
+# Fast-path intent matching
+# Maps well-known request phrasings straight to subtask plans and canned responses,
+# so they are served without calling the LLM planner.
+import copy
+import json
+import os
+import re
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("intent_router")
+
+# Built-in intent table. Patterns are regular expressions matched against the
+# normalized request text; "{slot}" placeholders capture parameters, which are
+# substituted into the subtask templates and the response text.
+# Earlier intents take priority when several match at the same position.
+DEFAULT_INTENTS: List[Dict[str, Any]] = [
+    {
+        "name": "restaurant_details",
+        "patterns": [
+            r"^(?:show |get )?(?:details|info|information) (?:for|of|about|on) restaurant (?:id )?{restaurant_id}$"
+        ],
+        "slots": {"restaurant_id": r"\d+"},
+        "slot_types": {"restaurant_id": "int"},
+        "subtasks": [
+            {"tool": "zomato", "action": "details", "params": {"restaurant_id": "{restaurant_id}"}}
+        ],
+        "response": "Fetching details for restaurant {restaurant_id}..."
+    },
+    {
+        "name": "search_restaurants",
+        "patterns": [
+            r"^(?:find|search for|search|show me|look for) (?:some |a |an )?{query} (?:restaurants?|places|spots)(?: near me| nearby| around me)?$",
+            r"^where can i (?:get|eat|find) (?:some |a |an )?{query}$"
+        ],
+        "subtasks": [
+            {"tool": "zomato", "action": "search", "params": {"query": "{query}"}}
+        ],
+        "response": "Looking for {query} places near you..."
+    },
+    {
+        "name": "order_food",
+        "patterns": [r"\border\b.*\bfood\b", r"\bfood\b.*\border\b"],
+        "response": "I can help you order food! Please specify what you'd like to order."
+    },
+    {
+        "name": "weather",
+        "patterns": [r"\bweather\b"],
+        "response": "I can help you check the weather, but I need integration with a weather API first."
+    },
+    {
+        "name": "greeting",
+        "patterns": [r"\b(?:hello|hi|hey)\b"],
+        "response": "Hello {user_name}! How can I assist you today?"
+    }
+]
+
+_SLOT_PLACEHOLDER = re.compile(r"\{([A-Za-z_]\w*)\}")
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SLOT_CONVERTERS: Dict[str, Callable[[str], Any]] = {"str": str, "int": int, "float": float}
+
+class IntentRouterError(Exception):
+    """Raised when the intent table is invalid."""
+    pass
+
+class IntentMatch:
+    """
+    Result of a successful intent match.
+    """
+
+    def __init__(self, name: str, slots: Dict[str, Any], subtasks: List[Dict[str, Any]], response: Optional[str]):
+        self.name = name
+        self.slots = slots
+        self.subtasks = subtasks
+        self._response = response
+
+    def render_response(self, **context: Any) -> Optional[str]:
+        """
+        Renders the intent's response text with the extracted slots and extra context
+        (e.g. user_name). Unknown placeholders are left as-is.
+        """
+        if self._response is None:
+            return None
+        values = {**context, **self.slots}
+        return _SLOT_PLACEHOLDER.sub(lambda m: str(values.get(m.group(1), m.group(0))), self._response)
+
+    def __repr__(self) -> str:
+        return f"IntentMatch(name={self.name!r}, slots={self.slots!r})"
+
+class IntentRouter:
+    """
+    Compiles an intent table into a single regular expression alternation, so a
+    request is matched against every intent in one pass over the text.
+    """
+
+    DEFAULT_SLOT_PATTERN = r".+?"
+
+    def __init__(self, intents: Optional[List[Dict[str, Any]]] = None):
+        """
+        Args:
+            intents (Optional[List[Dict[str, Any]]]): Intent table; defaults to DEFAULT_INTENTS.
+                Each intent has a "name", a list of "patterns", and optionally "slots"
+                (slot -> regex), "slot_types" (slot -> "str" | "int" | "float"),
+                "subtasks" (templates) and "response" (text template).
+        """
+        self.intents = intents if intents is not None else DEFAULT_INTENTS
+        # group name -> (intent, {group name -> slot name})
+        self._groups: Dict[str, tuple] = {}
+        self._regex = self._compile(self.intents)
+        logger.info("IntentRouter compiled %d intents", len(self.intents))
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentRouter":
+        """
+        Loads an intent table from a JSON file.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_env(cls) -> "IntentRouter":
+        """
+        Loads the table named by INTENT_TABLE_PATH, falling back to the built-in table.
+        """
+        path = os.getenv("INTENT_TABLE_PATH")
+        return cls.from_file(path) if path else cls()
+
+    def _compile(self, intents: List[Dict[str, Any]]) -> "re.Pattern":
+        alternatives = []
+        for intent_index, intent in enumerate(intents):
+            if "name" not in intent or not intent.get("patterns"):
+                raise IntentRouterError(f"Intent {intent_index} needs a name and at least one pattern")
+            slot_patterns = intent.get("slots", {})
+
+            for pattern_index, pattern in enumerate(intent["patterns"]):
+                group = f"i{intent_index}p{pattern_index}"
+                slot_groups: Dict[str, str] = {}
+
+                def replace_slot(match: "re.Match") -> str:
+                    slot = match.group(1)
+                    slot_group = f"{group}_{slot}"
+                    if slot_group in slot_groups:
+                        raise IntentRouterError(f"Slot '{slot}' used twice in a pattern of intent '{intent['name']}'")
+                    slot_groups[slot_group] = slot
+                    return f"(?P<{slot_group}>{slot_patterns.get(slot, self.DEFAULT_SLOT_PATTERN)})"
+
+                fragment = _SLOT_PLACEHOLDER.sub(replace_slot, pattern)
+                try:
+                    re.compile(fragment)
+                except re.error as e:
+                    raise IntentRouterError(f"Invalid pattern for intent '{intent['name']}': {e}")
+                alternatives.append(f"(?P<{group}>{fragment})")
+                self._groups[group] = (intent, slot_groups)
+
+        return re.compile("|".join(alternatives))
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Lowercases the text, strips punctuation and collapses whitespace.
+        """
+        return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+    def match(self, text: str) -> Optional[IntentMatch]:
+        """
+        Matches request text against the intent table.
+        Args:
+            text (str): The user's request in natural language.
+
+        Returns:
+            Optional[IntentMatch]: The matched intent with slots and rendered subtasks, or None.
+        """
+        found = self._regex.search(self.normalize(text))
+        if found is None:
+            return None
+
+        intent, slot_groups = self._groups[found.lastgroup]
+        slot_types = intent.get("slot_types", {})
+        slots = {}
+        try:
+            for slot_group, slot in slot_groups.items():
+                value = found.group(slot_group).strip()
+                slots[slot] = _SLOT_CONVERTERS[slot_types.get(slot, "str")](value)
+        except (KeyError, ValueError) as e:
+            logger.warning("Could not convert slots for intent '%s': %s", intent["name"], e)
+            return None
+
+        subtasks = [self._fill_template(subtask, slots) for subtask in intent.get("subtasks", [])]
+        return IntentMatch(intent["name"], slots, subtasks, intent.get("response"))
+
+    @classmethod
+    def _fill_template(cls, template: Any, slots: Dict[str, Any]) -> Any:
+        """
+        Substitutes slot values into a subtask template. A string consisting of a single
+        placeholder is replaced by the (typed) slot value itself.
+        """
+        if isinstance(template, dict):
+            return {key: cls._fill_template(value, slots) for key, value in template.items()}
+        if isinstance(template, list):
+            return [cls._fill_template(value, slots) for value in template]
+        if isinstance(template, str):
+            whole = _SLOT_PLACEHOLDER.fullmatch(template)
+            if whole and whole.group(1) in slots:
+                return slots[whole.group(1)]
+            return _SLOT_PLACEHOLDER.sub(lambda m: str(slots.get(m.group(1), m.group(0))), template)
+        return copy.deepcopy(template)
+
+_router: Optional[IntentRouter] = None
+
+def get_intent_router() -> IntentRouter:
+    """
+    Returns the process-wide IntentRouter shared by the task and assistant entry points.
+    """
+    global _router
+    if _router is None:
+        _router = IntentRouter.from_env()
+    return _router
@@ -0,0 +1,161 @@
+# Central logging setup
+# Records are handed to a queue and written by a background listener thread, so
+# request threads and the event loop never block on stderr. Configured once at
+# application startup; modules only call logging.getLogger(name).
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+class JSONFormatter(logging.Formatter):
+    """
+    Renders each record as one JSON object per line: timestamp, level, logger,
+    message, any `extra=` fields, and the formatted exception if present.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in every N records below WARNING for the configured loggers, counted
+    per call site, so high-volume messages stay visible without dominating output.
+    Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        """
+        Args:
+            rates (Dict[str, int]): Logger name -> keep one record in this many.
+        """
+        super().__init__()
+        self.rates = {name: rate for name, rate in rates.items() if rate > 1}
+        self._counts: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % rate == 0
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the listener thread.
+    The stock handler formats every record in the calling thread; here only the
+    exception traceback (which cannot outlive the caller's frame) is rendered eagerly.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """Parses "a=1,b=2" into {"a": "1", "b": "2"}."""
+    mapping = {}
+    for item in value.split(","):
+        name, sep, setting = item.partition("=")
+        if sep and name.strip():
+            mapping[name.strip()] = setting.strip()
+    return mapping
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    module_levels: Optional[Dict[str, str]] = None,
+    sample_rates: Optional[Dict[str, int]] = None
+):
+    """
+    Installs the queue-based logging pipeline on the root logger. Safe to call
+    more than once; later calls replace the previous configuration.
+    Args:
+        level (Optional[str]): Root level; defaults to LOG_LEVEL or INFO.
+        fmt (Optional[str]): "text" or "json"; defaults to LOG_FORMAT or text.
+        module_levels (Optional[Dict[str, str]]): Per-logger levels; defaults to LOG_LEVELS,
+            e.g. "orchestrator=WARNING,auth=DEBUG".
+        sample_rates (Optional[Dict[str, int]]): Per-logger sampling of records below WARNING;
+            defaults to LOG_SAMPLE_RATES, e.g. "http_pool=100,single_flight=10".
+    """
+    global _listener
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+    if module_levels is None:
+        module_levels = _parse_mapping(os.getenv("LOG_LEVELS", ""))
+    if sample_rates is None:
+        sample_rates = {name: int(rate) for name, rate in _parse_mapping(os.getenv("LOG_SAMPLE_RATES", "")).items()}
+
+    output = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+        handler = _DeferredQueueHandler(queue.SimpleQueue())
+        if sample_rates:
+            handler.addFilter(SamplingFilter(sample_rates))
+        _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=False)
+        _listener.start()
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level)
+        for name, module_level in module_levels.items():
+            logging.getLogger(name).setLevel(module_level.upper())
+
+def shutdown_logging():
+    """
+    Flushes queued records and stops the listener thread.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+atexit.register(shutdown_logging)
+
+def logging_stats() -> Dict[str, Any]:
+    """Reports whether the queue listener is running and how many records are waiting."""
+    with _lock:
+        if _listener is None:
+            return {"running": False, "queued": 0}
+        return {"running": True, "queued": _listener.queue.qsize()}
@@ -0,0 +1,292 @@
+# In-process metrics
+# Counters, gauges and bucketed latency histograms kept in memory and rendered in
+# the Prometheus text format by /status/metrics. Recording a sample is a dict
+# lookup, a bisect and an add under a lock, cheap enough to leave on in production.
+import asyncio
+import bisect
+import functools
+import math
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("metrics")
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, Any]) -> Tuple[str, ...]:
+    if len(labels) != len(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. calls per tool/action/outcome."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                 for key, value in items]
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. calls in flight."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                 for key, value in items]
+
+class Histogram(_Metric):
+    """
+    Latency distribution with fixed buckets. Quantiles (p50/p95/p99) are estimated
+    by interpolating within buckets, like Prometheus' histogram_quantile, so no
+    samples are stored.
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum, count, max]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, value]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+            if value > series[3]:
+                series[3] = value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """
+        Estimates the q-quantile (0 < q < 1) of the observed values; None if there are none.
+        """
+        with self._lock:
+            series = self._series.get(_label_key(self.labelnames, labels))
+            if series is None or series[2] == 0:
+                return None
+            counts, total, maximum = list(series[0]), series[2], series[3]
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                # The largest observation bounds the estimate within its bucket
+                return min(lower + (upper - lower) * (rank - cumulative) / count, maximum)
+            cumulative += count
+        return maximum
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Count, mean and p50/p95/p99 per label set, for JSON consumers.
+        """
+        with self._lock:
+            keys = [(key, series[1], series[2]) for key, series in self._series.items()]
+        result = []
+        for key, total_sum, count in sorted(keys):
+            labels = dict(zip(self.labelnames, key))
+            entry = {**labels, "count": count, "mean": total_sum / count if count else 0.0}
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                entry[name] = self.quantile(q, **labels)
+            result.append(entry)
+        return result
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series[0]), series[1], series[2]) for key, series in self._series.items())
+        lines = self._header()
+        for key, counts, total_sum, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Holds every metric of the process; metrics are created on first request by name.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered with a different type or labels")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def latency_summary(self) -> Dict[str, List[Dict[str, Any]]]:
+        """p50/p95/p99 of every histogram, keyed by metric name."""
+        with self._lock:
+            histograms = [metric for metric in self._metrics.values() if isinstance(metric, Histogram)]
+        return {histogram.name: histogram.summary() for histogram in histograms}
+
+registry = MetricsRegistry()
+
+# Shared instruments for the request path
+OPERATION_DURATION = registry.histogram(
+    "assistant_operation_duration_seconds", "Duration of instrumented operations.", ("operation",))
+OPERATION_TOTAL = registry.counter(
+    "assistant_operations_total", "Instrumented operations by outcome.", ("operation", "outcome"))
+OPERATION_IN_FLIGHT = registry.gauge(
+    "assistant_operations_in_flight", "Instrumented operations currently running.", ("operation",))
+TOOL_CALL_DURATION = registry.histogram(
+    "assistant_tool_call_duration_seconds", "Duration of tool calls, including retries.", ("tool", "action"))
+TOOL_CALLS = registry.counter(
+    "assistant_tool_calls_total", "Tool calls by outcome.", ("tool", "action", "outcome"))
+HTTP_REQUEST_DURATION = registry.histogram(
+    "assistant_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+
+@contextmanager
+def track(operation: str) -> Iterator[None]:
+    """
+    Times a block as `operation`: records its duration, counts it as "success" or
+    "error", and counts it as in flight while it runs.
+    """
+    OPERATION_IN_FLIGHT.inc(operation=operation)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        OPERATION_DURATION.observe(time.perf_counter() - start, operation=operation)
+        OPERATION_TOTAL.inc(operation=operation, outcome=outcome)
+        OPERATION_IN_FLIGHT.dec(operation=operation)
+
+def timed(operation: str) -> Callable:
+    """
+    Decorator form of `track` for plain and coroutine functions.
+    """
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with track(operation):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_tool_call(tool: str, action: str, duration: float, outcome: str):
+    """Records one subtask's tool call; `outcome` is "success" or an error type."""
+    TOOL_CALL_DURATION.observe(duration, tool=tool, action=action)
+    TOOL_CALLS.inc(tool=tool, action=action, outcome=outcome)
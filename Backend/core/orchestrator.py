@@ -1,64 +1,311 @@
 # Logic for dynamic tool invocation and retries
 # Handles API calls, connections to external services (e.g., Zomato).
 
+import asyncio
+import contextvars
+import json
+import time
 import logging
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Optional, Hashable, Callable
 
 # Example: Assume we have these utility imports for external integration
-from tools.zomato_wrapper import ZomatoAPI
+from tools.zomato_wrapper import ZomatoAPI, AsyncZomatoAPI
 from tools.utils import parse_tool_response
+from core.single_flight import SingleFlight, AsyncSingleFlight
+from core.retry_mechanism import RetryManager
+from core.circuit_breaker import ToolGuard, CircuitOpenError, BulkheadFullError
+from core.metrics import timed, record_tool_call
+from core.tracing import get_tracer
 
-# Configure logging for production-grade troubleshooting and observability
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger("orchestrator")
 
+class DependencyGraphError(Exception):
+    """Raised when subtask dependencies cannot be resolved into a valid DAG."""
+    pass
+
+# Read-only tool actions that are safe to share between identical concurrent requests.
+# Side-effecting actions such as orders must never be coalesced.
+COALESCIBLE_ACTIONS = {("zomato", "search"), ("zomato", "details")}
+
+# Idempotent actions that may be retried on transient upstream failures
+RETRYABLE_ACTIONS = COALESCIBLE_ACTIONS
+
+# Callback receiving (event_type, payload) as subtasks progress
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+def _coalescing_key(tool: str, action: str, params: Dict[str, Any]) -> Hashable:
+    return (tool, action, json.dumps(params, sort_keys=True, default=str))
+
+def _validate_zomato_params(action: str, params: Dict[str, Any]):
+    """
+    Checks a planned Zomato call's parameters before it is dispatched, so a malformed
+    plan fails its subtask with a clear message instead of counting against the tool.
+    Raises:
+        ValueError: If a required parameter is missing or malformed.
+    """
+    if not isinstance(params, dict):
+        raise ValueError(f"Parameters for zomato/{action} must be an object")
+    if action in ("details", "order") and not isinstance(params.get("restaurant_id"), (int, str)):
+        raise ValueError(f"zomato/{action} requires 'restaurant_id'")
+    if action == "order":
+        items = params.get("items")
+        if not isinstance(items, dict) or not items:
+            raise ValueError("zomato/order requires 'items' mapping item names to quantities")
+        if not all(isinstance(quantity, int) and quantity > 0 for quantity in items.values()):
+            raise ValueError("zomato/order item quantities must be positive integers")
+
+def _emit(on_event: Optional[EventCallback], event_type: str, index: int, result: Dict[str, Any]):
+    """
+    Reports subtask progress to the caller's callback; callback failures never affect execution.
+    """
+    if on_event is None:
+        return
+    payload = {"index": index, "tool": result.get("tool"), "action": result.get("action")}
+    if event_type == "tool_result":
+        payload["result"] = result
+    elif event_type == "subtask_failed":
+        payload["error"] = result.get("error")
+    try:
+        on_event(event_type, payload)
+    except Exception as e:
+        logger.warning("Progress callback failed for %s: %s", event_type, e)
+
+def _finished_event(result: Dict[str, Any]) -> str:
+    return "subtask_failed" if "error" in result else "tool_result"
+
+def _mark_span(span, result: Dict[str, Any]):
+    """Copies a subtask's outcome onto its trace span."""
+    if span is not None and "error" in result:
+        span.set_error(result["error"])
+        if "error_type" in result:
+            span.set_attribute("error_type", result["error_type"])
+
+def _error_result(tool: str, action: str, error: Exception) -> Dict[str, Any]:
+    """
+    Converts a failed subtask into its result entry. Calls rejected by a circuit
+    breaker or bulkhead carry an "error_type" so clients can tell them from tool errors.
+    """
+    result = {"tool": tool, "action": action, "error": str(error)}
+    if isinstance(error, CircuitOpenError):
+        result.update({"error_type": "circuit_open", "retry_after": error.retry_after})
+        logger.warning("Skipped subtask for tool '%s': circuit open", tool)
+    elif isinstance(error, BulkheadFullError):
+        result["error_type"] = "bulkhead_full"
+        logger.warning("Skipped subtask for tool '%s': at capacity", tool)
+    else:
+        logger.error("Failed to execute subtask for tool '%s' with error: %s", tool, error)
+    return result
+
 class Orchestrator:
     """
     Orchestrator is responsible for dynamically invoking external tools/APIs
     and orchestrating subtasks for task fulfillment.
+
+    Subtasks may declare dependencies on earlier steps with a "depends_on" list,
+    referencing either a step's "id" or its position in the plan. Independent
+    steps are executed concurrently, up to `max_concurrency` at a time.
     """
 
-    def __init__(self):
+    DEFAULT_MAX_CONCURRENCY = 4
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 single_flight: Optional[SingleFlight] = None,
+                 retry_manager: Optional[RetryManager] = None,
+                 tool_guard: Optional[Callable[[str], ToolGuard]] = None):
+        """
+        Args:
+            max_concurrency (int): Maximum number of subtasks executed in parallel.
+            single_flight (Optional[SingleFlight]): When given, identical concurrent read-only
+                tool calls share one upstream request.
+            retry_manager (Optional[RetryManager]): When given, read-only tool calls are retried
+                on transient failures.
+            tool_guard (Optional[Callable[[str], ToolGuard]]): Returns the circuit breaker and
+                bulkhead guarding each tool's calls.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.max_concurrency = max_concurrency
+        self.single_flight = single_flight
+        self.retry_manager = retry_manager
+        self.tool_guard = tool_guard
+
         # Initialize external API integrations
         self.zomato_api = ZomatoAPI()
 
-    def execute_subtasks(self, subtasks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    @timed("execute_subtasks")
+    def execute_subtasks(self, subtasks: List[Dict[str, Any]],
+                         on_event: Optional[EventCallback] = None) -> Dict[str, Any]:
         """
         Executes subtasks by routing them dynamically to the appropriate tools.
+        Subtasks whose dependencies are satisfied run concurrently; a subtask whose
+        dependency failed is skipped and reported as an error.
         Args:
             subtasks (List[Dict[str, Any]]): List of subtasks with high-level metadata
-                e.g., [{"tool": "zomato", "action": "search", "params": {...}}]
+                e.g., [{"id": "find", "tool": "zomato", "action": "search", "params": {...}},
+                       {"tool": "zomato", "action": "order", "params": {...}, "depends_on": ["find"]}]
+            on_event (Optional[EventCallback]): Called from the calling thread with
+                "subtask_started", "tool_result" or "subtask_failed" progress events.
 
         Returns:
-            Dict[str, Any]: Combined responses from all executed subtasks.
+            Dict[str, Any]: Combined responses from all executed subtasks, in plan order.
         """
-        results = []
+        try:
+            dependencies = self._build_dependency_graph(subtasks)
+        except DependencyGraphError as e:
+            logger.error("Invalid subtask dependency graph: %s", e)
+            return {
+                "status": "failed",
+                "error": str(e),
+                "results": [
+                    {"tool": s.get("tool"), "action": s.get("action"), "error": str(e)}
+                    for s in subtasks
+                ]
+            }
 
-        for subtask in subtasks:
-            tool = subtask.get("tool")
-            action = subtask.get("action")
-            params = subtask.get("params", {})
+        results: List[Optional[Dict[str, Any]]] = [None] * len(subtasks)
+        failed = set()
+        pending = set(range(len(subtasks)))
+        running = {}
 
-            try:
-                if tool == "zomato":
-                    result = self._execute_zomato_action(action, params)
-                else:
-                    # Add support for more tools here (e.g., Uber Eats, Swiggy, etc.)
-                    raise ValueError(f"Unsupported tool: {tool}")
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="orchestrator") as pool:
+            while pending or running:
+                # Schedule every step whose dependencies have all finished
+                for index in sorted(pending):
+                    if len(running) >= self.max_concurrency:
+                        break
+                    deps = dependencies[index]
+                    if any(dep in pending or dep in running.values() for dep in deps):
+                        continue
+                    pending.discard(index)
 
-                # Parse, log, and append the result
-                parsed_result = parse_tool_response(tool, action, result)
-                results.append(parsed_result)
+                    failed_deps = [dep for dep in deps if dep in failed]
+                    if failed_deps:
+                        subtask = subtasks[index]
+                        results[index] = {
+                            "tool": subtask.get("tool"),
+                            "action": subtask.get("action"),
+                            "error": f"Skipped: dependency {self._step_label(subtasks, failed_deps[0])} failed"
+                        }
+                        failed.add(index)
+                        _emit(on_event, "subtask_failed", index, results[index])
+                        continue
 
-            except Exception as e:
-                logger.error(f"Failed to execute subtask for tool '{tool}' with error: {str(e)}")
-                results.append({"tool": tool, "action": action, "error": str(e)})
+                    _emit(on_event, "subtask_started", index, subtasks[index])
+                    # Run in a copy of the caller's context so the subtask's span joins its trace
+                    future = pool.submit(contextvars.copy_context().run, self._execute_subtask, subtasks[index])
+                    running[future] = index
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    results[index] = future.result()
+                    if "error" in results[index]:
+                        failed.add(index)
+                    _emit(on_event, _finished_event(results[index]), index, results[index])
 
         return {"status": "completed", "results": results}
 
+    def _execute_subtask(self, subtask: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Executes a single subtask and converts any failure into an error result.
+        Args:
+            subtask (Dict[str, Any]): Subtask with "tool", "action" and "params".
+
+        Returns:
+            Dict[str, Any]: Parsed tool response or an error entry.
+        """
+        with get_tracer().span("subtask", tool=str(subtask.get("tool")), action=str(subtask.get("action"))) as span:
+            result = self._run_subtask(subtask)
+            _mark_span(span, result)
+            return result
+
+    def _run_subtask(self, subtask: Dict[str, Any]) -> Dict[str, Any]:
+        tool = subtask.get("tool")
+        action = subtask.get("action")
+        params = subtask.get("params", {})
+
+        start = time.perf_counter()
+        try:
+            if tool == "zomato":
+                _validate_zomato_params(action, params)
+                call = lambda: self._guarded_zomato_action(action, params)
+                if self.retry_manager is not None and (tool, action) in RETRYABLE_ACTIONS:
+                    call = lambda: self.retry_manager.execute_with_retry(self._guarded_zomato_action, action, params)
+                if self.single_flight is not None and (tool, action) in COALESCIBLE_ACTIONS:
+                    result = self.single_flight.do(_coalescing_key(tool, action, params), call)
+                else:
+                    result = call()
+            else:
+                # Add support for more tools here (e.g., Uber Eats, Swiggy, etc.)
+                raise ValueError(f"Unsupported tool: {tool}")
+
+            # Parse and return the result
+            response = parse_tool_response(tool, action, result)
+            record_tool_call(tool, action, time.perf_counter() - start, "success")
+            return response
+
+        except Exception as e:
+            response = _error_result(tool, action, e)
+            record_tool_call(tool, action, time.perf_counter() - start, response.get("error_type", "error"))
+            return response
+
+    @staticmethod
+    def _build_dependency_graph(subtasks: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        Resolves each subtask's "depends_on" references into plan indices.
+        Dependencies may only point at earlier steps, which keeps the graph acyclic.
+        Args:
+            subtasks (List[Dict[str, Any]]): The plan to analyse.
+
+        Returns:
+            List[List[int]]: For each subtask, the indices of the steps it waits on.
+
+        Raises:
+            DependencyGraphError: If a reference is unknown, duplicated or points forward.
+        """
+        ids: Dict[Any, int] = {}
+        for index, subtask in enumerate(subtasks):
+            step_id = subtask.get("id")
+            if step_id is None:
+                continue
+            if step_id in ids:
+                raise DependencyGraphError(f"Duplicate subtask id: {step_id}")
+            ids[step_id] = index
+
+        graph = []
+        for index, subtask in enumerate(subtasks):
+            deps = []
+            for ref in subtask.get("depends_on") or []:
+                if ref in ids:
+                    dep = ids[ref]
+                elif isinstance(ref, int) and not isinstance(ref, bool) and 0 <= ref < len(subtasks):
+                    dep = ref
+                else:
+                    raise DependencyGraphError(f"Unknown dependency '{ref}' for subtask {index}")
+                if dep >= index:
+                    raise DependencyGraphError(
+                        f"Subtask {index} may only depend on earlier steps (got {ref})"
+                    )
+                deps.append(dep)
+            graph.append(deps)
+        return graph
+
+    @staticmethod
+    def _step_label(subtasks: List[Dict[str, Any]], index: int) -> str:
+        """Returns a readable reference to a step for error messages."""
+        step_id = subtasks[index].get("id")
+        return f"'{step_id}'" if step_id is not None else str(index)
+
+    def _guarded_zomato_action(self, action: str, params: Dict[str, Any]) -> Any:
+        """Runs one Zomato call through the tool's circuit breaker and bulkhead, if configured."""
+        if self.tool_guard is None:
+            return self._execute_zomato_action(action, params)
+        return self.tool_guard("zomato").call(self._execute_zomato_action, action, params)
+
     def _execute_zomato_action(self, action: str, params: Dict[str, Any]) -> Any:
         """
         Routes actions for the Zomato tool to its API integration.
@@ -71,7 +318,162 @@ class Orchestrator:
         """
         if action == "search":
             return self.zomato_api.search(params)
+        elif action == "details":
+            return self.zomato_api.get_restaurant_details(params["restaurant_id"])
+        elif action == "order":
+            return self.zomato_api.create_order(params["restaurant_id"], params["items"])
+        else:
+            raise ValueError(f"Unsupported action for Zomato: {action}")
+
+
+class AsyncOrchestrator:
+    """
+    Event-loop native orchestrator. Mirrors Orchestrator but awaits tool calls
+    instead of blocking a worker thread for each HTTP round trip.
+    """
+
+    DEFAULT_MAX_CONCURRENCY = Orchestrator.DEFAULT_MAX_CONCURRENCY
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 single_flight: Optional[AsyncSingleFlight] = None,
+                 retry_manager: Optional[RetryManager] = None,
+                 tool_guard: Optional[Callable[[str], ToolGuard]] = None):
+        """
+        Args:
+            max_concurrency (int): Maximum number of subtasks of one plan in flight at once.
+            single_flight (Optional[AsyncSingleFlight]): When given, identical concurrent read-only
+                tool calls share one upstream request.
+            retry_manager (Optional[RetryManager]): When given, read-only tool calls are retried
+                on transient failures, backing off without blocking the event loop.
+            tool_guard (Optional[Callable[[str], ToolGuard]]): Returns the circuit breaker and
+                bulkhead guarding each tool's calls; async calls are also bounded by its timeout.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.max_concurrency = max_concurrency
+        self.single_flight = single_flight
+        self.retry_manager = retry_manager
+        self.tool_guard = tool_guard
+
+        # Initialize external API integrations
+        self.zomato_api = AsyncZomatoAPI()
+
+    @timed("execute_subtasks")
+    async def execute_subtasks(self, subtasks: List[Dict[str, Any]],
+                               on_event: Optional[EventCallback] = None) -> Dict[str, Any]:
+        """
+        Executes subtasks concurrently while honouring their "depends_on" ordering.
+        Args:
+            subtasks (List[Dict[str, Any]]): List of subtasks, as for Orchestrator.execute_subtasks.
+            on_event (Optional[EventCallback]): Called on the event loop with
+                "subtask_started", "tool_result" or "subtask_failed" progress events.
+
+        Returns:
+            Dict[str, Any]: Combined responses from all executed subtasks, in plan order.
+        """
+        try:
+            dependencies = Orchestrator._build_dependency_graph(subtasks)
+        except DependencyGraphError as e:
+            logger.error("Invalid subtask dependency graph: %s", e)
+            return {
+                "status": "failed",
+                "error": str(e),
+                "results": [
+                    {"tool": s.get("tool"), "action": s.get("action"), "error": str(e)}
+                    for s in subtasks
+                ]
+            }
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        steps: List[asyncio.Future] = []
+
+        async def run_step(index: int) -> Dict[str, Any]:
+            subtask = subtasks[index]
+            for dep in dependencies[index]:
+                if "error" in await steps[dep]:
+                    skipped = {
+                        "tool": subtask.get("tool"),
+                        "action": subtask.get("action"),
+                        "error": f"Skipped: dependency {Orchestrator._step_label(subtasks, dep)} failed"
+                    }
+                    _emit(on_event, "subtask_failed", index, skipped)
+                    return skipped
+            async with semaphore:
+                _emit(on_event, "subtask_started", index, subtask)
+                result = await self._execute_subtask(subtask)
+            _emit(on_event, _finished_event(result), index, result)
+            return result
+
+        # Dependencies always point at earlier steps, so they exist before being awaited
+        for index in range(len(subtasks)):
+            steps.append(asyncio.ensure_future(run_step(index)))
+
+        results = await asyncio.gather(*steps)
+        return {"status": "completed", "results": list(results)}
+
+    async def _execute_subtask(self, subtask: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Executes a single subtask and converts any failure into an error result.
+        Args:
+            subtask (Dict[str, Any]): Subtask with "tool", "action" and "params".
+
+        Returns:
+            Dict[str, Any]: Parsed tool response or an error entry.
+        """
+        with get_tracer().span("subtask", tool=str(subtask.get("tool")), action=str(subtask.get("action"))) as span:
+            result = await self._run_subtask(subtask)
+            _mark_span(span, result)
+            return result
+
+    async def _run_subtask(self, subtask: Dict[str, Any]) -> Dict[str, Any]:
+        tool = subtask.get("tool")
+        action = subtask.get("action")
+        params = subtask.get("params", {})
+
+        start = time.perf_counter()
+        try:
+            if tool == "zomato":
+                _validate_zomato_params(action, params)
+                call = lambda: self._guarded_zomato_action(action, params)
+                if self.retry_manager is not None and (tool, action) in RETRYABLE_ACTIONS:
+                    call = lambda: self.retry_manager.execute_with_retry_async(self._guarded_zomato_action, action, params)
+                if self.single_flight is not None and (tool, action) in COALESCIBLE_ACTIONS:
+                    result = await self.single_flight.do(_coalescing_key(tool, action, params), call)
+                else:
+                    result = await call()
+            else:
+                raise ValueError(f"Unsupported tool: {tool}")
+
+            response = parse_tool_response(tool, action, result)
+            record_tool_call(tool, action, time.perf_counter() - start, "success")
+            return response
+
+        except Exception as e:
+            response = _error_result(tool, action, e)
+            record_tool_call(tool, action, time.perf_counter() - start, response.get("error_type", "error"))
+            return response
+
+    async def _guarded_zomato_action(self, action: str, params: Dict[str, Any]) -> Any:
+        """Runs one Zomato call through the tool's circuit breaker and bulkhead, if configured."""
+        if self.tool_guard is None:
+            return await self._execute_zomato_action(action, params)
+        return await self.tool_guard("zomato").call_async(self._execute_zomato_action, action, params)
+
+    async def _execute_zomato_action(self, action: str, params: Dict[str, Any]) -> Any:
+        """
+        Routes actions for the Zomato tool to its async API integration.
+        Args:
+            action (str): Zomato action type (e.g., "search", "order", etc.)
+            params (Dict[str, Any]): Parameters for the Zomato API.
+
+        Returns:
+            Any: Response from Zomato API.
+        """
+        if action == "search":
+            return await self.zomato_api.search(params)
+        elif action == "details":
+            return await self.zomato_api.get_restaurant_details(params["restaurant_id"])
         elif action == "order":
-            return self.zomato_api.create_order(params)
+            return await self.zomato_api.create_order(params["restaurant_id"], params["items"])
         else:
-            raise ValueError(f"Unsupported action for Zomato: {action}")
\ No newline at end of file
+            raise ValueError(f"Unsupported action for Zomato: {action}")
@@ -0,0 +1,200 @@
+# Semantic cache for task plans
+# Serves repeat or near-identical task phrasings without calling the LLM planner.
+import copy
+import os
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+logger = logging.getLogger("plan_cache")
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+# Actions that only read data; a plan made of anything else may place orders or
+# otherwise act on the user's behalf, so it is never served for a different task text
+READ_ONLY_ACTIONS = frozenset({("zomato", "search"), ("zomato", "details")})
+
+class PlanCache:
+    """
+    Caches planner output keyed on task text.
+    Lookups first try an exact match on the normalized text, then, if enabled, fall
+    back to a local similarity search (Jaccard similarity of character shingles) over
+    previously planned tasks. No network calls are made.
+
+    A similar task is only served when every token containing a digit (quantities,
+    restaurant IDs, times) matches exactly and the cached plan consists solely of
+    read-only actions, so a fuzzy hit can never change what gets ordered.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.8,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000,
+        shingle_size: int = 3,
+        read_only_actions: FrozenSet[Tuple[str, str]] = READ_ONLY_ACTIONS
+    ):
+        """
+        Args:
+            similarity_threshold (float): Minimum Jaccard similarity (0-1) for a fuzzy hit;
+                1.0 only serves exact matches.
+            ttl_seconds (float): How long a cached plan stays valid.
+            max_entries (int): Maximum number of cached plans (least recently used are evicted).
+            shingle_size (int): Length of the character shingles used for similarity.
+            read_only_actions (FrozenSet[Tuple[str, str]]): (tool, action) pairs without side
+                effects; only plans made entirely of these are eligible for fuzzy hits.
+        """
+        if not 0.0 < similarity_threshold <= 1.0:
+            raise ValueError("similarity_threshold must be in (0, 1].")
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.shingle_size = shingle_size
+        self.read_only_actions = read_only_actions
+
+        # normalized text -> (expires_at, shingles, plan, digit tokens)
+        self._entries: "OrderedDict[str, Tuple[float, FrozenSet[str], List[Dict[str, Any]], FrozenSet[str]]]" = OrderedDict()
+        # shingle -> normalized texts whose plans may be served for similar tasks
+        self._index: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "PlanCache":
+        """
+        Builds a PlanCache configured from PLAN_CACHE_* environment variables.
+        """
+        return cls(
+            similarity_threshold=float(os.getenv("PLAN_CACHE_SIMILARITY", "0.8")),
+            ttl_seconds=float(os.getenv("PLAN_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1000"))
+        )
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Lowercases the text, strips punctuation and collapses whitespace.
+        """
+        return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+    def _shingles(self, normalized: str) -> FrozenSet[str]:
+        padded = f" {normalized} "
+        if len(padded) <= self.shingle_size:
+            return frozenset([padded])
+        return frozenset(padded[i:i + self.shingle_size] for i in range(len(padded) - self.shingle_size + 1))
+
+    @staticmethod
+    def _digit_tokens(normalized: str) -> FrozenSet[str]:
+        return frozenset(token for token in normalized.split() if any(char.isdigit() for char in token))
+
+    def _is_read_only(self, plan: List[Dict[str, Any]]) -> bool:
+        return all((subtask.get("tool"), subtask.get("action")) in self.read_only_actions for subtask in plan)
+
+    def get(self, task: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns a copy of the cached plan for `task` or a sufficiently similar task.
+        Args:
+            task (str): The task in human-readable natural language.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The cached subtasks, or None on a miss.
+        """
+        normalized = self.normalize(task)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(normalized)
+                    self.exact_hits += 1
+                    return copy.deepcopy(entry[2])
+                self._remove(normalized)
+
+            if self.similarity_threshold < 1.0:
+                match = self._most_similar(self._shingles(normalized), self._digit_tokens(normalized), now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.similar_hits += 1
+                    logger.debug("Plan cache similarity hit: '%s' -> '%s'", normalized, match)
+                    return copy.deepcopy(self._entries[match][2])
+
+            self.misses += 1
+            return None
+
+    def put(self, task: str, plan: List[Dict[str, Any]]):
+        """
+        Stores a plan for `task`, evicting the least recently used plans if full.
+        """
+        normalized = self.normalize(task)
+        # Plans with side effects are stored for exact matches only
+        shingles = self._shingles(normalized) if self._is_read_only(plan) else frozenset()
+
+        with self._lock:
+            if normalized in self._entries:
+                self._remove(normalized)
+            self._entries[normalized] = (time.monotonic() + self.ttl_seconds, shingles, copy.deepcopy(plan),
+                                         self._digit_tokens(normalized))
+            for shingle in shingles:
+                self._index[shingle].add(normalized)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _most_similar(self, shingles: FrozenSet[str], digit_tokens: FrozenSet[str], now: float) -> Optional[str]:
+        """
+        Finds the live entry with the highest Jaccard similarity at or above the threshold
+        whose digit tokens equal `digit_tokens`. Only entries sharing at least one shingle
+        (via the inverted index) are scored.
+        """
+        overlaps: Dict[str, int] = defaultdict(int)
+        for shingle in shingles:
+            for candidate in self._index.get(shingle, ()):
+                overlaps[candidate] += 1
+
+        best, best_score, expired = None, self.similarity_threshold, []
+        for candidate, overlap in overlaps.items():
+            expires_at, candidate_shingles, _, candidate_digits = self._entries[candidate]
+            if expires_at <= now:
+                expired.append(candidate)
+                continue
+            if candidate_digits != digit_tokens:
+                continue
+            score = overlap / (len(shingles) + len(candidate_shingles) - overlap)
+            if score >= best_score:
+                best, best_score = candidate, score
+
+        for candidate in expired:
+            self._remove(candidate)
+        return best
+
+    def _remove(self, normalized: str):
+        _, shingles, _, _ = self._entries.pop(normalized)
+        for shingle in shingles:
+            bucket = self._index.get(shingle)
+            if bucket is not None:
+                bucket.discard(normalized)
+                if not bucket:
+                    del self._index[shingle]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns hit/miss counters and current occupancy.
+        """
+        with self._lock:
+            return {
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "entries": len(self._entries)
+            }
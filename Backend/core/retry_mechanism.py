@@ -1,71 +1,271 @@
 # Error recovery and automatic retry logic
 # Handles logic for failed tasks and timed retries.
+import asyncio
+import inspect
+import os
+import random
+import threading
 import time
 import logging
-from typing import Callable, Any, Optional
+from typing import Callable, Any, Dict, Iterator, Optional
 from functools import wraps
 
-# Set up logging for monitoring and debugging retries
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+import httpx
+import requests
+
+from core.tracing import get_tracer
+
 logger = logging.getLogger("retry_mechanism")
 
+# Upstream responses worth retrying; any other HTTP status is treated as fatal
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Default classifier for failed attempts. Walks the exception and its causes:
+    an explicit boolean `retryable` attribute wins, then HTTP status codes
+    (see RETRYABLE_STATUS_CODES), then transport failures (connection errors and
+    timeouts). Anything else, including programming errors, is fatal.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        flag = getattr(error, "retryable", None)
+        if isinstance(flag, bool):
+            return flag
+        status = _status_code(error)
+        if status is not None:
+            return status in RETRYABLE_STATUS_CODES
+        if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError,
+                              requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
 class RetryConfig:
     """
     Configuration for retry mechanism, including strategy, limits, and delay intervals.
     """
-    def __init__(self, retries: int = 3, delay: int = 2, backoff: float = 1.5, jitter: Optional[int] = None):
+    def __init__(self, retries: int = 3, delay: float = 2, backoff: Optional[float] = None,
+                 jitter: Optional[float] = None, max_delay: float = 30.0, decorrelated: Optional[bool] = None,
+                 retry_on: Callable[[BaseException], bool] = is_retryable):
         """
         Args:
-            retries (int): Total number of retry attempts (default: 3).
-            delay (int): Initial delay in seconds between retries (default: 2).
-            backoff (float): Factor to increase delay after each retry (default: 1.5).
-            jitter (Optional[int]): Random jitter (in seconds) to add to the delay (default: None).
+            retries (int): Total number of attempts, including the first one (default: 3).
+            delay (float): Initial delay in seconds between retries (default: 2).
+            backoff (Optional[float]): Factor to increase delay after each retry when `decorrelated` is off
+                (default: 1.5).
+            jitter (Optional[float]): Random jitter (in seconds) to add to the delay when `decorrelated`
+                is off (default: None).
+            max_delay (float): Upper bound for any single delay (default: 30).
+            decorrelated (Optional[bool]): Use decorrelated jitter, where each delay is drawn between `delay`
+                and three times the previous delay, so concurrent clients do not retry in lockstep.
+                Defaults to on unless `backoff` or `jitter` is given.
+            retry_on (Callable[[BaseException], bool]): Decides whether a failure is worth retrying.
         """
+        if decorrelated is None:
+            decorrelated = backoff is None and jitter is None
         self.retries = retries
         self.delay = delay
-        self.backoff = backoff
+        self.backoff = backoff if backoff is not None else 1.5
         self.jitter = jitter
+        self.max_delay = max_delay
+        self.decorrelated = decorrelated
+        self.retry_on = retry_on
+
+    @classmethod
+    def from_env(cls, prefix: str = "RETRY") -> "RetryConfig":
+        """
+        Builds a config from <prefix>_ATTEMPTS, <prefix>_BASE_DELAY and <prefix>_MAX_DELAY.
+        Defaults suit interactive requests: 3 attempts, 0.2s base and 2s maximum delay.
+        """
+        return cls(
+            retries=int(os.getenv(f"{prefix}_ATTEMPTS", "3")),
+            delay=float(os.getenv(f"{prefix}_BASE_DELAY", "0.2")),
+            max_delay=float(os.getenv(f"{prefix}_MAX_DELAY", "2"))
+        )
+
+    def delays(self) -> Iterator[float]:
+        """
+        Yields the delay before each successive retry.
+        """
+        previous = self.delay
+        while True:
+            if self.decorrelated:
+                previous = min(self.max_delay, random.uniform(self.delay, previous * 3))
+                yield previous
+            else:
+                jitter = random.uniform(0, self.jitter) if self.jitter else 0
+                yield min(self.max_delay, previous + jitter)
+                previous *= self.backoff
 
 class RetryException(Exception):
     """Custom exception to signal max retry failure."""
     pass
 
-def retry(config: RetryConfig):
+class RetryBudget:
+    """
+    Process-wide token bucket limiting retries to a fraction of overall traffic.
+    Every call deposits `ratio` tokens and every retry spends one, with a floor of
+    `min_per_second` retries regardless of traffic. When an upstream fails
+    wholesale, retries stop once the bucket is drained instead of multiplying load.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, capacity: float = 10.0):
+        """
+        Args:
+            ratio (float): Retries allowed per call made.
+            min_per_second (float): Tokens added per second independently of traffic.
+            capacity (float): Maximum tokens that can accumulate.
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.denied = 0
+
+    @classmethod
+    def from_env(cls) -> "RetryBudget":
+        """
+        Builds a budget from RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SECOND and RETRY_BUDGET_CAPACITY.
+        """
+        return cls(
+            ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.1")),
+            min_per_second=float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1")),
+            capacity=float(os.getenv("RETRY_BUDGET_CAPACITY", "10"))
+        )
+
+    def _refill(self, now: float):
+        # Called with the lock held
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_call(self):
+        """Registers a first attempt, earning `ratio` tokens."""
+        with self._lock:
+            self.calls += 1
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        """
+        Spends a token for one retry.
+        Returns:
+            bool: False when the budget is exhausted and the retry must be skipped.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.retries += 1
+                return True
+            self.denied += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "tokens": round(self._tokens, 2),
+                "capacity": self.capacity,
+                "calls": self.calls,
+                "retries": self.retries,
+                "denied": self.denied
+            }
+
+_budget: Optional[RetryBudget] = None
+_budget_lock = threading.Lock()
+
+def get_retry_budget() -> RetryBudget:
+    """
+    Returns the process-wide retry budget shared by every RetryManager.
+    """
+    global _budget
+    if _budget is None:
+        with _budget_lock:
+            if _budget is None:
+                _budget = RetryBudget.from_env()
+    return _budget
+
+def _next_delay(config: RetryConfig, budget: Optional[RetryBudget], name: str, attempts: int,
+                delays: Iterator[float], error: Exception) -> float:
+    """
+    Decides what happens after a failed attempt: re-raises fatal errors, raises
+    RetryException when attempts run out, otherwise returns how long to wait.
+    """
+    if not config.retry_on(error):
+        logger.warning("Attempt %d/%d for %s failed with a non-retryable error: %s",
+                       attempts, config.retries, name, error)
+        raise error
+    if attempts >= config.retries:
+        logger.error("All %d attempts failed for %s. Raising RetryException.", config.retries, name)
+        raise RetryException(f"Function {name} failed after {config.retries} retries: {error}") from error
+    if budget is not None and not budget.try_acquire():
+        logger.warning("Retry budget exhausted; not retrying %s after: %s", name, error)
+        raise error
+
+    delay = next(delays)
+    retry_after = getattr(error, "retry_after", None)
+    if isinstance(retry_after, (int, float)):
+        # Never retry sooner than the upstream asked us to
+        delay = max(delay, min(float(retry_after), config.max_delay))
+    logger.warning("Attempt %d/%d failed for %s: %s. Retrying in %.2fs",
+                   attempts, config.retries, name, error, delay)
+    return delay
+
+def retry(config: RetryConfig, budget: Optional[RetryBudget] = None):
     """
     Decorator to retry a function based on the provided configuration.
+    Coroutine functions are retried with `asyncio.sleep`, so backoff never blocks
+    the event loop. Non-retryable errors are re-raised immediately, as is the last
+    error when `budget` has no tokens left.
     Args:
         config (RetryConfig): Retry configuration defining the retry strategy.
+        budget (Optional[RetryBudget]): Shared budget every retry must draw from.
     """
     def decorator(func: Callable):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                delays = config.delays()
+                if budget is not None:
+                    budget.record_call()
+                attempts = 0
+                while True:
+                    try:
+                        with get_tracer().span("attempt", function=func.__name__, attempt=attempts + 1):
+                            return await func(*args, **kwargs)
+                    except Exception as e:
+                        attempts += 1
+                        await asyncio.sleep(_next_delay(config, budget, func.__name__, attempts, delays, e))
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
+            delays = config.delays()
+            if budget is not None:
+                budget.record_call()
             attempts = 0
-            current_delay = config.delay
-
-            while attempts < config.retries:
+            while True:
                 try:
                     # Attempt to execute the function
-                    return func(*args, **kwargs)
+                    with get_tracer().span("attempt", function=func.__name__, attempt=attempts + 1):
+                        return func(*args, **kwargs)
                 except Exception as e:
                     attempts += 1
-                    logger.warning(f"Attempt {attempts}/{config.retries} failed for {func.__name__}: {str(e)}")
-
-                    if attempts == config.retries:
-                        logger.error(f"All {config.retries} attempts failed for {func.__name__}. Raising RetryException.")
-                        raise RetryException(f"Function {func.__name__} failed after {config.retries} retries.") from e
-
-                    # Calculate next delay with jitter (if provided) and sleep
-                    if config.jitter:
-                        jitter = time.uniform(0, config.jitter)
-                    else:
-                        jitter = 0
-                    time.sleep(current_delay + jitter)
-
-                    # Update delay for next retry with exponential backoff
-                    current_delay *= config.backoff
+                    time.sleep(_next_delay(config, budget, func.__name__, attempts, delays, e))
 
         return wrapper
     return decorator
@@ -75,8 +275,14 @@ class RetryManager:
     Centralized retry manager to execute retryable tasks for fault-tolerant systems.
     """
 
-    def __init__(self, retry_config: RetryConfig):
+    def __init__(self, retry_config: RetryConfig, budget: Optional[RetryBudget] = None):
+        """
+        Args:
+            retry_config (RetryConfig): Retry strategy.
+            budget (Optional[RetryBudget]): Retry budget; defaults to the process-wide one.
+        """
         self.retry_config = retry_config
+        self.budget = budget or get_retry_budget()
 
     def execute_with_retry(self, func: Callable, *args, **kwargs) -> Any:
         """
@@ -90,11 +296,29 @@ class RetryManager:
         Raises:
             RetryException: If all retry attempts fail.
         """
-        @retry(self.retry_config)
         def wrapped_function():
             return func(*args, **kwargs)
 
-        return wrapped_function()
+        wrapped_function.__name__ = getattr(func, "__name__", "task")
+        return retry(self.retry_config, self.budget)(wrapped_function)()
+
+    async def execute_with_retry_async(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Awaitable variant of `execute_with_retry` for coroutine functions.
+        Args:
+            func (Callable): Coroutine function to execute with retries.
+            *args: Positional arguments for the function.
+            **kwargs: Keyword arguments for the function.
+        Returns:
+            Any: The result of the coroutine if successful.
+        Raises:
+            RetryException: If all retry attempts fail.
+        """
+        async def wrapped_function():
+            return await func(*args, **kwargs)
+
+        wrapped_function.__name__ = getattr(func, "__name__", "task")
+        return await retry(self.retry_config, self.budget)(wrapped_function)()
 
 # Demonstration function to simulate transient failures
 def transient_task_simulation(succeed_after: int):
@@ -105,8 +329,8 @@ def transient_task_simulation(succeed_after: int):
     """
     transient_task_simulation.attempts += 1
     if transient_task_simulation.attempts <= succeed_after:
-        raise ValueError("Simulated transient failure.")
+        raise ConnectionError("Simulated transient failure.")
     return "Task succeeded!"
 
 # Initialize counter for the simulation function
-transient_task_simulation.attempts = 0
\ No newline at end of file
+transient_task_simulation.attempts = 0
@@ -0,0 +1,111 @@
+# Shared token revocations
+# Logout revocations are appended to a table in the user database, and every
+# worker process replays new entries into its own token cache in the background,
+# so a token revoked on one worker is rejected by all of them within a second.
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger("revocation_store")
+
+# (kind, key, revoked_at, expires_at); kind is "token" (key = token digest) or "user" (key = email)
+Revocation = Tuple[str, str, float, float]
+
+class RevocationStore:
+    """
+    Append-only log of revocations in SQLite (WAL), shared by worker processes.
+    Each process polls for entries newer than the last one it saw; lookups on the
+    request path never touch the database.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 1.0):
+        """
+        Args:
+            path (str): Database file path (created if missing); usually the user database.
+            poll_interval (float): Seconds between polls for revocations made by other workers.
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS revocations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                revoked_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_revocations_expires_at ON revocations (expires_at);
+            """
+        )
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._stop = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+
+    def append(self, revocation: Revocation):
+        """Records a revocation for every worker."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO revocations (kind, key, revoked_at, expires_at) VALUES (?, ?, ?, ?)", revocation
+            )
+
+    def read_new(self) -> List[Revocation]:
+        """Returns unexpired revocations added since the previous call, and purges expired ones."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, key, revoked_at, expires_at FROM revocations WHERE id > ? AND expires_at > ? "
+                "ORDER BY id", (self._last_id, now)
+            ).fetchall()
+            if rows:
+                self._last_id = rows[-1][0]
+            self._conn.execute("DELETE FROM revocations WHERE expires_at <= ?", (now,))
+        return [row[1:] for row in rows]
+
+    def start(self, apply: Callable[[Revocation], None]):
+        """
+        Replays existing revocations into `apply`, then keeps polling for new ones on a daemon thread.
+        """
+        for revocation in self.read_new():
+            apply(revocation)
+        if self._poller is not None and self._poller.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.poll_interval):
+                try:
+                    for revocation in self.read_new():
+                        apply(revocation)
+                except sqlite3.Error as e:
+                    logger.warning("Could not read shared revocations: %s", e)
+
+        self._poller = threading.Thread(target=run, name="revocation-poller", daemon=True)
+        self._poller.start()
+
+    def close(self):
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join(timeout=5)
+            self._poller = None
+        with self._lock:
+            self._conn.close()
+
+def create_revocation_store_from_env() -> Optional[RevocationStore]:
+    """
+    Opens the shared store in the user database when USER_STORE_BACKEND is "sqlite";
+    with the in-memory user store revocations stay local to the process.
+    """
+    if os.getenv("USER_STORE_BACKEND", "sqlite").lower() != "sqlite":
+        return None
+    return RevocationStore(
+        os.getenv("USER_STORE_PATH", os.path.join("data", "users.db")),
+        poll_interval=float(os.getenv("REVOCATION_POLL_INTERVAL", "1.0"))
+    )
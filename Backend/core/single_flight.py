@@ -0,0 +1,136 @@
+# Request coalescing ("single flight")
+# Concurrent callers asking for the same key share one upstream call and its result.
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger("single_flight")
+
+class _Call:
+    """An upstream call in progress, shared by every caller with the same key."""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls made from threads.
+    The first caller for a key runs the function; callers arriving while it runs
+    block until it finishes and receive the same result (or exception).
+    Results are shared objects and must be treated as read-only.
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Runs `fn` unless a call for `key` is already in flight, in which case its result is awaited.
+        Args:
+            key (Hashable): Identity of the request (normalized inputs).
+            fn (Callable[[], Any]): Function performing the upstream call.
+
+        Returns:
+            Any: The shared result.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            logger.debug("%s: coalesced call for %r", self.name, key)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls)
+            }
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent identical calls made from coroutines on one event loop.
+    The upstream call runs as its own task, so a cancelled caller does not cancel
+    the work other callers are waiting on.
+    """
+
+    def __init__(self, name: str = "async_single_flight"):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Awaits `fn()` unless a call for `key` is already in flight, in which case its result is shared.
+        Args:
+            key (Hashable): Identity of the request (normalized inputs).
+            fn (Callable[[], Awaitable[Any]]): Coroutine function performing the upstream call.
+
+        Returns:
+            Any: The shared result.
+        """
+        self.calls += 1
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.debug("%s: coalesced call for %r", self.name, key)
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda finished: self._finish(key, finished))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls)
+        }
@@ -3,16 +3,12 @@
 import os
 import logging
 from typing import Any, Dict, Optional
-from pydub import AudioSegment
 
-# For external services, we assume OpenAI Whisper here (modify as needed)
-import openai
+from core.audio_normalizer import AudioNormalizer, AudioNormalizationError
+from core.transcription_pipeline import TranscriptionPipeline, get_transcription_pipeline
+from core.transcription_cache import get_transcription_cache
+from models.asr.backends import ASRBackend, OpenAIASRBackend
 
-# Set up logging for debug and observability
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger("speech_to_text")
 
 class SpeechToTextError(Exception):
@@ -22,22 +18,43 @@ class SpeechToTextError(Exception):
 class SpeechToText:
     """
     Handles voice-to-text conversion using third-party libraries like OpenAI Whisper.
-    The audio file is transcoded (if needed) and then sent to the ASR service for transcription.
+    The audio file is decoded once, silence is trimmed, and long recordings are
+    split at pauses and transcribed in parallel (see TranscriptionPipeline).
     """
 
     SUPPORTED_FORMATS = ["wav", "mp3", "m4a", "flac", "ogg"]  # Supported input formats
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        normalizer: Optional[AudioNormalizer] = None,
+        backend: Optional[ASRBackend] = None,
+        pipeline: Optional[TranscriptionPipeline] = None
+    ):
         """
         Initialize the Speech-to-Text engine with optional API key.
         Args:
-            api_key (Optional[str]): API key for OpenAI Whisper or similar service.
+            api_key (Optional[str]): API key for OpenAI Whisper; when given, this engine calls the
+                API with it instead of using the shared pipeline.
+            normalizer (Optional[AudioNormalizer]): Audio decoder; defaults to the shared one.
+            backend (Optional[ASRBackend]): ASR engine. Without it or an API key, the process-wide
+                pipeline (backend named by ASR_BACKEND) is used, so its model and batcher are shared.
+            pipeline (Optional[TranscriptionPipeline]): Complete pipeline, overriding the other arguments.
         """
-        self.api_key = api_key or os.getenv("OPENAI_API_KEY")  # Retrieve from env variables as fallback
-        if not self.api_key:
-            raise ValueError("API Key for Speech-to-Text service is required.")
-
-        openai.api_key = self.api_key
+        self._owns_backend = pipeline is None and backend is None and api_key is not None
+        if self._owns_backend:
+            self.api_key = api_key
+            backend = OpenAIASRBackend(api_key=api_key, model=os.getenv("ASR_OPENAI_MODEL", "whisper-1"))
+        if pipeline is None and backend is None and normalizer is None:
+            pipeline = get_transcription_pipeline()
+        elif pipeline is None and backend is None:
+            backend = get_transcription_pipeline().backend
+        self.pipeline = pipeline or TranscriptionPipeline(backend, normalizer=normalizer, cache=get_transcription_cache())
+
+    def close(self):
+        """Closes a backend created by this engine; the shared pipeline is closed at shutdown."""
+        if self._owns_backend:
+            self.pipeline.backend.close()
 
     def transcribe(self, audio_file_path: str, language: Optional[str] = "en") -> Dict[str, Any]:
         """
@@ -55,62 +72,14 @@ class SpeechToText:
             raise SpeechToTextError(f"Unsupported audio format: {file_ext}")
 
         try:
-            logger.info(f"Transcoding audio file if needed: {audio_file_path}")
-            normalized_audio_path = self._convert_audio_to_wav(audio_file_path)
-
-            logger.info(f"Sending transcoded audio file to ASR service: {normalized_audio_path}")
-            # Send audio to Whisper API for transcription
-            with open(normalized_audio_path, "rb") as audio_file:
-                response = openai.Audio.transcribe("whisper-1", audio_file, language=language)
-
-            logger.info(f"Transcription successful for file: {audio_file_path}")
-            return {
-                "text": response.get("text", ""),
-                "language": response.get("language", language),
-                "duration": self._get_audio_duration(normalized_audio_path)  # Duration in seconds
-            }
-
-        except Exception as e:
-            logger.error(f"Error during speech-to-text processing: {str(e)}")
-            raise SpeechToTextError(f"Speech-to-text failed for file {audio_file_path}: {str(e)}")
+            logger.info("Transcribing audio file: %s", audio_file_path)
+            result = self.pipeline.transcribe(audio_file_path, file_ext, language)
+            logger.info("Transcription successful for file: %s", audio_file_path)
+            return result
 
-    def _convert_audio_to_wav(self, audio_file_path: str) -> str:
-        """
-        Converts audio files to WAV format for ASR compatibility (if required).
-        Args:
-            audio_file_path (str): Path to the original audio file.
-        Returns:
-            str: Path to the converted WAV file.
-        """
-        file_ext = audio_file_path.split(".")[-1].lower()
-        if file_ext == "wav":
-            # Already in WAV format, no need to convert
-            return audio_file_path
-
-        # Load audio file and convert to WAV format
-        try:
-            audio = AudioSegment.from_file(audio_file_path, format=file_ext)
-            wav_file_path = audio_file_path.rsplit(".", 1)[0] + ".wav"
-            audio.export(wav_file_path, format="wav")
-            logger.info(f"Audio file converted to WAV: {wav_file_path}")
-            return wav_file_path
-        except Exception as e:
-            logger.error(f"Audio conversion failed for file {audio_file_path}: {str(e)}")
+        except AudioNormalizationError as e:
+            logger.error("Audio normalization failed for file %s: %s", audio_file_path, e)
             raise SpeechToTextError(f"Audio conversion failed: {str(e)}")
-
-    def _get_audio_duration(self, audio_file_path: str) -> float:
-        """
-        Measures the duration of the audio file.
-        Args:
-            audio_file_path (str): Path to the audio file.
-        Returns:
-            float: Duration in seconds.
-        """
-        try:
-            audio = AudioSegment.from_file(audio_file_path)
-            duration = len(audio) / 1000.0  # Milliseconds to seconds
-            logger.info(f"Audio duration: {duration} seconds")
-            return duration
         except Exception as e:
-            logger.error(f"Failed to measure duration of audio: {str(e)}")
-            raise SpeechToTextError(f"Audio duration measurement failed: {str(e)}")
\ No newline at end of file
+            logger.error("Error during speech-to-text processing: %s", e)
+            raise SpeechToTextError(f"Speech-to-text failed for file {audio_file_path}: {str(e)}")
@@ -0,0 +1,592 @@
+# Storage backends for the StateManager
+# An in-memory sharded store and a persistent SQLite (WAL) store with write-behind batching.
+import bisect
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import logging
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("state_backends")
+
+class StateBackend(ABC):
+    """
+    Interface for task record storage used by StateManager.
+    Records are dicts with at least "task_id", "status", "created_at" and "updated_at"
+    (naive UTC datetimes). Implementations must be thread-safe.
+    """
+
+    @abstractmethod
+    def put(self, record: Dict[str, Any]):
+        """Inserts or replaces a record."""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the record, or None if it does not exist."""
+
+    @abstractmethod
+    def delete(self, task_id: str) -> bool:
+        """Removes a record. Returns True if it existed."""
+
+    @abstractmethod
+    def iter_records(self, status: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Iterates over all records, optionally only those with the given status."""
+
+    @abstractmethod
+    def delete_expired(self, cutoff: datetime) -> List[str]:
+        """Removes records created before `cutoff` and returns their IDs."""
+
+    @abstractmethod
+    def query(
+        self,
+        limit: int,
+        status: Optional[str] = None,
+        user_id: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        before: Optional[Tuple[datetime, str]] = None,
+        with_payload: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` records matching the filters, newest first, ordered by
+        (created_at, task_id). `before` is the key of the last record of the previous
+        page; only records strictly older than it are returned. With `with_payload`
+        False, backends may omit everything but task_id, status and timestamps.
+        """
+
+    @abstractmethod
+    def status_counts(self) -> Dict[str, int]:
+        """Returns the number of records per status, maintained incrementally (O(1) to read)."""
+
+    def pending_writes(self) -> int:
+        """Number of buffered writes not yet reflected in `status_counts`. Zero for unbuffered backends."""
+        return 0
+
+    def flush(self):
+        """Persists buffered writes. No-op for unbuffered backends."""
+
+    def close(self):
+        """Flushes and releases resources."""
+        self.flush()
+
+class _Shard:
+    """A slice of the in-memory store guarded by its own lock."""
+
+    __slots__ = ("store", "lock")
+
+    def __init__(self):
+        self.store: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.RLock()
+
+def _user_id(record: Dict[str, Any]) -> Optional[str]:
+    return (record.get("data") or {}).get("user_id")
+
+class _OrderedIndex:
+    """
+    Secondary index mapping a key (("status", s), ("user", u) or ("all", None))
+    to its (created_at, task_id) entries kept sorted, so a page is found by bisection.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Any, List[Tuple[datetime, str]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: Any, entry: Tuple[datetime, str]):
+        with self._lock:
+            bisect.insort(self._entries.setdefault(key, []), entry)
+
+    def remove(self, key: Any, entry: Tuple[datetime, str]):
+        with self._lock:
+            entries = self._entries.get(key)
+            if entries is None:
+                return
+            index = bisect.bisect_left(entries, entry)
+            if index < len(entries) and entries[index] == entry:
+                del entries[index]
+            if not entries:
+                del self._entries[key]
+
+    def size(self, key: Any) -> int:
+        with self._lock:
+            return len(self._entries.get(key, ()))
+
+    def page(self, key: Any, upper: Tuple, lower: Tuple, limit: int) -> List[Tuple[datetime, str]]:
+        """Returns up to `limit` entries below `upper` and above `lower`, largest first."""
+        with self._lock:
+            entries = self._entries.get(key, [])
+            stop = bisect.bisect_left(entries, upper)
+            start = max(bisect.bisect_right(entries, lower), stop - limit)
+            return entries[start:stop][::-1]
+
+class MemoryStateBackend(StateBackend):
+    """
+    Non-persistent backend: lock-striped shards plus a min-heap of creation times,
+    so expiry visits only expired entries. Ordered secondary indexes by status and
+    by user serve filtered, paginated queries without scanning every shard.
+    """
+
+    def __init__(self, num_shards: int = 16):
+        """
+        Args:
+            num_shards (int): Number of lock-striped shards the store is split into.
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1.")
+        self._shards = [_Shard() for _ in range(num_shards)]
+        # Min-heap of (created_at, task_id); entries for deleted tasks are skipped lazily
+        self._expiry_heap: List[Tuple[datetime, str]] = []
+        self._expiry_lock = threading.Lock()
+        self._index = _OrderedIndex()
+        self._status_counts: Counter = Counter()
+        self._counts_lock = threading.Lock()
+
+    def _shard(self, task_id: str) -> _Shard:
+        return self._shards[hash(task_id) % len(self._shards)]
+
+    def put(self, record: Dict[str, Any]):
+        task_id = record["task_id"]
+        shard = self._shard(task_id)
+        with shard.lock:
+            previous = shard.store.get(task_id)
+            is_new = previous is None
+            shard.store[task_id] = dict(record)
+            self._reindex(previous, record)
+        if is_new:
+            with self._expiry_lock:
+                heapq.heappush(self._expiry_heap, (record["created_at"], task_id))
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        shard = self._shard(task_id)
+        with shard.lock:
+            record = shard.store.get(task_id)
+            return dict(record) if record is not None else None
+
+    def _index_keys(self, record: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        return [("all", None), ("status", record["status"]), ("user", _user_id(record))]
+
+    def _reindex(self, previous: Optional[Dict[str, Any]], record: Optional[Dict[str, Any]]):
+        """Moves a record's index entries from its previous to its new version; called under its shard lock."""
+        old = {(key, (previous["created_at"], previous["task_id"])) for key in self._index_keys(previous)} \
+            if previous is not None else set()
+        new = {(key, (record["created_at"], record["task_id"])) for key in self._index_keys(record)} \
+            if record is not None else set()
+        for key, entry in old - new:
+            self._index.remove(key, entry)
+        for key, entry in new - old:
+            self._index.add(key, entry)
+
+        old_status = previous["status"] if previous is not None else None
+        new_status = record["status"] if record is not None else None
+        if old_status != new_status:
+            with self._counts_lock:
+                if old_status is not None:
+                    self._status_counts[old_status] -= 1
+                    if self._status_counts[old_status] <= 0:
+                        del self._status_counts[old_status]
+                if new_status is not None:
+                    self._status_counts[new_status] += 1
+
+    def delete(self, task_id: str) -> bool:
+        shard = self._shard(task_id)
+        with shard.lock:
+            record = shard.store.pop(task_id, None)
+            if record is not None:
+                self._reindex(record, None)
+            return record is not None
+
+    def iter_records(self, status: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        for shard in self._shards:
+            with shard.lock:
+                records = [dict(r) for r in shard.store.values() if status is None or r["status"] == status]
+            yield from records
+
+    def delete_expired(self, cutoff: datetime) -> List[str]:
+        removed = []
+        while True:
+            with self._expiry_lock:
+                if not self._expiry_heap or self._expiry_heap[0][0] > cutoff:
+                    break
+                created_at, task_id = heapq.heappop(self._expiry_heap)
+
+            shard = self._shard(task_id)
+            with shard.lock:
+                record = shard.store.get(task_id)
+                # Skip stale heap entries for tasks that were deleted (or re-created)
+                if record is None or record["created_at"] != created_at:
+                    continue
+                del shard.store[task_id]
+                self._reindex(record, None)
+            removed.append(task_id)
+        return removed
+
+    def query(
+        self,
+        limit: int,
+        status: Optional[str] = None,
+        user_id: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        before: Optional[Tuple[datetime, str]] = None,
+        with_payload: bool = True
+    ) -> List[Dict[str, Any]]:
+        # Walk the most selective index; the other filters are checked per record
+        keys = [("all", None)]
+        if status is not None:
+            keys.append(("status", status))
+        if user_id is not None:
+            keys.append(("user", user_id))
+        key = min(keys, key=self._index.size)
+
+        upper: Tuple = before if before is not None else (datetime.max, "")
+        if created_before is not None and (created_before, "") < upper:
+            upper = (created_before, "")
+        lower: Tuple = (created_after, "\uffff") if created_after is not None else (datetime.min, "")
+
+        results: List[Dict[str, Any]] = []
+        while len(results) < limit:
+            entries = self._index.page(key, upper, lower, limit)
+            if not entries:
+                break
+            for created_at, task_id in entries:
+                record = self.get(task_id)
+                # Index entries are read without the shard lock; re-check the record itself
+                if (record is None or record["created_at"] != created_at
+                        or (status is not None and record["status"] != status)
+                        or (user_id is not None and _user_id(record) != user_id)):
+                    continue
+                results.append(record)
+                if len(results) == limit:
+                    break
+            upper = entries[-1]
+        return results
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._counts_lock:
+            return dict(self._status_counts)
+
+def _to_epoch(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+def _from_epoch(value: float) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+
+_DELETED = object()
+
+class SQLiteStateBackend(StateBackend):
+    """
+    Persistent backend on an embedded SQLite database in WAL mode.
+
+    Writes are buffered and committed in batches by a background flusher thread
+    (or as soon as `batch_size` writes are pending), and reads see buffered writes
+    immediately. Per-status counts are loaded once with a GROUP BY and adjusted as
+    each batch commits, so they miss writes made by other processes. Only a bounded
+    LRU cache of records written by this process is kept in memory. Several worker
+    processes can open the same database file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        cache_size: int = 10_000
+    ):
+        """
+        Args:
+            path (str): Database file path (created if missing).
+            batch_size (int): Pending writes that trigger an immediate flush.
+            flush_interval (float): Maximum seconds a write stays buffered.
+            cache_size (int): Maximum records held in the in-memory read cache.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        self._write_conn = self._connect()
+        self._write_lock = threading.Lock()
+        self._init_schema()
+        self._counts: Dict[str, int] = dict(self._write_conn.execute(
+            "SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        self._counts_lock = threading.Lock()
+
+        self._pending: Dict[str, Any] = {}
+        self._pending_lock = threading.Lock()
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="state-flusher", daemon=True)
+        self._flusher.start()
+        logger.info("SQLite state backend opened at %s", path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _read_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _init_schema(self):
+        with self._write_lock:
+            self._write_conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    user_id TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    payload TEXT NOT NULL
+                );
+                DROP INDEX IF EXISTS idx_tasks_created_at;
+                CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks (created_at, task_id);
+                CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+                CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks (status, created_at, task_id);
+                CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at, task_id);
+                """
+            )
+
+    @staticmethod
+    def _serialize(record: Dict[str, Any]) -> tuple:
+        payload = {k: v for k, v in record.items()
+                   if k not in ("task_id", "status", "created_at", "updated_at")}
+        user_id = (record.get("data") or {}).get("user_id")
+        return (
+            record["task_id"],
+            record["status"],
+            user_id,
+            _to_epoch(record["created_at"]),
+            _to_epoch(record["updated_at"]),
+            json.dumps(payload, default=str)
+        )
+
+    @staticmethod
+    def _deserialize(row: tuple) -> Dict[str, Any]:
+        task_id, status, _, created_at, updated_at, payload = row
+        record = json.loads(payload)
+        record.update({
+            "task_id": task_id,
+            "status": status,
+            "created_at": _from_epoch(created_at),
+            "updated_at": _from_epoch(updated_at)
+        })
+        return record
+
+    def _cache_put(self, task_id: str, record: Dict[str, Any]):
+        with self._cache_lock:
+            self._cache[task_id] = record
+            self._cache.move_to_end(task_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def put(self, record: Dict[str, Any]):
+        record = dict(record)
+        task_id = record["task_id"]
+        with self._pending_lock:
+            self._pending[task_id] = record
+            pending = len(self._pending)
+        self._cache_put(task_id, record)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._pending_lock:
+            pending = self._pending.get(task_id)
+        if pending is _DELETED:
+            return None
+        if pending is not None:
+            return dict(pending)
+
+        with self._cache_lock:
+            cached = self._cache.get(task_id)
+            if cached is not None:
+                self._cache.move_to_end(task_id)
+                return dict(cached)
+
+        row = self._read_conn().execute(
+            "SELECT task_id, status, user_id, created_at, updated_at, payload FROM tasks WHERE task_id = ?",
+            (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        # Rows read back are not cached: another worker process may own and update them
+        return self._deserialize(row)
+
+    def delete(self, task_id: str) -> bool:
+        existed = self.get(task_id) is not None
+        with self._pending_lock:
+            self._pending[task_id] = _DELETED
+        with self._cache_lock:
+            self._cache.pop(task_id, None)
+        self._wakeup.set()
+        return existed
+
+    def iter_records(self, status: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        self.flush()
+        query = "SELECT task_id, status, user_id, created_at, updated_at, payload FROM tasks"
+        params: tuple = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        for row in self._read_conn().execute(query, params):
+            yield self._deserialize(row)
+
+    def delete_expired(self, cutoff: datetime) -> List[str]:
+        self.flush()
+        cutoff_epoch = _to_epoch(cutoff)
+        with self._write_lock:
+            conn = self._write_conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT task_id, status FROM tasks WHERE created_at <= ?", (cutoff_epoch,)
+                ).fetchall()
+                conn.execute("DELETE FROM tasks WHERE created_at <= ?", (cutoff_epoch,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._adjust_counts((status, None) for _, status in rows)
+        expired = [task_id for task_id, _ in rows]
+        with self._cache_lock:
+            for task_id in expired:
+                self._cache.pop(task_id, None)
+        return expired
+
+    def query(
+        self,
+        limit: int,
+        status: Optional[str] = None,
+        user_id: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        before: Optional[Tuple[datetime, str]] = None,
+        with_payload: bool = True
+    ) -> List[Dict[str, Any]]:
+        self.flush()
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if created_after is not None:
+            conditions.append("created_at > ?")
+            params.append(_to_epoch(created_after))
+        if created_before is not None:
+            conditions.append("created_at < ?")
+            params.append(_to_epoch(created_before))
+        if before is not None:
+            conditions.append("(created_at, task_id) < (?, ?)")
+            params.extend((_to_epoch(before[0]), before[1]))
+
+        # Summaries skip reading and decoding the JSON payload (details, trace)
+        payload = "payload" if with_payload else "'{}'"
+        query = f"SELECT task_id, status, user_id, created_at, updated_at, {payload} FROM tasks"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, task_id DESC LIMIT ?"
+        params.append(limit)
+        return [self._deserialize(row) for row in self._read_conn().execute(query, params)]
+
+    def flush(self):
+        """
+        Commits all buffered writes in a single transaction.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+
+            upserts = [self._serialize(r) for r in batch.values() if r is not _DELETED]
+            deletes = [(task_id,) for task_id, r in batch.items() if r is _DELETED]
+            conn = self._write_conn
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                previous = self._stored_statuses(list(batch))
+                if upserts:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO tasks (task_id, status, user_id, created_at, updated_at, payload) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        upserts
+                    )
+                if deletes:
+                    conn.executemany("DELETE FROM tasks WHERE task_id = ?", deletes)
+                conn.execute("COMMIT")
+            except Exception as e:
+                conn.execute("ROLLBACK")
+                # Put the batch back unless newer writes superseded it
+                with self._pending_lock:
+                    for task_id, record in batch.items():
+                        self._pending.setdefault(task_id, record)
+                logger.error("Failed to flush %d task writes: %s", len(batch), e)
+                raise
+            self._adjust_counts((previous.get(task_id), None if record is _DELETED else record["status"])
+                                for task_id, record in batch.items())
+
+    def _stored_statuses(self, task_ids: List[str]) -> Dict[str, str]:
+        """Reads the committed status of the given tasks; called inside the flush transaction."""
+        statuses = {}
+        for start in range(0, len(task_ids), 500):
+            chunk = task_ids[start:start + 500]
+            statuses.update(self._write_conn.execute(
+                f"SELECT task_id, status FROM tasks WHERE task_id IN ({','.join('?' * len(chunk))})", chunk))
+        return statuses
+
+    def _adjust_counts(self, transitions: Iterable[Tuple[Optional[str], Optional[str]]]):
+        """Applies (old status, new status) transitions, where None means the record is absent."""
+        with self._counts_lock:
+            for old, new in transitions:
+                if old == new:
+                    continue
+                if old is not None:
+                    remaining = self._counts.get(old, 0) - 1
+                    if remaining > 0:
+                        self._counts[old] = remaining
+                    else:
+                        self._counts.pop(old, None)
+                if new is not None:
+                    self._counts[new] = self._counts.get(new, 0) + 1
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._counts_lock:
+            return dict(self._counts)
+
+    def pending_writes(self) -> int:
+        with self._pending_lock:
+            return len(self._pending)
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass  # Logged by flush; retried on the next tick
+
+    def close(self):
+        self._stop.set()
+        self._wakeup.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            self._write_conn.close()
@@ -1,56 +1,73 @@
 # Keeps track of session/task states
 # Includes persistent storage and context management.
+import base64
+import json
+import os
 import threading
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 import uuid
 
-# Set up logging for debugging and audit purposes
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+from core.state_backends import StateBackend, MemoryStateBackend, SQLiteStateBackend
+
 logger = logging.getLogger("state_manager")
 
 class StateManager:
     """
     A thread-safe manager for handling task and session states.
-    In-memory storage is used by default, with an option to extend for database persistence.
+    Storage is delegated to a pluggable StateBackend: an in-memory, lock-striped
+    store by default, or a persistent SQLite store (see core.state_backends).
+    Expiry is handled by the backend's creation-time index, so each cleanup pass
+    is O(expired) rather than a scan of every task.
     """
 
-    def __init__(self, task_expiry_minutes: int = 60):
+    DEFAULT_LOCK_STRIPES = 16
+
+    def __init__(self, task_expiry_minutes: int = 60, backend: Optional[StateBackend] = None,
+                 lock_stripes: int = DEFAULT_LOCK_STRIPES):
         """
         Initializes the StateManager.
         Args:
             task_expiry_minutes (int): Duration (in minutes) after which tasks will expire.
+            backend (Optional[StateBackend]): Record storage; defaults to MemoryStateBackend.
+            lock_stripes (int): Number of locks serializing read-modify-write updates per task.
         """
-        self._state_store: Dict[str, Dict[str, Any]] = {}
-        self._lock = threading.RLock()
+        self.backend = backend or MemoryStateBackend()
         self.task_expiry_minutes = task_expiry_minutes
-        logger.info("StateManager initialized with task expiry of %d minutes.", task_expiry_minutes)
+        self._locks = [threading.Lock() for _ in range(max(lock_stripes, 1))]
+
+        self._reaper: Optional[threading.Thread] = None
+        self._reaper_stop = threading.Event()
+        logger.info("StateManager initialized with %s and task expiry of %d minutes.",
+                    type(self.backend).__name__, task_expiry_minutes)
+
+    def _lock(self, task_id: str) -> threading.Lock:
+        return self._locks[hash(task_id) % len(self._locks)]
 
-    def create_task(self, task_data: Dict[str, Any]) -> str:
+    def create_task(self, task_data: Dict[str, Any], status: str = "created") -> str:
         """
         Creates and stores the initial state for a new task.
         Args:
             task_data (Dict[str, Any]): Metadata for the task to store (e.g., description, user_id).
+            status (str): Initial status of the task (default: "created").
         Returns:
             str: Unique task ID for this task.
         """
-        with self._lock:
-            # Generate a unique task ID
-            task_id = f"task_{uuid.uuid4().hex}"
-            state_entry = {
-                "task_id": task_id,
-                "data": task_data,
-                "status": "created",
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-            self._state_store[task_id] = state_entry
-            logger.info("Task created: %s", task_id)
-            return task_id
+        # Generate a unique task ID
+        task_id = f"task_{uuid.uuid4().hex}"
+        now = datetime.utcnow()
+        state_entry = {
+            "task_id": task_id,
+            "data": task_data,
+            "status": status,
+            "details": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        self.backend.put(state_entry)
+        logger.info("Task created: %s", task_id)
+        return task_id
 
     def update_task_status(self, task_id: str, status: str, details: Optional[Dict[str, Any]] = None):
         """
@@ -62,16 +79,34 @@ class StateManager:
         Raises:
             KeyError: If the task ID does not exist.
         """
-        with self._lock:
-            if task_id not in self._state_store:
+        with self._lock(task_id):
+            entry = self.backend.get(task_id)
+            if entry is None:
                 logger.error("Task ID not found: %s", task_id)
                 raise KeyError(f"Task ID {task_id} not found.")
 
             # Update the task's status and details
-            self._state_store[task_id]["status"] = status
-            self._state_store[task_id]["details"] = details or {}
-            self._state_store[task_id]["updated_at"] = datetime.utcnow()
-            logger.info("Task %s updated to status '%s'.", task_id, status)
+            entry["status"] = status
+            entry["details"] = details or {}
+            entry["updated_at"] = datetime.utcnow()
+            self.backend.put(entry)
+        logger.info("Task %s updated to status '%s'.", task_id, status)
+
+    def set_task_trace(self, task_id: str, trace: Dict[str, Any]):
+        """
+        Stores the span tree recorded while the task ran.
+        Args:
+            task_id (str): Unique ID of the task.
+            trace (Dict[str, Any]): Trace as returned by Trace.to_dict().
+        Raises:
+            KeyError: If the task ID does not exist.
+        """
+        with self._lock(task_id):
+            entry = self.backend.get(task_id)
+            if entry is None:
+                raise KeyError(f"Task ID {task_id} not found.")
+            entry["trace"] = trace
+            self.backend.put(entry)
 
     def get_task(self, task_id: str) -> Dict[str, Any]:
         """
@@ -79,30 +114,74 @@ class StateManager:
         Args:
             task_id (str): Unique ID of the task to retrieve.
         Returns:
-            Dict[str, Any]: The task's state.
+            Dict[str, Any]: A copy of the task's state.
         Raises:
             KeyError: If the task ID does not exist.
         """
-        with self._lock:
-            if task_id not in self._state_store:
-                logger.error("Task ID not found: %s", task_id)
-                raise KeyError(f"Task ID {task_id} not found.")
-            return self._state_store[task_id]
+        entry = self.backend.get(task_id)
+        if entry is None:
+            logger.error("Task ID not found: %s", task_id)
+            raise KeyError(f"Task ID {task_id} not found.")
+        return entry
 
-    def clean_expired_tasks(self):
+    def clean_expired_tasks(self) -> int:
         """
         Removes tasks that have passed their expiration time.
         This feature is useful to prevent memory bloat in long-running applications.
+        Returns:
+            int: Number of tasks removed.
         """
-        with self._lock:
-            now = datetime.utcnow()
-            expired_tasks = [
-                task_id for task_id, task_data in self._state_store.items()
-                if now - task_data["created_at"] > timedelta(minutes=self.task_expiry_minutes)
-            ]
-            for task_id in expired_tasks:
-                del self._state_store[task_id]
-                logger.info("Expired task cleaned: %s", task_id)
+        cutoff = datetime.utcnow() - timedelta(minutes=self.task_expiry_minutes)
+        expired = self.backend.delete_expired(cutoff)
+        for task_id in expired:
+            logger.info("Expired task cleaned: %s", task_id)
+        return len(expired)
+
+    def recover_interrupted_tasks(self, statuses=("created", "in_progress")) -> int:
+        """
+        Marks tasks left unfinished by a previous process as failed.
+        Intended to run once at startup with a persistent backend used by a single worker.
+        Returns:
+            int: Number of tasks marked as failed.
+        """
+        interrupted = [record["task_id"] for status in statuses
+                       for record in self.backend.iter_records(status=status)]
+        for task_id in interrupted:
+            try:
+                self.update_task_status(task_id, "failed", {"error": "Interrupted by server restart"})
+            except KeyError:
+                continue
+        if interrupted:
+            logger.warning("Marked %d interrupted tasks as failed.", len(interrupted))
+        return len(interrupted)
+
+    def start_reaper(self, interval_seconds: float = 30.0):
+        """
+        Starts a daemon thread that calls clean_expired_tasks every `interval_seconds`.
+        """
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        self._reaper_stop.clear()
+
+        def run():
+            while not self._reaper_stop.wait(interval_seconds):
+                try:
+                    self.clean_expired_tasks()
+                except Exception as e:
+                    logger.error("Expired task cleanup failed: %s", e)
+
+        self._reaper = threading.Thread(target=run, name="state-reaper", daemon=True)
+        self._reaper.start()
+        logger.info("Expiry reaper started (every %.1fs).", interval_seconds)
+
+    def stop_reaper(self, timeout: Optional[float] = None):
+        """
+        Stops the background reaper thread if it is running.
+        """
+        self._reaper_stop.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout)
+            self._reaper = None
 
     def list_all_tasks(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -110,8 +189,73 @@ class StateManager:
         Returns:
             Dict[str, Dict[str, Any]]: All stored tasks with their details.
         """
-        with self._lock:
-            return self._state_store.copy()
+        return {record["task_id"]: record for record in self.backend.iter_records()}
+
+    def query_tasks(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        user_id: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        with_payload: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Returns one page of tasks, newest first, using the backend's secondary indexes.
+        Args:
+            limit (int): Maximum tasks in the page.
+            cursor (Optional[str]): Opaque cursor from the previous page; None for the first page.
+            status (Optional[str]): Only tasks with this status.
+            user_id (Optional[str]): Only tasks submitted by this user.
+            created_after (Optional[datetime]): Only tasks created after this time (naive UTC).
+            created_before (Optional[datetime]): Only tasks created before this time (naive UTC).
+            with_payload (bool): Whether "data", "details" and "trace" are needed.
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The tasks and the cursor of the next
+            page, or None when this is the last page.
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        records = self.backend.query(
+            limit + 1,
+            status=status,
+            user_id=user_id,
+            created_after=created_after,
+            created_before=created_before,
+            before=decode_cursor(cursor) if cursor else None,
+            with_payload=with_payload
+        )
+        if len(records) <= limit:
+            return records, None
+        records = records[:limit]
+        return records, encode_cursor(records[-1])
+
+    def iter_tasks(self, page_size: int = 500, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Yields every task matching the filters of `query_tasks`, newest first, one
+        page at a time so that memory stays bounded by `page_size`.
+        """
+        cursor = None
+        while True:
+            records, cursor = self.query_tasks(limit=page_size, cursor=cursor, **filters)
+            yield from records
+            if cursor is None:
+                return
+
+    def count_tasks(self) -> Dict[str, int]:
+        """
+        Returns the number of tasks per status. The counts are maintained by the
+        backend on every write, so this does not scan the store.
+        """
+        return self.backend.status_counts()
+
+    def pending_writes(self) -> int:
+        """
+        Returns the number of buffered writes not yet reflected in `count_tasks`; with
+        the SQLite backend the counts trail writes by at most one flush interval.
+        """
+        return self.backend.pending_writes()
 
     def delete_task(self, task_id: str):
         """
@@ -121,9 +265,76 @@ class StateManager:
         Raises:
             KeyError: If the task ID does not exist.
         """
-        with self._lock:
-            if task_id not in self._state_store:
+        with self._lock(task_id):
+            if not self.backend.delete(task_id):
                 logger.error("Task ID not found: %s", task_id)
                 raise KeyError(f"Task ID {task_id} not found.")
-            del self._state_store[task_id]
-            logger.info("Task deleted: %s", task_id)
\ No newline at end of file
+        logger.info("Task deleted: %s", task_id)
+
+    def close(self):
+        """
+        Stops the reaper and flushes/closes the backend.
+        """
+        self.stop_reaper(timeout=5)
+        self.backend.close()
+
+def encode_cursor(record: Dict[str, Any]) -> str:
+    """Encodes a record's (created_at, task_id) position as an opaque page cursor."""
+    position = json.dumps([record["created_at"].isoformat(), record["task_id"]])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decodes a cursor produced by encode_cursor.
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), str(task_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+_state_manager: Optional[StateManager] = None
+_state_manager_lock = threading.Lock()
+
+def create_state_backend_from_env() -> StateBackend:
+    """
+    Builds the backend selected by TASK_STORE_BACKEND ("sqlite" or "memory").
+    """
+    kind = os.getenv("TASK_STORE_BACKEND", "sqlite").lower()
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind == "sqlite":
+        return SQLiteStateBackend(
+            os.getenv("TASK_STORE_PATH", os.path.join("data", "tasks.db")),
+            batch_size=int(os.getenv("TASK_STORE_BATCH_SIZE", "100")),
+            flush_interval=float(os.getenv("TASK_STORE_FLUSH_INTERVAL", "0.05")),
+            cache_size=int(os.getenv("TASK_STORE_CACHE_SIZE", "10000"))
+        )
+    raise ValueError(f"Unknown TASK_STORE_BACKEND: {kind}")
+
+def get_state_manager() -> StateManager:
+    """
+    Returns the process-wide StateManager used by the API routes.
+    """
+    global _state_manager
+    if _state_manager is None:
+        with _state_manager_lock:
+            if _state_manager is None:
+                _state_manager = StateManager(
+                    task_expiry_minutes=int(os.getenv("TASK_EXPIRY_MINUTES", "1440")),
+                    backend=create_state_backend_from_env()
+                )
+    return _state_manager
+
+def close_state_manager():
+    """
+    Closes the process-wide StateManager (flushing pending writes); the next
+    get_state_manager() call opens a fresh one.
+    """
+    global _state_manager
+    with _state_manager_lock:
+        if _state_manager is not None:
+            _state_manager.close()
+            _state_manager = None
@@ -0,0 +1,170 @@
+# Per-task progress events
+# Fans out orchestration progress to any number of streaming subscribers.
+# The bus is in-process: it only sees tasks running in this worker (see `is_local`);
+# the task routes follow tasks running in other workers through the state manager.
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger("task_events")
+
+# Event types that end a task's stream
+TERMINAL_EVENTS = {"completed", "failed"}
+
+class Subscription:
+    """
+    A single consumer's view of a task's event stream.
+    Each subscription has a bounded queue; when a slow consumer falls behind, its
+    oldest undelivered events are dropped (counted in `dropped`) instead of
+    blocking the orchestrator or growing memory without bound.
+    """
+
+    def __init__(self, bus: "TaskEventBus", task_id: str, max_queue_size: int):
+        self.bus = bus
+        self.task_id = task_id
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self.closed = False
+
+    def _offer(self, event: Dict[str, Any]):
+        if self.closed:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            if self.dropped > self.bus.max_dropped:
+                logger.warning("Disconnecting slow subscriber for task %s after %d dropped events",
+                               self.task_id, self.dropped)
+                self.closed = True
+                self.queue.put_nowait({"task_id": self.task_id, "type": "disconnected",
+                                       "data": {"reason": "slow consumer", "dropped": self.dropped}})
+                return
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Waits for the next event. Returns None if `timeout` elapses first.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            while True:
+                event = await self.queue.get()
+                yield event
+                if event["type"] in TERMINAL_EVENTS or event["type"] == "disconnected":
+                    return
+        finally:
+            self.close()
+
+    def close(self):
+        self.closed = True
+        self.bus._unsubscribe(self)
+
+class TaskEventBus:
+    """
+    In-process publish/subscribe hub for task progress events.
+    Must be used from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 100,
+        history_size: int = 200,
+        retention_seconds: float = 300.0,
+        max_dropped: int = 1000
+    ):
+        """
+        Args:
+            max_queue_size (int): Undelivered events buffered per subscriber.
+            history_size (int): Events kept per task and replayed to late subscribers.
+            retention_seconds (float): How long a finished task's history is kept.
+            max_dropped (int): Dropped events after which a slow subscriber is disconnected.
+        """
+        self.max_queue_size = max_queue_size
+        self.history_size = history_size
+        self.retention_seconds = retention_seconds
+        self.max_dropped = max_dropped
+        self._history: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._sequence: Dict[str, int] = {}
+
+    def register(self, task_id: str):
+        """
+        Marks a task as running in this process, before its first event is published.
+        """
+        self._sequence.setdefault(task_id, 0)
+
+    def is_local(self, task_id: str) -> bool:
+        """
+        Whether the task's events are published on this bus: it was registered or has
+        published here and its history has not expired yet.
+        """
+        return task_id in self._sequence
+
+    def publish(self, task_id: str, event_type: str, data: Optional[Dict[str, Any]] = None):
+        """
+        Records an event for a task and delivers it to all current subscribers.
+        Args:
+            task_id (str): Task the event belongs to.
+            event_type (str): e.g. "planned", "subtask_started", "tool_result", "subtask_failed",
+                "completed" or "failed".
+            data (Optional[Dict[str, Any]]): Event payload.
+        """
+        seq = self._sequence.get(task_id, 0) + 1
+        self._sequence[task_id] = seq
+        event = {
+            "task_id": task_id,
+            "seq": seq,
+            "type": event_type,
+            "timestamp": time.time(),
+            "data": data or {}
+        }
+
+        history = self._history.get(task_id)
+        if history is None:
+            history = self._history[task_id] = deque(maxlen=self.history_size)
+        history.append(event)
+
+        for subscription in list(self._subscribers.get(task_id, ())):
+            subscription._offer(event)
+
+        if event_type in TERMINAL_EVENTS:
+            asyncio.get_running_loop().call_later(self.retention_seconds, self._forget, task_id)
+
+    def subscribe(self, task_id: str) -> Subscription:
+        """
+        Creates a subscription that first replays the task's recorded history.
+        """
+        subscription = Subscription(self, task_id, max(self.max_queue_size, 1))
+        for event in self._history.get(task_id, ()):
+            subscription._offer(event)
+        self._subscribers.setdefault(task_id, set()).add(subscription)
+        return subscription
+
+    def history(self, task_id: str) -> List[Dict[str, Any]]:
+        return list(self._history.get(task_id, ()))
+
+    def subscriber_count(self, task_id: Optional[str] = None) -> int:
+        if task_id is not None:
+            return len(self._subscribers.get(task_id, ()))
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def _unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.task_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.task_id]
+
+    def _forget(self, task_id: str):
+        self._history.pop(task_id, None)
+        self._sequence.pop(task_id, None)
+
+# Process-wide bus used by the task routes
+task_event_bus = TaskEventBus()
@@ -1,14 +1,12 @@
 # GPT-4 task planner logic
 # Placeholder for decomposing tasks into subtasks using GPT-based NLP models like OpenAI.
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 import openai
 
-# Set up logging for debugging and monitoring
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+from core.plan_cache import PlanCache
+from core.tracing import traced
+
 logger = logging.getLogger("task_planner")
 
 class TaskPlannerError(Exception):
@@ -20,14 +18,17 @@ class TaskPlanner:
     Task planner to break down high-level tasks into smaller subtasks using OpenAI GPT.
     """
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, plan_cache: Optional[PlanCache] = None):
         """
         Initializes the Task Planner with the OpenAI API key.
         Args:
             api_key (str): API key for OpenAI GPT or similar services.
+            plan_cache (Optional[PlanCache]): Cache consulted before calling the model.
         """
         self.api_key = api_key
-        openai.api_key = self.api_key
+        self.plan_cache = plan_cache
+        self._client = None  # Created on first sync call
+        self._async_client = None  # Created on first async call
 
     def decompose_task(self, high_level_task: str) -> List[Dict[str, str]]:
         """
@@ -38,31 +39,93 @@ class TaskPlanner:
         Returns:
             List[Dict[str, str]]: A list of subtasks with metadata.
         """
+        if self.plan_cache is not None:
+            cached = self.plan_cache.get(high_level_task)
+            if cached is not None:
+                logger.info("Serving task plan from cache")
+                return cached
+
         try:
-            logger.info(f"Decomposing task: {high_level_task}")
+            logger.info("Decomposing task: %s", high_level_task)
 
             # Prompt for GPT to generate subtasks
             prompt = self._generate_task_prompt(high_level_task)
 
             # Call OpenAI GPT API
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[{"role": "system", "content": "You are an expert task planner."},
-                          {"role": "user", "content": prompt}],
-                temperature=0.7
-            )
-
-            # Extract subtasks from the GPT response
-            task_plan = response["choices"][0]["message"]["content"]
+            task_plan = self._complete(prompt)
             subtasks = self._parse_subtasks(task_plan)
 
-            logger.info(f"Successfully decomposed task into {len(subtasks)} subtasks")
+            logger.info("Successfully decomposed task into %s subtasks", len(subtasks))
+            if self.plan_cache is not None:
+                self.plan_cache.put(high_level_task, subtasks)
             return subtasks
 
         except Exception as e:
-            logger.error(f"Error during task decomposition: {str(e)}")
+            logger.error("Error during task decomposition: %s", e)
             raise TaskPlannerError(f"Failed to decompose task: {str(e)}")
 
+    async def decompose_task_async(self, high_level_task: str) -> List[Dict[str, str]]:
+        """
+        Non-blocking variant of decompose_task for use on the event loop.
+        Args:
+            high_level_task (str): The task in human-readable natural language.
+
+        Returns:
+            List[Dict[str, str]]: A list of subtasks with metadata.
+        """
+        if self.plan_cache is not None:
+            cached = self.plan_cache.get(high_level_task)
+            if cached is not None:
+                logger.info("Serving task plan from cache")
+                return cached
+
+        try:
+            logger.info("Decomposing task: %s", high_level_task)
+
+            prompt = self._generate_task_prompt(high_level_task)
+
+            task_plan = await self._complete_async(prompt)
+            subtasks = self._parse_subtasks(task_plan)
+
+            logger.info("Successfully decomposed task into %s subtasks", len(subtasks))
+            if self.plan_cache is not None:
+                self.plan_cache.put(high_level_task, subtasks)
+            return subtasks
+
+        except Exception as e:
+            logger.error("Error during task decomposition: %s", e)
+            raise TaskPlannerError(f"Failed to decompose task: {str(e)}")
+
+    @traced("llm")
+    def _complete(self, prompt: str) -> str:
+        """
+        Sends the planning prompt to the model and returns the raw plan text.
+        """
+        if self._client is None:
+            self._client = openai.OpenAI(api_key=self.api_key)
+        response = self._client.chat.completions.create(
+            model="gpt-4",
+            messages=[{"role": "system", "content": "You are an expert task planner."},
+                      {"role": "user", "content": prompt}],
+            temperature=0.7
+        )
+        return response.choices[0].message.content
+
+    @traced("llm")
+    async def _complete_async(self, prompt: str) -> str:
+        """
+        Awaitable variant of `_complete`.
+        """
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(api_key=self.api_key)
+        response = await self._async_client.chat.completions.create(
+            model="gpt-4",
+            messages=[{"role": "system", "content": "You are an expert task planner."},
+                      {"role": "user", "content": prompt}],
+            temperature=0.7
+        )
+        return response.choices[0].message.content
+
     def _generate_task_prompt(self, high_level_task: str) -> str:
         """
         Generates a prompt to feed into the GPT API for task decomposition.
@@ -78,10 +141,19 @@ class TaskPlanner:
             f"Please break this task down into smaller, actionable subtasks. "
             f"The response should be a JSON list where each subtask includes the following fields:\n"
             f"- 'step': Description of the subtask.\n"
-            f"- 'tool': Recommended tool or API to execute the subtask (if applicable).\n\n"
+            f"- 'tool': Recommended tool or API to execute the subtask (if applicable).\n"
+            f"- 'action': Operation to perform with the tool. For 'zomato' use 'search' "
+            f"(params: 'query', optional 'lat', 'lon', 'count'), 'details' (params: 'restaurant_id') "
+            f"or 'order' (params: 'restaurant_id', 'items' mapping item names to quantities).\n"
+            f"- 'params': Object with the action's parameters.\n"
+            f"- 'id' (optional): Short identifier other subtasks can refer to.\n"
+            f"- 'depends_on' (optional): List of ids of earlier subtasks that must finish first. "
+            f"Subtasks without dependencies may run in parallel.\n\n"
             f"For example:\n"
-            f"[{{'step': 'Find restaurants offering pizza', 'tool': 'zomato'}}, "
-            f"{{'step': 'Place order on Zomato', 'tool': 'zomato'}}]"
+            f"[{{'id': 'find', 'step': 'Find restaurants offering pizza', 'tool': 'zomato', "
+            f"'action': 'search', 'params': {{'query': 'pizza'}}}}, "
+            f"{{'step': 'Place order on Zomato', 'tool': 'zomato', 'action': 'order', "
+            f"'params': {{'restaurant_id': 123, 'items': {{'margherita': 1}}}}, 'depends_on': ['find']}}]"
         )
 
     def _parse_subtasks(self, task_plan: str) -> List[Dict[str, str]]:
@@ -106,5 +178,5 @@ class TaskPlanner:
             return subtasks
 
         except Exception as e:
-            logger.error(f"Error parsing subtasks: {str(e)}")
+            logger.error("Error parsing subtasks: %s", e)
             raise TaskPlannerError(f"Failed to parse subtasks: {str(e)}")
\ No newline at end of file
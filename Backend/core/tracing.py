@@ -0,0 +1,277 @@
+# Per-task tracing
+# Records a tree of timed spans (planning, subtasks, retry attempts, HTTP calls)
+# for each sampled task. The active span lives in a context variable, so it follows
+# the work across awaits, asyncio tasks and asyncio.to_thread without being passed
+# around. Finished traces are stored with the task and can be exported as OTLP JSON.
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("tracing")
+
+SERVICE_NAME = "agentic-assistant"
+
+class Span:
+    """
+    One timed operation within a trace.
+    """
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.status_message: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = "error"
+        self.status_message = message
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace._finish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        end_ns = self.end_ns or time.time_ns()
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_ns / 1e9,
+            "duration_ms": round((end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+            **({"status_message": self.status_message} if self.status_message else {})
+        }
+
+class Trace:
+    """
+    Collects the finished spans of one trace. Spans may finish on any thread.
+    """
+
+    def __init__(self, max_spans: int = 500):
+        self.trace_id = os.urandom(16).hex()
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def _finish(self, span: Span):
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the trace as a span tree: each span lists its children, ordered by start time.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start_ns)
+        nodes = {span.span_id: {**span.to_dict(), "children": []} for span in spans}
+        roots = []
+        for span in spans:
+            parent = nodes.get(span.parent_id) if span.parent_id else None
+            (parent["children"] if parent is not None else roots).append(nodes[span.span_id])
+        return {"trace_id": self.trace_id, "spans": roots, "span_count": len(spans), "dropped_spans": self.dropped}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """
+        Returns the trace as an OTLP/JSON ExportTraceServiceRequest.
+        """
+        def attribute(key: str, value: Any) -> Dict[str, Any]:
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        with self._lock:
+            spans = list(self.spans)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "core.tracing"},
+                "spans": [{
+                    "traceId": self.trace_id,
+                    "spanId": span.span_id,
+                    **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [attribute(key, value) for key, value in span.attributes.items()],
+                    "status": {"code": 2, "message": span.status_message or ""} if span.status == "error" else {"code": 1}
+                } for span in spans]
+            }]
+        }]}
+
+class OTLPFileExporter:
+    """
+    Appends each finished trace to a file as one OTLP/JSON line, the format read by
+    the OpenTelemetry Collector's file receiver. Writes happen on a background thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+
+    def export(self, trace: Trace):
+        self._executor.submit(self._write, trace.to_otlp())
+
+    def _write(self, document: Dict[str, Any]):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(document, separators=(",", ":")) + "\n")
+        except OSError as e:
+            logger.warning("Could not export trace to %s: %s", self.path, e)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+class Tracer:
+    """
+    Starts sampled traces and the spans within them. When no trace is active,
+    `span` does nothing, so instrumented code costs almost nothing outside traced tasks.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, exporter: Optional[OTLPFileExporter] = None, max_spans: int = 500):
+        """
+        Args:
+            sample_rate (float): Fraction of traces recorded (0 to 1).
+            exporter (Optional[OTLPFileExporter]): Receives every finished trace.
+            max_spans (int): Spans kept per trace; later spans are counted but dropped.
+        """
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.max_spans = max_spans
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """
+        Builds a tracer from TRACE_SAMPLE_RATE, TRACE_EXPORT_PATH and TRACE_MAX_SPANS.
+        Export is disabled unless TRACE_EXPORT_PATH is set.
+        """
+        path = os.getenv("TRACE_EXPORT_PATH")
+        return cls(
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+            exporter=OTLPFileExporter(path) if path else None,
+            max_spans=int(os.getenv("TRACE_MAX_SPANS", "500"))
+        )
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes) -> Iterator[Optional[Trace]]:
+        """
+        Opens a new trace with a root span, or yields None when the trace is not sampled.
+        The trace is exported when the block exits.
+        """
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            yield None
+            return
+        trace = Trace(self.max_spans)
+        with self._span(trace, name, None, attributes):
+            yield trace
+        if self.exporter is not None:
+            self.exporter.export(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """
+        Opens a child of the current span; a no-op yielding None outside a trace.
+        Exceptions escaping the block mark the span as failed.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        with self._span(parent.trace, name, parent.span_id, attributes) as span:
+            yield span
+
+    @contextmanager
+    def _span(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Iterator[Span]:
+        span = Span(trace, name, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def close(self):
+        if self.exporter is not None:
+            self.exporter.close()
+
+def current_span() -> Optional[Span]:
+    """Returns the active span, or None outside a trace."""
+    return _current_span.get()
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+def get_tracer() -> Tracer:
+    """
+    Returns the process-wide tracer.
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer.from_env()
+    return _tracer
+
+def close_tracer():
+    """Flushes pending exports; the next call to get_tracer builds a new tracer."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.close()
+            _tracer = None
+
+def traced(name: str) -> Callable:
+    """
+    Decorator wrapping plain or coroutine functions in a span named `name`.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,254 @@
+# Transcription cache
+# Content-addressed on-disk cache of transcription results, so re-sent voice clips
+# are answered without decoding chunks through the ASR backend again.
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+
+from core.audio_normalizer import NormalizedAudio
+
+logger = logging.getLogger("transcription_cache")
+
+def audio_fingerprint(audio: NormalizedAudio) -> str:
+    """
+    Hashes normalized samples, so the same clip matches regardless of container,
+    source sample rate or channel layout.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(str(audio.sample_rate).encode())
+    digest.update(memoryview(np.ascontiguousarray(audio.samples)).cast("B"))
+    return digest.hexdigest()
+
+class TranscriptionCache:
+    """
+    Stores one JSON file per transcription under `directory`, named by the cache key.
+    Total size is capped at `max_bytes`; the least recently used entries (by file
+    modification time, refreshed on every hit) are evicted first. Several worker
+    processes may share the directory: each keeps an in-memory index that its own
+    puts and evictions update, and a background thread re-scans the directory every
+    `rescan_interval` seconds, so the cap and the LRU order also cover entries
+    written or evicted by the others.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, rescan_interval: float = 30.0):
+        """
+        Args:
+            directory (str): Cache directory (created if missing).
+            max_bytes (int): Maximum total size of cached entries, across all processes.
+            rescan_interval (float): Seconds between background directory scans that pick
+                up entries written or evicted by other processes (0 disables them).
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        os.makedirs(directory, exist_ok=True)
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Keys this process wrote or removed while a scan was walking the directory
+        self._written_during_scan: Optional[Dict[str, int]] = None
+        self._removed_during_scan: Optional[Set[str]] = None
+        self._rescan()
+        if self._index:
+            logger.info("Loaded %d cached transcriptions (%d bytes)", len(self._index), self._bytes)
+
+        self._stop = threading.Event()
+        self._scanner: Optional[threading.Thread] = None
+        if rescan_interval > 0:
+            self._scanner = threading.Thread(target=self._scan_loop, name="transcription-cache-scanner", daemon=True)
+            self._scanner.start()
+
+    @classmethod
+    def from_env(cls) -> "TranscriptionCache":
+        """
+        Builds a cache from TRANSCRIPTION_CACHE_DIR, TRANSCRIPTION_CACHE_MAX_BYTES
+        and TRANSCRIPTION_CACHE_RESCAN_SECONDS.
+        """
+        return cls(
+            os.getenv("TRANSCRIPTION_CACHE_DIR", os.path.join("data", "transcriptions")),
+            max_bytes=int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            rescan_interval=float(os.getenv("TRANSCRIPTION_CACHE_RESCAN_SECONDS", "30"))
+        )
+
+    @staticmethod
+    def make_key(audio: NormalizedAudio, backend: str, model: str, language: Optional[str]) -> str:
+        """
+        Combines the audio fingerprint with the settings that affect the transcript:
+        the backend, its model and the language hint.
+        """
+        # Model IDs may contain path separators, so the settings are hashed into the file name
+        settings = hashlib.blake2b(f"{backend}\0{model}\0{language or 'auto'}".encode(), digest_size=8)
+        return f"{audio_fingerprint(audio)}-{backend}-{settings.hexdigest()}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _rescan(self):
+        """
+        Rebuilds the index from the files on disk, then evicts beyond `max_bytes`.
+        The directory is walked without holding the lock; changes this process makes
+        meanwhile are replayed onto the scanned index.
+        """
+        with self._lock:
+            self._written_during_scan, self._removed_during_scan = {}, set()
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        index: "OrderedDict[str, int]" = OrderedDict((key, size) for _, key, size in sorted(entries))
+
+        with self._lock:
+            for key in self._removed_during_scan:
+                index.pop(key, None)
+            for key, size in self._written_during_scan.items():
+                index.pop(key, None)
+                index[key] = size
+            self._written_during_scan = self._removed_during_scan = None
+            self._index = index
+            self._bytes = sum(index.values())
+            self._evict()
+
+    def _scan_loop(self):
+        while not self._stop.wait(self.rescan_interval):
+            try:
+                self._rescan()
+            except OSError as e:
+                logger.warning("Could not scan transcription cache directory: %s", e)
+
+    def _forget(self, key: str):
+        # Called with the lock held
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+        if self._removed_during_scan is not None:
+            self._removed_during_scan.add(key)
+            self._written_during_scan.pop(key, None)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached transcription for `key`, or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)  # Mark as recently used for other processes too
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+                self._forget(key)
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """
+        Stores a transcription, evicting least recently used entries beyond `max_bytes`.
+        """
+        data = json.dumps(result, separators=(",", ":")).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so readers never see partial entries
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("Could not write transcription cache entry: %s", e)
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+
+        with self._lock:
+            self._forget(key)
+            self._index[key] = len(data)
+            self._bytes += len(data)
+            if self._written_during_scan is not None:
+                self._removed_during_scan.discard(key)
+                self._written_during_scan[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        # Called with the lock held
+        while self._bytes > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            self._forget(key)
+            self.evictions += 1
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    os.unlink(self._path(key))
+                except FileNotFoundError:
+                    pass
+                self._forget(key)
+
+    def close(self):
+        """Stops the background directory scanner."""
+        self._stop.set()
+        if self._scanner is not None:
+            self._scanner.join(timeout=5)
+            self._scanner = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
+
+_cache: Optional[TranscriptionCache] = None
+_cache_lock = threading.Lock()
+
+def get_transcription_cache() -> Optional[TranscriptionCache]:
+    """
+    Returns the process-wide cache, or None when TRANSCRIPTION_CACHE_ENABLED is "false".
+    """
+    global _cache
+    if os.getenv("TRANSCRIPTION_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TranscriptionCache.from_env()
+    return _cache
+
+def close_transcription_cache():
+    """Stops the shared cache's scanner; the next get_transcription_cache call opens a new one."""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
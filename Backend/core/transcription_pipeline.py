@@ -0,0 +1,204 @@
+# Speech-to-text pipeline
+# Decode once -> trim silence and split at pauses -> transcribe chunks concurrently
+# -> stitch the text back together in order.
+import asyncio
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.audio_normalizer import AudioNormalizer, AudioSource, NormalizedAudio, get_audio_normalizer
+from core.vad import EnergyVAD
+from core.transcription_cache import TranscriptionCache, get_transcription_cache, close_transcription_cache
+from models.asr.backends import ASRBackend, BatchingASRBackend, create_asr_backend
+from core.metrics import timed
+
+logger = logging.getLogger("transcription_pipeline")
+
+class TranscriptionPipeline:
+    """
+    Shared transcription flow used by SpeechToText and Whisper.
+    Only detected speech is sent to the backend, and long recordings are split at
+    pauses into chunks that are transcribed in parallel. Results are cached by a
+    hash of the normalized audio, so re-sent clips skip the backend entirely.
+    """
+
+    def __init__(
+        self,
+        backend: ASRBackend,
+        normalizer: Optional[AudioNormalizer] = None,
+        vad: Optional[EnergyVAD] = None,
+        max_chunk_seconds: float = 30.0,
+        max_concurrency: int = 4,
+        cache: Optional[TranscriptionCache] = None
+    ):
+        """
+        Args:
+            backend (ASRBackend): Engine that transcribes each chunk.
+            normalizer (Optional[AudioNormalizer]): Audio decoder; defaults to the shared one.
+            vad (Optional[EnergyVAD]): Speech detector; defaults to EnergyVAD().
+            max_chunk_seconds (float): Longest chunk sent to the backend in one request.
+            max_concurrency (int): Maximum chunks transcribed at the same time.
+            cache (Optional[TranscriptionCache]): Cache of finished transcriptions (None disables caching).
+        """
+        self.backend = backend
+        self.normalizer = normalizer or get_audio_normalizer()
+        self.vad = vad or EnergyVAD()
+        self.max_chunk_seconds = max_chunk_seconds
+        self.max_concurrency = max(max_concurrency, 1)
+        self.cache = cache
+
+    def prepare(self, source: AudioSource, audio_format: Optional[str] = None) -> Tuple[NormalizedAudio, List[NormalizedAudio]]:
+        """
+        Decodes the audio and splits its speech into chunks.
+        Returns:
+            Tuple[NormalizedAudio, List[NormalizedAudio]]: The full normalized audio and its speech chunks.
+        """
+        audio = self.normalizer.normalize(source, audio_format)
+        return audio, self._split(audio)
+
+    def _split(self, audio: NormalizedAudio) -> List[NormalizedAudio]:
+        chunks = self.vad.split(audio, self.max_chunk_seconds)
+        logger.info(
+            "Prepared %.2fs of audio: %d chunks, %.2fs of speech",
+            audio.duration, len(chunks), sum(chunk.duration for chunk in chunks)
+        )
+        return chunks
+
+    def _lookup(self, audio: NormalizedAudio, language: Optional[str]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(audio, self.backend.name, self.backend.model_id, language)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info("Transcription cache hit for %.2fs of audio", audio.duration)
+            cached["cached"] = True
+        return key, cached
+
+    def _store(self, key: Optional[str], result: Dict[str, Any]):
+        if key is not None:
+            self.cache.put(key, result)
+
+    @timed("asr_transcription")
+    def transcribe(self, source: AudioSource, audio_format: Optional[str] = None,
+                   language: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Transcribes audio, running chunk requests on a thread pool.
+        Args:
+            source (AudioSource): A file path or an in-memory buffer.
+            audio_format (Optional[str]): Audio format; taken from the path if omitted.
+            language (Optional[str]): Language hint passed to the backend.
+
+        Returns:
+            Dict[str, Any]: "text", "language", "duration" (whole recording),
+            "speech_duration" (audio actually transcribed), "chunks" and "cached".
+        """
+        audio = self.normalizer.normalize(source, audio_format)
+        key, cached = self._lookup(audio, language)
+        if cached is not None:
+            return cached
+
+        chunks = self._split(audio)
+        if len(chunks) <= 1:
+            results = [self.backend.transcribe(chunk, language) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(chunks), self.max_concurrency)) as executor:
+                results = list(executor.map(lambda chunk: self.backend.transcribe(chunk, language), chunks))
+        result = self._stitch(audio, chunks, results, language)
+        self._store(key, result)
+        return result
+
+    @timed("asr_transcription")
+    async def transcribe_async(self, source: AudioSource, audio_format: Optional[str] = None,
+                               language: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Awaitable variant of `transcribe`; decoding and cache access run on a worker
+        thread and chunks are awaited concurrently through the backend's async interface.
+        """
+        audio = await asyncio.to_thread(self.normalizer.normalize, source, audio_format)
+        key, cached = await asyncio.to_thread(self._lookup, audio, language)
+        if cached is not None:
+            return cached
+
+        chunks = await asyncio.to_thread(self._split, audio)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(chunk: NormalizedAudio) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.backend.transcribe_async(chunk, language)
+
+        results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        result = self._stitch(audio, chunks, list(results), language)
+        await asyncio.to_thread(self._store, key, result)
+        return result
+
+    @staticmethod
+    def _stitch(audio: NormalizedAudio, chunks: List[NormalizedAudio],
+                results: List[Dict[str, Any]], language: Optional[str]) -> Dict[str, Any]:
+        texts = [result.get("text", "").strip() for result in results]
+        detected = next((result.get("language") for result in results if result.get("language")), None)
+        return {
+            "text": " ".join(text for text in texts if text),
+            "language": detected or language,
+            "duration": audio.duration,
+            "speech_duration": sum(chunk.duration for chunk in chunks),
+            "chunks": len(chunks),
+            "cached": False
+        }
+
+_pipeline: Optional[TranscriptionPipeline] = None
+
+def get_transcription_pipeline() -> TranscriptionPipeline:
+    """
+    Returns the process-wide pipeline, using the backend selected by ASR_BACKEND.
+    """
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = TranscriptionPipeline(
+            create_asr_backend(),
+            vad=EnergyVAD.from_env(),
+            max_chunk_seconds=float(os.getenv("ASR_MAX_CHUNK_SECONDS", "30")),
+            max_concurrency=int(os.getenv("ASR_MAX_CONCURRENCY", "4")),
+            cache=get_transcription_cache()
+        )
+    return _pipeline
+
+def warm_up_transcription_pipeline():
+    """
+    Builds the shared pipeline and loads the backend's model, so a local ASR model is
+    loaded once at startup instead of on the first voice request.
+    """
+    pipeline = get_transcription_pipeline()
+    try:
+        pipeline.backend.load()
+    except Exception as e:
+        logger.error("Could not load ASR backend '%s': %s", pipeline.backend.name, e)
+
+def transcription_status() -> Dict[str, Any]:
+    """
+    Reports the shared pipeline's backend and whether it is ready, without building it.
+    """
+    if _pipeline is None:
+        return {"backend": None, "ready": False}
+    return {"backend": _pipeline.backend.name, "ready": _pipeline.backend.ready}
+
+def transcription_stats() -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Reports transcription cache and ASR batcher counters, without building the
+    pipeline or its cache. Either entry is None when that component is disabled or not
+    in use yet.
+    """
+    cache = _pipeline.cache if _pipeline is not None else None
+    backend = _pipeline.backend if _pipeline is not None else None
+    return {
+        "cache": cache.stats() if cache is not None else None,
+        "batcher": backend.stats() if isinstance(backend, BatchingASRBackend) else None
+    }
+
+def close_transcription_pipeline():
+    """Closes the shared pipeline's backend and cache; the next call to get_transcription_pipeline builds a new one."""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.backend.close()
+        _pipeline = None
+    close_transcription_cache()
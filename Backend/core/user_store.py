@@ -0,0 +1,341 @@
+# User account storage
+# A persistent SQLite (WAL) store with indexed lookups and a read-through cache,
+# plus an in-memory store for development.
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional
+
+from tools.cache import TTLCache
+
+logger = logging.getLogger("user_store")
+
+class UserExistsError(Exception):
+    """Raised when registering an email that already has an account."""
+    pass
+
+def _new_user(name: str, email: str, password_hash: str) -> Dict[str, Any]:
+    return {
+        "user_id": f"user_{uuid.uuid4().hex}",
+        "name": name,
+        "email": email,
+        "password": password_hash,
+        "created_at": time.time()
+    }
+
+class UserStore(ABC):
+    """
+    Interface for user account storage.
+    User records are dicts with "user_id", "name", "email", "password" (hash) and "created_at".
+    """
+
+    @abstractmethod
+    def create(self, name: str, email: str, password_hash: str) -> Dict[str, Any]:
+        """
+        Creates a user. Raises UserExistsError if the email is taken.
+        """
+
+    @abstractmethod
+    def bulk_create(self, users: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+        """
+        Imports users (dicts with "name", "email", "password") in batches, skipping
+        emails that already exist. Returns the number of users created.
+        """
+
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Returns the user with this email, or None."""
+
+    @abstractmethod
+    def get_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the user with this ID, or None."""
+
+    @abstractmethod
+    def update_password(self, email: str, password_hash: str) -> bool:
+        """Replaces a user's password hash. Returns False if the user does not exist."""
+
+    @abstractmethod
+    def delete(self, email: str) -> bool:
+        """Removes a user. Returns True if it existed."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Returns the number of stored users."""
+
+    # Awaitable variants for request handlers; by default they run the blocking call on a
+    # worker thread so a slow or locked database never stalls the event loop
+    async def create_async(self, name: str, email: str, password_hash: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.create, name, email, password_hash)
+
+    async def get_by_email_async(self, email: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get_by_email, email)
+
+    async def update_password_async(self, email: str, password_hash: str) -> bool:
+        return await asyncio.to_thread(self.update_password, email, password_hash)
+
+    def close(self):
+        """Releases resources."""
+
+class MemoryUserStore(UserStore):
+    """
+    Non-persistent store keeping users in dicts indexed by email and user ID.
+    """
+
+    def __init__(self):
+        self._by_email: Dict[str, Dict[str, Any]] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, name: str, email: str, password_hash: str) -> Dict[str, Any]:
+        user = _new_user(name, email, password_hash)
+        with self._lock:
+            if email in self._by_email:
+                raise UserExistsError(f"Email {email} already registered")
+            self._by_email[email] = user
+            self._by_id[user["user_id"]] = user
+        return dict(user)
+
+    def bulk_create(self, users: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+        created = 0
+        for user in users:
+            try:
+                self.create(user["name"], user["email"], user["password"])
+                created += 1
+            except UserExistsError:
+                continue
+        return created
+
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        user = self._by_email.get(email)
+        return dict(user) if user is not None else None
+
+    def get_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        user = self._by_id.get(user_id)
+        return dict(user) if user is not None else None
+
+    def update_password(self, email: str, password_hash: str) -> bool:
+        with self._lock:
+            user = self._by_email.get(email)
+            if user is None:
+                return False
+            user["password"] = password_hash
+            return True
+
+    def delete(self, email: str) -> bool:
+        with self._lock:
+            user = self._by_email.pop(email, None)
+            if user is None:
+                return False
+            del self._by_id[user["user_id"]]
+            return True
+
+    def count(self) -> int:
+        return len(self._by_email)
+
+    # Nothing here blocks, so the awaitable variants skip the worker thread
+    async def create_async(self, name: str, email: str, password_hash: str) -> Dict[str, Any]:
+        return self.create(name, email, password_hash)
+
+    async def get_by_email_async(self, email: str) -> Optional[Dict[str, Any]]:
+        return self.get_by_email(email)
+
+    async def update_password_async(self, email: str, password_hash: str) -> bool:
+        return self.update_password(email, password_hash)
+
+_COLUMNS = "user_id, name, email, password, created_at"
+
+class SQLiteUserStore(UserStore):
+    """
+    Persistent store on an embedded SQLite database in WAL mode, shareable by
+    several worker processes. Lookups by email and user ID use indexes; found users
+    are kept in a read-through TTL cache, so repeat logins and token validations
+    do not touch the database. Other processes' changes become visible once the
+    cached entry expires (`cache_ttl`).
+    """
+
+    def __init__(self, path: str, cache_size: int = 100_000, cache_ttl: float = 60.0):
+        """
+        Args:
+            path (str): Database file path (created if missing).
+            cache_size (int): Maximum users held in the read-through cache.
+            cache_ttl (float): Seconds a cached user is served without re-reading it.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.cache = TTLCache(max_entries=cache_size, default_ttl=cache_ttl)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._conn().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL UNIQUE,
+                password TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+        logger.info("SQLite user store opened at %s", path)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _row_to_user(row: tuple) -> Dict[str, Any]:
+        return dict(zip(("user_id", "name", "email", "password", "created_at"), row))
+
+    def _cache_user(self, user: Dict[str, Any]):
+        self.cache.set(("email", user["email"]), user)
+        self.cache.set(("id", user["user_id"]), user)
+
+    def _forget(self, user: Optional[Dict[str, Any]]):
+        if user is not None:
+            self.cache.delete(("email", user["email"]))
+            self.cache.delete(("id", user["user_id"]))
+
+    def create(self, name: str, email: str, password_hash: str) -> Dict[str, Any]:
+        user = _new_user(name, email, password_hash)
+        try:
+            with self._write_lock:
+                self._conn().execute(
+                    f"INSERT INTO users ({_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                    (user["user_id"], name, email, password_hash, user["created_at"])
+                )
+        except sqlite3.IntegrityError:
+            raise UserExistsError(f"Email {email} already registered")
+        self._cache_user(user)
+        return dict(user)
+
+    def bulk_create(self, users: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+        created = 0
+        batch = []
+        conn = self._conn()
+
+        def write(rows):
+            with self._write_lock:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    before = conn.total_changes
+                    conn.executemany(f"INSERT OR IGNORE INTO users ({_COLUMNS}) VALUES (?, ?, ?, ?, ?)", rows)
+                    inserted = conn.total_changes - before
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            return inserted
+
+        for user in users:
+            record = _new_user(user["name"], user["email"], user["password"])
+            batch.append(tuple(record[column] for column in ("user_id", "name", "email", "password", "created_at")))
+            if len(batch) >= batch_size:
+                created += write(batch)
+                batch = []
+        if batch:
+            created += write(batch)
+        logger.info("Bulk import created %d users", created)
+        return created
+
+    def _lookup(self, kind: str, column: str, value: str) -> Optional[Dict[str, Any]]:
+        user = self.cache.get((kind, value))
+        if user is not None:
+            return dict(user)
+        row = self._conn().execute(f"SELECT {_COLUMNS} FROM users WHERE {column} = ?", (value,)).fetchone()
+        if row is None:
+            # Misses are not cached: another worker may register the user at any time
+            return None
+        user = self._row_to_user(row)
+        self._cache_user(user)
+        return dict(user)
+
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._lookup("email", "email", email)
+
+    async def get_by_email_async(self, email: str) -> Optional[Dict[str, Any]]:
+        # Cache hits need no I/O, so only misses pay for the thread hop
+        user = self.cache.get(("email", email))
+        if user is not None:
+            return dict(user)
+        return await asyncio.to_thread(self.get_by_email, email)
+
+    def get_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._lookup("id", "user_id", user_id)
+
+    def update_password(self, email: str, password_hash: str) -> bool:
+        with self._write_lock:
+            updated = self._conn().execute(
+                "UPDATE users SET password = ? WHERE email = ?", (password_hash, email)
+            ).rowcount
+        self._forget(self.cache.get(("email", email)))
+        return updated > 0
+
+    def delete(self, email: str) -> bool:
+        user = self.get_by_email(email)
+        with self._write_lock:
+            deleted = self._conn().execute("DELETE FROM users WHERE email = ?", (email,)).rowcount
+        self._forget(user)
+        return deleted > 0
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+_user_store: Optional[UserStore] = None
+_user_store_lock = threading.Lock()
+
+def create_user_store_from_env() -> UserStore:
+    """
+    Builds the store selected by USER_STORE_BACKEND ("sqlite" or "memory").
+    """
+    kind = os.getenv("USER_STORE_BACKEND", "sqlite").lower()
+    if kind == "memory":
+        return MemoryUserStore()
+    if kind == "sqlite":
+        return SQLiteUserStore(
+            os.getenv("USER_STORE_PATH", os.path.join("data", "users.db")),
+            cache_size=int(os.getenv("USER_CACHE_SIZE", "100000")),
+            cache_ttl=float(os.getenv("USER_CACHE_TTL", "60"))
+        )
+    raise ValueError(f"Unknown USER_STORE_BACKEND: {kind}")
+
+def get_user_store() -> UserStore:
+    """
+    Returns the process-wide UserStore used by the auth routes.
+    """
+    global _user_store
+    if _user_store is None:
+        with _user_store_lock:
+            if _user_store is None:
+                _user_store = create_user_store_from_env()
+    return _user_store
+
+def close_user_store():
+    """
+    Closes the process-wide UserStore; the next get_user_store() call opens a fresh one.
+    """
+    global _user_store
+    with _user_store_lock:
+        if _user_store is not None:
+            _user_store.close()
+            _user_store = None
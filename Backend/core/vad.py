@@ -0,0 +1,184 @@
+# Voice activity detection
+# Energy-based speech detection used to trim silence and split long recordings
+# at pauses before they are sent to an ASR backend.
+import os
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+from core.audio_normalizer import NormalizedAudio
+
+logger = logging.getLogger("vad")
+
+class EnergyVAD:
+    """
+    Classifies fixed-size frames as speech or silence by their RMS energy.
+
+    The threshold adapts to the recording: it sits `margin_db` above the estimated
+    noise floor, but never below `min_threshold_db` and never higher than
+    `max_below_peak_db` under the loudest frame, so recordings that are all speech
+    are not mistaken for silence.
+    """
+
+    def __init__(
+        self,
+        frame_ms: int = 30,
+        margin_db: float = 12.0,
+        min_threshold_db: float = -50.0,
+        max_below_peak_db: float = 25.0,
+        padding_ms: int = 200,
+        min_silence_ms: int = 400,
+        cut_search_ms: int = 1000
+    ):
+        """
+        Args:
+            frame_ms (int): Analysis frame length.
+            margin_db (float): How far above the noise floor speech must be.
+            min_threshold_db (float): Absolute floor for the speech threshold (dBFS).
+            max_below_peak_db (float): Cap on the threshold relative to the loudest frame.
+            padding_ms (int): Audio kept around detected speech so word edges are not clipped.
+            min_silence_ms (int): Shortest pause at which audio may be split.
+            cut_search_ms (int): How far before the chunk limit to look for the quietest
+                frame when speech without pauses must be cut.
+        """
+        self.frame_ms = frame_ms
+        self.margin_db = margin_db
+        self.min_threshold_db = min_threshold_db
+        self.max_below_peak_db = max_below_peak_db
+        self.padding_ms = padding_ms
+        self.min_silence_ms = min_silence_ms
+        self.cut_search_ms = cut_search_ms
+
+    @classmethod
+    def from_env(cls) -> "EnergyVAD":
+        """
+        Builds a VAD from VAD_MARGIN_DB, VAD_PADDING_MS and VAD_MIN_SILENCE_MS.
+        """
+        return cls(
+            margin_db=float(os.getenv("VAD_MARGIN_DB", "12")),
+            padding_ms=int(os.getenv("VAD_PADDING_MS", "200")),
+            min_silence_ms=int(os.getenv("VAD_MIN_SILENCE_MS", "400"))
+        )
+
+    def _frame_length(self, sample_rate: int) -> int:
+        return max(int(sample_rate * self.frame_ms / 1000), 1)
+
+    def speech_mask(self, audio: NormalizedAudio) -> np.ndarray:
+        """
+        Returns one boolean per frame: True where speech (plus padding) is present.
+        """
+        frame = self._frame_length(audio.sample_rate)
+        n_frames = -(-len(audio.samples) // frame)
+        if n_frames == 0:
+            return np.zeros(0, dtype=bool)
+
+        padded = np.zeros(n_frames * frame, dtype=np.float32)
+        padded[:len(audio.samples)] = audio.samples
+        rms = np.sqrt(np.mean(padded.reshape(n_frames, frame) ** 2, axis=1))
+        db = 20.0 * np.log10(rms + 1e-10)
+
+        noise_floor = np.percentile(db, 10)
+        threshold = max(self.min_threshold_db, min(noise_floor + self.margin_db, db.max() - self.max_below_peak_db))
+        mask = db > threshold
+
+        # Dilate speech by the padding so onsets and trailing consonants are kept
+        pad_frames = int(self.padding_ms / self.frame_ms)
+        if pad_frames and mask.any():
+            mask = np.convolve(mask.astype(np.int8), np.ones(2 * pad_frames + 1, dtype=np.int8), mode="same") > 0
+        return mask
+
+    def speech_segments(self, audio: NormalizedAudio) -> List[Tuple[int, int]]:
+        """
+        Returns [start, end) sample ranges of speech, separated by pauses of at least `min_silence_ms`.
+        """
+        mask = self.speech_mask(audio)
+        if not mask.any():
+            return []
+        frame = self._frame_length(audio.sample_rate)
+
+        # Edges of runs of speech frames
+        changes = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+        starts = np.flatnonzero(changes == 1)
+        ends = np.flatnonzero(changes == -1)
+
+        # Bridge pauses shorter than min_silence_ms
+        min_gap = max(int(self.min_silence_ms / self.frame_ms), 1)
+        segments = [[starts[0], ends[0]]]
+        for start, end in zip(starts[1:], ends[1:]):
+            if start - segments[-1][1] < min_gap:
+                segments[-1][1] = end
+            else:
+                segments.append([start, end])
+
+        total = len(audio.samples)
+        return [(int(start * frame), int(min(end * frame, total))) for start, end in segments]
+
+    def trim(self, audio: NormalizedAudio) -> NormalizedAudio:
+        """
+        Removes leading and trailing silence. Returns an empty audio if there is no speech.
+        """
+        segments = self.speech_segments(audio)
+        if not segments:
+            return audio.slice(0, 0)
+        return audio.slice(segments[0][0], segments[-1][1])
+
+    def split(self, audio: NormalizedAudio, max_chunk_seconds: float = 30.0) -> List[NormalizedAudio]:
+        """
+        Splits audio into chunks of at most `max_chunk_seconds` of speech.
+        Pauses between speech segments are dropped and adjacent segments are packed
+        into as few chunks as possible; segments longer than the limit are cut at the
+        quietest frame within `cut_search_ms` before it, which usually falls between words.
+        Args:
+            audio (NormalizedAudio): Audio to split.
+            max_chunk_seconds (float): Maximum length of a chunk.
+
+        Returns:
+            List[NormalizedAudio]: Chunks in playback order (empty if there is no speech).
+        """
+        max_samples = max(int(max_chunk_seconds * audio.sample_rate), 1)
+        pieces: List[Tuple[int, int]] = []
+        for start, end in self.speech_segments(audio):
+            while end - start > max_samples:
+                cut = self._cut_point(audio, start, start + max_samples)
+                pieces.append((start, cut))
+                start = cut
+            pieces.append((start, end))
+
+        chunks: List[NormalizedAudio] = []
+        group: List[Tuple[int, int]] = []
+        group_length = 0
+        for start, end in pieces:
+            if group and group_length + (end - start) > max_samples:
+                chunks.append(self._join(audio, group))
+                group, group_length = [], 0
+            group.append((start, end))
+            group_length += end - start
+        if group:
+            chunks.append(self._join(audio, group))
+
+        logger.debug("Split %.2fs of audio into %d chunks", audio.duration, len(chunks))
+        return chunks
+
+    def _cut_point(self, audio: NormalizedAudio, start: int, limit: int) -> int:
+        """
+        Returns the sample in (start, limit] at which to cut: the middle of the
+        lowest-energy frame in the search window ending at `limit`.
+        """
+        frame = self._frame_length(audio.sample_rate)
+        window_start = max(limit - int(audio.sample_rate * self.cut_search_ms / 1000), start)
+        n_frames = (limit - window_start) // frame
+        if n_frames < 2:
+            return limit
+        # Frames are aligned to the limit so the last one ends exactly there
+        window = audio.samples[limit - n_frames * frame:limit].reshape(n_frames, frame)
+        quietest = int(np.argmin(np.mean(window ** 2, axis=1)))
+        return limit - (n_frames - quietest) * frame + frame // 2
+
+    @staticmethod
+    def _join(audio: NormalizedAudio, ranges: List[Tuple[int, int]]) -> NormalizedAudio:
+        if len(ranges) == 1:
+            return audio.slice(*ranges[0])
+        samples = np.concatenate([audio.samples[start:end] for start, end in ranges])
+        return NormalizedAudio(samples, audio.sample_rate, audio.source_format,
+                               audio.source_sample_rate, audio.source_channels)
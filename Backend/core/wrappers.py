@@ -2,80 +2,258 @@
 Wrapper functions for task planning and orchestration.
 These are convenience functions that wrap the class-based implementations.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 import logging
+import threading
 
 from core.task_planner import TaskPlanner
-from core.orchestrator import Orchestrator
+from core.plan_cache import PlanCache
+from core.intent_router import get_intent_router
+from core.single_flight import SingleFlight, AsyncSingleFlight
+from core.orchestrator import Orchestrator, AsyncOrchestrator, EventCallback
+from core.retry_mechanism import RetryConfig, RetryManager
+from core.circuit_breaker import get_tool_guard
+from core.metrics import timed
+from tools.http_pool import get_http_pool
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("wrappers")
 
 # Initialize with environment variable or demo mode
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "demo-key")
 
+# Maximum number of independent subtasks executed in parallel per task
+ORCHESTRATOR_MAX_CONCURRENCY = int(os.getenv("ORCHESTRATOR_MAX_CONCURRENCY", "4"))
+
+# Plans are cached across tasks so repeat phrasings skip the LLM call
+plan_cache = PlanCache.from_env()
+_planner: Optional[TaskPlanner] = None
+
+# Identical concurrent planner and tool calls are coalesced into one upstream request
+planner_flight = SingleFlight("planner")
+async_planner_flight = AsyncSingleFlight("planner")
+tool_flight = SingleFlight("tools")
+async_tool_flight = AsyncSingleFlight("tools")
+
+# Transient failures of read-only tool calls are retried within the process-wide retry budget
+tool_retry = RetryManager(RetryConfig.from_env("TOOL_RETRY"))
+
+# Shared orchestrators so every task reuses the same tool wrappers and connection pools
+_orchestrator: Optional[Orchestrator] = None
+_orchestrator_lock = threading.Lock()
+_async_orchestrator: Optional[AsyncOrchestrator] = None
+
+def get_planner() -> TaskPlanner:
+    """
+    Returns the process-wide TaskPlanner backed by the shared plan cache.
+    """
+    global _planner
+    if _planner is None:
+        _planner = TaskPlanner(OPENAI_API_KEY, plan_cache=plan_cache)
+    return _planner
+
+def get_orchestrator() -> Orchestrator:
+    """
+    Returns the process-wide Orchestrator, creating it on first use.
+    """
+    global _orchestrator
+    if _orchestrator is None:
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                _orchestrator = Orchestrator(
+                    max_concurrency=ORCHESTRATOR_MAX_CONCURRENCY,
+                    single_flight=tool_flight,
+                    retry_manager=tool_retry,
+                    tool_guard=get_tool_guard
+                )
+    return _orchestrator
+
+def get_async_orchestrator() -> AsyncOrchestrator:
+    """
+    Returns the process-wide AsyncOrchestrator, creating it on first use.
+    """
+    global _async_orchestrator
+    if _async_orchestrator is None:
+        _async_orchestrator = AsyncOrchestrator(
+            max_concurrency=ORCHESTRATOR_MAX_CONCURRENCY,
+            single_flight=async_tool_flight,
+            retry_manager=tool_retry,
+            tool_guard=get_tool_guard
+        )
+    return _async_orchestrator
+
+def coalescing_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Reports how many planner and tool calls were coalesced onto an in-flight request.
+    """
+    return {
+        "planner": planner_flight.stats(),
+        "planner_async": async_planner_flight.stats(),
+        "tools": tool_flight.stats(),
+        "tools_async": async_tool_flight.stats()
+    }
+
+def _is_demo_mode() -> bool:
+    return not OPENAI_API_KEY or OPENAI_API_KEY == "demo-key"
+
+def planner_status() -> Dict[str, Any]:
+    """
+    Reports whether tasks are planned by the OpenAI planner or by the offline demo
+    fallback; the planner counts as available only when an API key is configured.
+    """
+    demo = _is_demo_mode()
+    return {"mode": "demo" if demo else "openai", "available": not demo}
+
+def _demo_subtasks(task: str) -> List[Dict[str, Any]]:
+    """
+    Returns a canned task breakdown used when no planner API key is configured.
+    """
+    logger.warning("Using demo mode - no actual API calls")
+    if "order" in task.lower() and "food" in task.lower():
+        return [
+            {"id": "find", "tool": "zomato", "action": "search", "params": {"query": "pizza"}},
+            {"tool": "zomato", "action": "order", "params": {"restaurant_id": 123, "items": {"margherita": 1}},
+             "depends_on": ["find"]}
+        ]
+    return [
+        {"tool": "generic", "action": "process", "params": {"task": task}}
+    ]
+
+def _match_known_intent(task: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Returns the subtasks of a known intent matching the task, or None to fall through to the planner.
+    """
+    match = get_intent_router().match(task)
+    if match is not None and match.subtasks:
+        logger.info("Task matched intent '%s'; skipping planner", match.name)
+        return match.subtasks
+    return None
+
+@timed("process_task")
 def process_task(task: str) -> List[Dict[str, Any]]:
     """
     Wrapper function to process a high-level task and break it into subtasks.
-    
+
     Args:
         task (str): High-level task description in natural language.
-    
+
     Returns:
         List[Dict[str, Any]]: List of subtasks with tool and action information.
     """
     try:
-        logger.info(f"Processing task: {task}")
-        
+        logger.info("Processing task: %s", task)
+
+        # Known intents are planned without a model call
+        subtasks = _match_known_intent(task)
+        if subtasks is not None:
+            return subtasks
+
         # For demo purposes, return a simple task breakdown
         # In production, this would use TaskPlanner with actual API key
-        if not OPENAI_API_KEY or OPENAI_API_KEY == "demo-key":
-            logger.warning("Using demo mode - no actual API calls")
-            # Return demo subtasks
-            if "order" in task.lower() and "food" in task.lower():
-                return [
-                    {"tool": "zomato", "action": "search", "params": {"query": "pizza"}},
-                    {"tool": "zomato", "action": "order", "params": {"restaurant_id": 123}}
-                ]
-            else:
-                return [
-                    {"tool": "generic", "action": "process", "params": {"task": task}}
-                ]
-        
+        if _is_demo_mode():
+            return _demo_subtasks(task)
+
         # Use actual TaskPlanner if API key is available
-        planner = TaskPlanner(OPENAI_API_KEY)
-        subtasks = planner.decompose_task(task)
+        subtasks = planner_flight.do(
+            PlanCache.normalize(task),
+            lambda: get_planner().decompose_task(task)
+        )
         return subtasks
-        
+
     except Exception as e:
-        logger.error(f"Error processing task: {str(e)}")
+        logger.error("Error processing task: %s", e)
         # Return a basic fallback
         return [{"tool": "generic", "action": "error", "params": {"error": str(e)}}]
 
-def orchestrate_task(subtasks: List[Dict[str, Any]]) -> Dict[str, Any]:
+@timed("orchestrate_task")
+def orchestrate_task(subtasks: List[Dict[str, Any]],
+                     on_event: Optional[EventCallback] = None) -> Dict[str, Any]:
     """
     Wrapper function to orchestrate and execute a list of subtasks.
-    
+
     Args:
         subtasks (List[Dict[str, Any]]): List of subtasks to execute.
-    
+        on_event (Optional[EventCallback]): Receives per-subtask progress events.
+
     Returns:
         Dict[str, Any]: Combined results from all executed subtasks.
     """
     try:
-        logger.info(f"Orchestrating {len(subtasks)} subtasks")
-        
-        orchestrator = Orchestrator()
-        results = orchestrator.execute_subtasks(subtasks)
-        
+        logger.info("Orchestrating %s subtasks", len(subtasks))
+
+        results = get_orchestrator().execute_subtasks(subtasks, on_event=on_event)
+
         return results
-        
+
     except Exception as e:
-        logger.error(f"Error orchestrating tasks: {str(e)}")
+        logger.error("Error orchestrating tasks: %s", e)
         return {
             "status": "failed",
             "error": str(e),
             "results": []
         }
+
+@timed("process_task")
+async def process_task_async(task: str) -> List[Dict[str, Any]]:
+    """
+    Async counterpart of process_task; awaits the planner instead of blocking a thread.
+
+    Args:
+        task (str): High-level task description in natural language.
+
+    Returns:
+        List[Dict[str, Any]]: List of subtasks with tool and action information.
+    """
+    try:
+        logger.info("Processing task: %s", task)
+
+        subtasks = _match_known_intent(task)
+        if subtasks is not None:
+            return subtasks
+
+        if _is_demo_mode():
+            return _demo_subtasks(task)
+
+        return await async_planner_flight.do(
+            PlanCache.normalize(task),
+            lambda: get_planner().decompose_task_async(task)
+        )
+
+    except Exception as e:
+        logger.error("Error processing task: %s", e)
+        return [{"tool": "generic", "action": "error", "params": {"error": str(e)}}]
+
+@timed("orchestrate_task")
+async def orchestrate_task_async(subtasks: List[Dict[str, Any]],
+                                 on_event: Optional[EventCallback] = None) -> Dict[str, Any]:
+    """
+    Async counterpart of orchestrate_task, executed directly on the event loop.
+
+    Args:
+        subtasks (List[Dict[str, Any]]): List of subtasks to execute.
+        on_event (Optional[EventCallback]): Receives per-subtask progress events.
+
+    Returns:
+        Dict[str, Any]: Combined results from all executed subtasks.
+    """
+    try:
+        logger.info("Orchestrating %s subtasks", len(subtasks))
+
+        return await get_async_orchestrator().execute_subtasks(subtasks, on_event=on_event)
+
+    except Exception as e:
+        logger.error("Error orchestrating tasks: %s", e)
+        return {
+            "status": "failed",
+            "error": str(e),
+            "results": []
+        }
+
+async def shutdown_orchestration():
+    """
+    Releases the shared orchestrators and closes pooled connections. Called on application shutdown.
+    """
+    global _orchestrator, _async_orchestrator
+    _orchestrator = None
+    _async_orchestrator = None
+    await get_http_pool().aclose()
@@ -0,0 +1,352 @@
+"""
+Speech recognition backends.
+Each backend turns one chunk of normalized audio into text; the transcription
+pipeline takes care of decoding, silence trimming and chunking.
+"""
+import asyncio
+import io
+import os
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from core.audio_normalizer import NormalizedAudio
+
+logger = logging.getLogger("asr_backends")
+
+class ASRBackendError(Exception):
+    """Raised when a backend fails to transcribe audio."""
+    pass
+
+class ASRBackend(ABC):
+    """
+    Interface for speech recognition engines.
+    """
+
+    name = "asr"
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the model behind the backend; part of the transcription cache key."""
+        return ""
+
+    @abstractmethod
+    def transcribe(self, audio: NormalizedAudio, language: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Transcribes one chunk of audio.
+        Args:
+            audio (NormalizedAudio): Mono audio at the ASR sample rate.
+            language (Optional[str]): Language hint (e.g. "en").
+
+        Returns:
+            Dict[str, Any]: At least {"text": str}; may include "language".
+
+        Raises:
+            ASRBackendError: If transcription fails.
+        """
+
+    def transcribe_batch(self, audios: List[NormalizedAudio], language: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Transcribes several chunks. Backends with native batched inference override this;
+        the default transcribes them one at a time.
+        """
+        return [self.transcribe(audio, language) for audio in audios]
+
+    async def transcribe_async(self, audio: NormalizedAudio, language: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Awaitable variant; by default runs `transcribe` on a worker thread.
+        """
+        return await asyncio.to_thread(self.transcribe, audio, language)
+
+    def load(self):
+        """Loads models ahead of the first request. No-op for remote backends."""
+
+    @property
+    def ready(self) -> bool:
+        """Whether the backend can serve requests without loading anything first."""
+        return True
+
+    def close(self):
+        """Releases resources held by the backend."""
+
+class OpenAIASRBackend(ASRBackend):
+    """
+    Transcribes audio with OpenAI's hosted Whisper model.
+    """
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "whisper-1"):
+        """
+        Args:
+            api_key (Optional[str]): OpenAI API key; defaults to OPENAI_API_KEY.
+            model (str): Transcription model name.
+        """
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError("API key for OpenAI Whisper is required.")
+        self.model = model
+        self._client = None
+
+    @property
+    def model_id(self) -> str:
+        return self.model
+
+    def _get_client(self):
+        if self._client is None:
+            import openai
+            self._client = openai.OpenAI(api_key=self.api_key)
+        return self._client
+
+    def transcribe(self, audio: NormalizedAudio, language: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            response = self._get_client().audio.transcriptions.create(
+                model=self.model,
+                file=("audio.wav", io.BytesIO(audio.to_wav_bytes())),
+                **({"language": language} if language else {})
+            )
+        except Exception as e:
+            raise ASRBackendError(f"OpenAI transcription failed: {e}")
+        return {"text": getattr(response, "text", ""), "language": language}
+
+class StubASRBackend(ASRBackend):
+    """
+    Offline backend returning canned text, for development and tests.
+    """
+
+    name = "stub"
+
+    DEFAULT_TEXT = "This is a simulated transcription of your voice command"
+
+    def __init__(self, text: Optional[str] = None,
+                 text_fn: Optional[Callable[[NormalizedAudio], str]] = None):
+        """
+        Args:
+            text (Optional[str]): Text returned for every chunk.
+            text_fn (Optional[Callable[[NormalizedAudio], str]]): Computes the text per chunk instead.
+        """
+        self.text = text if text is not None else self.DEFAULT_TEXT
+        self.text_fn = text_fn
+        self.calls = 0
+
+    def transcribe(self, audio: NormalizedAudio, language: Optional[str] = None) -> Dict[str, Any]:
+        self.calls += 1
+        text = self.text_fn(audio) if self.text_fn else self.text
+        return {"text": text, "language": language}
+
+class LocalASRBackend(ASRBackend):
+    """
+    On-device transcription with a Whisper checkpoint run by Hugging Face transformers
+    on the CPU. The model is loaded once (see `load`) and `transcribe_batch` runs a
+    whole batch of chunks through a single inference call.
+    Requires the optional `transformers` and `torch` packages.
+    """
+
+    name = "local"
+
+    def __init__(self, model_name: str = "openai/whisper-tiny", device: str = "cpu"):
+        """
+        Args:
+            model_name (str): Hugging Face model ID or local path of the checkpoint.
+            device (str): Torch device to run on.
+        """
+        self.model_name = model_name
+        self.device = device
+        self._pipeline = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        return self.model_name
+
+    def load(self):
+        if self._pipeline is not None:
+            return
+        with self._load_lock:
+            if self._pipeline is not None:
+                return
+            try:
+                from transformers import pipeline
+            except ImportError:
+                raise ASRBackendError("The local ASR backend requires the 'transformers' and 'torch' packages.")
+            logger.info("Loading local ASR model %s on %s", self.model_name, self.device)
+            start = time.perf_counter()
+            self._pipeline = pipeline("automatic-speech-recognition", model=self.model_name, device=self.device)
+            logger.info("Local ASR model loaded in %.1fs", time.perf_counter() - start)
+
+    @property
+    def ready(self) -> bool:
+        return self._pipeline is not None
+
+    def transcribe(self, audio: NormalizedAudio, language: Optional[str] = None) -> Dict[str, Any]:
+        return self.transcribe_batch([audio], language)[0]
+
+    def transcribe_batch(self, audios: List[NormalizedAudio], language: Optional[str] = None) -> List[Dict[str, Any]]:
+        self.load()
+        inputs = [{"raw": audio.samples, "sampling_rate": audio.sample_rate} for audio in audios]
+        generate_kwargs = {"language": language, "task": "transcribe"} if language else {"task": "transcribe"}
+        try:
+            outputs = self._pipeline(inputs, batch_size=len(inputs), generate_kwargs=generate_kwargs)
+        except Exception as e:
+            raise ASRBackendError(f"Local transcription failed: {e}")
+        return [{"text": output.get("text", "").strip(), "language": language} for output in outputs]
+
+class _BatchItem:
+    __slots__ = ("audio", "language", "future")
+
+    def __init__(self, audio: NormalizedAudio, language: Optional[str]):
+        self.audio = audio
+        self.language = language
+        self.future: Future = Future()
+
+class BatchingASRBackend(ASRBackend):
+    """
+    Collects concurrent transcription requests (from threads or coroutines) and
+    hands them to the wrapped backend's `transcribe_batch` together.
+
+    A batch is dispatched once `max_batch_size` requests are waiting or `max_wait_ms`
+    after its first request arrived, whichever comes first. Requests with different
+    language hints go into separate batches.
+    """
+
+    def __init__(self, backend: ASRBackend, max_batch_size: int = 8, max_wait_ms: float = 20.0):
+        """
+        Args:
+            backend (ASRBackend): Backend doing the actual inference.
+            max_batch_size (int): Largest batch passed to the backend.
+            max_wait_ms (float): Longest time a request waits for others to join its batch.
+        """
+        self.backend = backend
+        self.name = backend.name
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Deque[_BatchItem] = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self._dispatcher = threading.Thread(target=self._run, name=f"asr-batcher-{self.name}", daemon=True)
+        self._dispatcher.start()
+
+    def _submit(self, audio: NormalizedAudio, language: Optional[str]) -> Future:
+        item = _BatchItem(audio, language)
+        with self._condition:
+            if self._closed:
+                raise ASRBackendError("ASR batcher is closed")
+            self._queue.append(item)
+            self._condition.notify()
+        return item.future
+
+    def transcribe(self, audio: NormalizedAudio, language: Optional[str] = None) -> Dict[str, Any]:
+        return self._submit(audio, language).result()
+
+    def transcribe_batch(self, audios: List[NormalizedAudio], language: Optional[str] = None) -> List[Dict[str, Any]]:
+        futures = [self._submit(audio, language) for audio in audios]
+        return [future.result() for future in futures]
+
+    async def transcribe_async(self, audio: NormalizedAudio, language: Optional[str] = None) -> Dict[str, Any]:
+        return await asyncio.wrap_future(self._submit(audio, language))
+
+    def _next_batch(self) -> Optional[List[_BatchItem]]:
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+            if not self._queue:
+                return None
+
+            # Give other requests up to max_wait to join the first one's batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            language = self._queue[0].language
+            batch, rest = [], deque()
+            while self._queue and len(batch) < self.max_batch_size:
+                item = self._queue.popleft()
+                (batch if item.language == language else rest).append(item)
+            self._queue.extendleft(reversed(rest))
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = self.backend.transcribe_batch([item.audio for item in batch], batch[0].language)
+                if len(results) != len(batch):
+                    raise ASRBackendError(
+                        f"Backend '{self.backend.name}' returned {len(results)} results for a batch of {len(batch)}"
+                    )
+                for item, result in zip(batch, results):
+                    item.future.set_result(result)
+            except Exception as e:
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": len(self._queue)
+        }
+
+    @property
+    def model_id(self) -> str:
+        return self.backend.model_id
+
+    def load(self):
+        self.backend.load()
+
+    @property
+    def ready(self) -> bool:
+        return self.backend.ready
+
+    def close(self):
+        # Requests still queued are failed rather than left waiting forever;
+        # the batch already handed to the backend is allowed to finish
+        with self._condition:
+            self._closed = True
+            pending, self._queue = list(self._queue), deque()
+            self._condition.notify_all()
+        for item in pending:
+            item.future.set_exception(ASRBackendError("ASR batcher is closed"))
+        self._dispatcher.join(timeout=5)
+        self.backend.close()
+
+def create_asr_backend(name: Optional[str] = None, api_key: Optional[str] = None,
+                       default: Optional[str] = None) -> ASRBackend:
+    """
+    Builds the backend named by `name` or ASR_BACKEND ("openai", "local" or "stub").
+    Without either, uses `default`, or "openai" when an API key is available and "stub" otherwise.
+    The local backend is wrapped in a BatchingASRBackend configured by ASR_BATCH_MAX_SIZE
+    and ASR_BATCH_WAIT_MS.
+    """
+    name = (name or os.getenv("ASR_BACKEND") or default
+            or ("openai" if api_key or os.getenv("OPENAI_API_KEY") else "stub")).lower()
+    if name == "openai":
+        return OpenAIASRBackend(api_key=api_key, model=os.getenv("ASR_OPENAI_MODEL", "whisper-1"))
+    if name == "local":
+        backend = LocalASRBackend(
+            model_name=os.getenv("ASR_LOCAL_MODEL", "openai/whisper-tiny"),
+            device=os.getenv("ASR_LOCAL_DEVICE", "cpu")
+        )
+        max_batch_size = int(os.getenv("ASR_BATCH_MAX_SIZE", "8"))
+        if max_batch_size <= 1:
+            return backend
+        return BatchingASRBackend(backend, max_batch_size=max_batch_size,
+                                  max_wait_ms=float(os.getenv("ASR_BATCH_WAIT_MS", "20")))
+    if name == "stub":
+        return StubASRBackend()
+    raise ValueError(f"Unknown ASR backend: {name}")
@@ -1,13 +1,11 @@
 import os
 import logging
 from typing import Dict, Optional
-import openai
 
-# Setup logging for monitoring
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+from core.transcription_pipeline import TranscriptionPipeline, get_transcription_pipeline
+from core.transcription_cache import get_transcription_cache
+from models.asr.backends import ASRBackend, OpenAIASRBackend
+
 logger = logging.getLogger("whisper")
 
 class WhisperError(Exception):
@@ -17,20 +15,34 @@ class WhisperError(Exception):
 class Whisper:
     """
     Wrapper for OpenAI's Whisper API for speech-to-text transcription.
+    Audio goes through the shared TranscriptionPipeline (silence trimming and
+    parallel chunk transcription).
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, backend: Optional[ASRBackend] = None):
         """
         Initializes the Whisper wrapper with API key.
         Args:
-            api_key (Optional[str]): API key for accessing the OpenAI Whisper API.
+            api_key (Optional[str]): API key for accessing the OpenAI Whisper API; when given,
+                this wrapper calls the API with it instead of using the shared pipeline.
+            backend (Optional[ASRBackend]): ASR engine. Without it or an API key, the process-wide
+                pipeline (backend named by ASR_BACKEND) is used, so its model and batcher are shared.
         """
-        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
-            raise ValueError("API key for OpenAI Whisper is required.")
-        openai.api_key = self.api_key
+        self._owns_backend = backend is None and api_key is not None
+        if self._owns_backend:
+            self.api_key = api_key
+            backend = OpenAIASRBackend(api_key=api_key, model=os.getenv("ASR_OPENAI_MODEL", "whisper-1"))
+        if backend is None:
+            self.pipeline = get_transcription_pipeline()
+        else:
+            self.pipeline = TranscriptionPipeline(backend, cache=get_transcription_cache())
         logger.info("Whisper API wrapper initialized.")
 
+    def close(self):
+        """Closes a backend created by this wrapper; the shared pipeline is closed at shutdown."""
+        if self._owns_backend:
+            self.pipeline.backend.close()
+
     def transcribe(self, audio_path: str, language: Optional[str] = None) -> Dict[str, str]:
         """
         Transcribes an audio file to text using OpenAI Whisper.
@@ -42,16 +54,10 @@ class Whisper:
             Dict[str, str]: Transcription result including text.
         """
         try:
-            logger.info(f"Transcribing audio file: {audio_path}")
-            with open(audio_path, "rb") as audio_file:
-                response = openai.Audio.transcribe(
-                    model="whisper-1",
-                    file=audio_file,
-                    language=language
-                )
-            transcription = response.get("text", "")
+            logger.info("Transcribing audio file: %s", audio_path)
+            result = self.pipeline.transcribe(audio_path, language=language)
             logger.info("Transcription successful.")
-            return {"text": transcription}
+            return {"text": result["text"]}
         except Exception as e:
-            logger.error(f"Error during transcription: {str(e)}")
-            raise WhisperError(f"Transcription failed for file {audio_path}: {str(e)}")
\ No newline at end of file
+            logger.error("Error during transcription: %s", e)
+            raise WhisperError(f"Transcription failed for file {audio_path}: {str(e)}")
@@ -2,11 +2,6 @@ import logging
 from typing import Dict, List, Optional
 import openai
 
-# Set up logging for monitoring and debugging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger("gpt4_planner")
 
 class GPT4PlannerError(Exception):
@@ -28,7 +23,7 @@ class GPT4Planner:
         self.api_key = api_key
         self.model = model
         openai.api_key = self.api_key
-        logger.info(f"GPT-4 Planner initialized with model: {self.model}")
+        logger.info("GPT-4 Planner initialized with model: %s", self.model)
 
     def plan_task(self, high_level_task: str) -> List[Dict[str, str]]:
         """
@@ -40,7 +35,7 @@ class GPT4Planner:
             List[Dict[str, str]]: A list of subtasks with metadata.
         """
         try:
-            logger.info(f"Planning task using GPT-4: {high_level_task}")
+            logger.info("Planning task using GPT-4: %s", high_level_task)
 
             # Generate the prompt
             prompt = self._generate_task_prompt(high_level_task)
@@ -58,11 +53,11 @@ class GPT4Planner:
 
             # Parse the task plan
             subtasks = self._parse_subtasks(task_plan)
-            logger.info(f"Successfully planned task with {len(subtasks)} subtasks.")
+            logger.info("Successfully planned task with %s subtasks.", len(subtasks))
             return subtasks
 
         except Exception as e:
-            logger.error(f"Error during task planning: {str(e)}")
+            logger.error("Error during task planning: %s", e)
             raise GPT4PlannerError(f"Failed to plan task: {str(e)}")
 
     def _generate_task_prompt(self, high_level_task: str) -> str:
@@ -108,5 +103,5 @@ class GPT4Planner:
             return subtasks
 
         except Exception as e:
-            logger.error(f"Error parsing subtasks: {str(e)}")
+            logger.error("Error parsing subtasks: %s", e)
             raise GPT4PlannerError(f"Failed to parse subtasks: {str(e)}")
\ No newline at end of file
@@ -1,11 +1,6 @@
 import logging
 from typing import Dict, Optional, Any
 
-# Set up logging for troubleshooting and observability
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger("tool_selector")
 
 class ToolSelectorError(Exception):
@@ -43,20 +38,20 @@ class ToolSelector:
         Raises:
             ToolSelectorError: If no suitable tool is found.
         """
-        logger.info(f"Selecting tool for action: {action}")
+        logger.debug("Selecting tool for action: %s", action)
 
         try:
             # Iterate through the registry and find a compatible tool
             for tool, supported_actions in self.tool_registry.items():
                 if action in supported_actions:
-                    logger.info(f"Selected tool '{tool}' for action '{action}'.")
+                    logger.debug("Selected tool '%s' for action '%s'.", tool, action)
                     return tool
 
             # If no tool matches the action, raise an error
             raise ToolSelectorError(f"No tool found to handle action: {action}")
 
         except Exception as e:
-            logger.error(f"Error during tool selection: {str(e)}")
+            logger.error("Error during tool selection: %s", e)
             raise ToolSelectorError(str(e))
 
     def add_tool(self, tool_name: str, supported_actions: Optional[Any] = None):
@@ -70,11 +65,11 @@ class ToolSelector:
             supported_actions = []
 
         if tool_name in self.tool_registry:
-            logger.warning(f"Tool '{tool_name}' already exists in the registry. Updating supported actions.")
+            logger.warning("Tool '%s' already exists in the registry. Updating supported actions.", tool_name)
 
         # Add or update the tool in the registry
         self.tool_registry[tool_name] = supported_actions
-        logger.info(f"Tool '{tool_name}' added/updated in the registry with actions: {supported_actions}")
+        logger.info("Tool '%s' added/updated in the registry with actions: %s", tool_name, supported_actions)
 
     def remove_tool(self, tool_name: str):
         """
@@ -86,12 +81,12 @@ class ToolSelector:
             ToolSelectorError: If the tool is not found.
         """
         if tool_name not in self.tool_registry:
-            logger.error(f"Tool '{tool_name}' not found in the registry.")
+            logger.error("Tool '%s' not found in the registry.", tool_name)
             raise ToolSelectorError(f"Tool '{tool_name}' not found in the registry.")
 
         # Remove the tool
         del self.tool_registry[tool_name]
-        logger.info(f"Tool '{tool_name}' removed from the registry.")
+        logger.info("Tool '%s' removed from the registry.", tool_name)
 
     def list_tools(self) -> Dict[str, Any]:
         """
@@ -99,5 +94,5 @@ class ToolSelector:
         Returns:
             Dict[str, Any]: A dictionary containing all tools and their actions.
         """
-        logger.info(f"Listing all tools in the registry: {self.tool_registry}")
+        logger.debug("Listing %d tools in the registry", len(self.tool_registry))
         return self.tool_registry.copy()
\ No newline at end of file
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.circuit_breaker import Bulkhead, BulkheadFullError
+
+def test_burst_over_the_cap_waits_for_a_slot():
+    bulkhead = Bulkhead("tool", max_concurrent=2, max_wait=1.0)
+    errors = []
+
+    def call():
+        try:
+            bulkhead.acquire()
+        except BulkheadFullError as e:
+            errors.append(e)
+            return
+        time.sleep(0.02)
+        bulkhead.release()
+
+    threads = [threading.Thread(target=call) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert bulkhead.stats()["active"] == 0
+
+def test_async_burst_over_the_cap_waits_for_a_slot():
+    bulkhead = Bulkhead("tool", max_concurrent=2, max_wait=1.0)
+
+    async def call():
+        await bulkhead.acquire_async()
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            bulkhead.release()
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(20)))
+
+    asyncio.run(main())
+    assert bulkhead.stats() == {"active": 0, "max_concurrent": 2, "rejected": 0}
+
+def test_call_is_rejected_after_max_wait():
+    bulkhead = Bulkhead("tool", max_concurrent=1, max_wait=0.05)
+    bulkhead.acquire()
+
+    started = time.monotonic()
+    with pytest.raises(BulkheadFullError):
+        asyncio.run(bulkhead.acquire_async())
+    with pytest.raises(BulkheadFullError):
+        bulkhead.acquire()
+
+    assert time.monotonic() - started >= 0.1
+    assert bulkhead.stats()["rejected"] == 2
@@ -0,0 +1,57 @@
+import asyncio
+
+from core.orchestrator import Orchestrator, AsyncOrchestrator
+
+PLAN = [
+    {"id": "find", "tool": "zomato", "action": "search", "params": {"query": "pizza"}},
+    {"tool": "zomato", "action": "order", "params": {"restaurant_id": 123, "items": {"margherita": 1}},
+     "depends_on": ["find"]}
+]
+
+class FakeZomato:
+    def __init__(self):
+        self.calls = []
+
+    def search(self, params):
+        self.calls.append("search")
+        return {"restaurants": [{"id": 123}]}
+
+    def create_order(self, restaurant_id, items):
+        self.calls.append("order")
+        return {"order_id": "order_1", "restaurant_id": restaurant_id, "items": items}
+
+class FakeAsyncZomato(FakeZomato):
+    async def search(self, params):
+        return FakeZomato.search(self, params)
+
+    async def create_order(self, restaurant_id, items):
+        return FakeZomato.create_order(self, restaurant_id, items)
+
+def test_dependent_order_step_runs_after_search():
+    orchestrator = Orchestrator()
+    orchestrator.zomato_api = FakeZomato()
+
+    results = orchestrator.execute_subtasks(PLAN)["results"]
+
+    assert orchestrator.zomato_api.calls == ["search", "order"]
+    assert results[1]["status"] == "success"
+    assert results[1]["data"]["items"] == {"margherita": 1}
+
+def test_async_dependent_order_step_runs_after_search():
+    orchestrator = AsyncOrchestrator()
+    orchestrator.zomato_api = FakeAsyncZomato()
+
+    results = asyncio.run(orchestrator.execute_subtasks(PLAN))["results"]
+
+    assert orchestrator.zomato_api.calls == ["search", "order"]
+    assert results[1]["data"]["restaurant_id"] == 123
+
+def test_order_without_items_fails_validation():
+    orchestrator = Orchestrator()
+    orchestrator.zomato_api = FakeZomato()
+    plan = [{"tool": "zomato", "action": "order", "params": {"restaurant_id": 123}}]
+
+    result = orchestrator.execute_subtasks(plan)["results"][0]
+
+    assert "items" in result["error"]
+    assert orchestrator.zomato_api.calls == []
@@ -0,0 +1,56 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from core.plan_cache import PlanCache
+from core.task_planner import TaskPlanner
+
+SEARCH_PLAN = [
+    {"id": "find", "step": "Find restaurants offering pizza", "tool": "zomato",
+     "action": "search", "params": {"query": "pizza"}}
+]
+
+ORDER_PLAN = SEARCH_PLAN + [
+    {"step": "Order 2 margheritas", "tool": "zomato", "action": "order",
+     "params": {"restaurant_id": 42, "items": {"margherita": 2}}, "depends_on": ["find"]}
+]
+
+class FakeCompletions:
+    def __init__(self, plan):
+        self.plan = plan
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=json.dumps(self.plan))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def make_planner(plan, cache):
+    completions = FakeCompletions(plan)
+    planner = TaskPlanner("test-key", plan_cache=cache)
+    planner._async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return planner, completions
+
+def test_near_duplicate_task_is_served_from_cache():
+    cache = PlanCache()
+    planner, completions = make_planner(SEARCH_PLAN, cache)
+
+    first = asyncio.run(planner.decompose_task_async("Find pizza places near me"))
+    second = asyncio.run(planner.decompose_task_async("find pizza places near me please"))
+
+    assert first == second == SEARCH_PLAN
+    assert completions.calls == 1
+    assert cache.stats()["similar_hits"] == 1
+
+def test_order_plan_is_not_served_for_a_similar_task():
+    cache = PlanCache()
+    cache.put("Order 2 margheritas from restaurant 42", ORDER_PLAN)
+
+    assert cache.get("order 2 margheritas from restaurant 42") == ORDER_PLAN
+    assert cache.get("Order 2 margheritas from restaurant 42 now") is None
+
+def test_different_quantities_never_match():
+    cache = PlanCache()
+    cache.put("find 2 pizza places near me", SEARCH_PLAN)
+
+    assert cache.get("find 3 pizza places near me") is None
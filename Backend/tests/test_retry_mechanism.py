@@ -0,0 +1,15 @@
+import itertools
+
+from core.retry_mechanism import RetryConfig
+
+def test_explicit_backoff_is_honoured():
+    config = RetryConfig(delay=1, backoff=2, max_delay=30)
+
+    assert not config.decorrelated
+    assert list(itertools.islice(config.delays(), 4)) == [1, 2, 4, 8]
+
+def test_decorrelated_by_default():
+    config = RetryConfig(delay=1, max_delay=30)
+
+    assert config.decorrelated
+    assert all(1 <= delay <= 30 for delay in itertools.islice(config.delays(), 10))
@@ -0,0 +1,23 @@
+import json
+from types import SimpleNamespace
+
+from core.task_planner import TaskPlanner
+
+PLAN = [{"step": "Find restaurants offering pizza", "tool": "zomato", "action": "search", "params": {"query": "pizza"}}]
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=json.dumps(PLAN))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def test_sync_planner_uses_the_v1_client():
+    completions = FakeCompletions()
+    planner = TaskPlanner("test-key")
+    planner._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    assert planner.decompose_task("Find pizza places near me") == PLAN
+    assert completions.calls == 1
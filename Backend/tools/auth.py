@@ -1,17 +1,19 @@
 import os
+import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import jwt
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 
-# Set up logging for debugging and monitoring
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+from core.metrics import timed
+from core.revocation_store import Revocation, RevocationStore, create_revocation_store_from_env
+
 logger = logging.getLogger("auth")
 
 # OAuth2 scheme to handle token extraction from the Authorization header
@@ -21,11 +23,159 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 SECRET_KEY = os.getenv("SECRET_KEY", "your-production-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60  # Token expiry in minutes
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))  # Verified tokens kept in memory
 
 class AuthError(Exception):
     """Custom exception class for authentication-related errors."""
     pass
 
+def token_digest(token: str) -> str:
+    """Returns the key under which a token is cached or revoked (raw tokens are never stored)."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+class TokenCache:
+    """
+    Thread-safe LRU cache of verified token payloads, keyed by token digest.
+    Entries expire at the token's own `exp`. Revocations are kept until the revoked
+    tokens would have expired anyway and are checked on every lookup.
+    State is per process; revocations reach other workers through the shared
+    RevocationStore (see `start_revocation_sync`), which replays them here.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        """
+        Args:
+            max_entries (int): Maximum verified tokens kept; least recently used are evicted first.
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._revoked_tokens: Dict[str, float] = {}  # digest -> exp
+        self._revoked_users: Dict[str, Tuple[float, float]] = {}  # email -> (revoked_at, expires)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached payload, or None if the token is unknown or expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            exp, payload = entry
+            if exp <= now:
+                del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return dict(payload)
+
+    def put(self, digest: str, payload: Dict[str, Any]):
+        """
+        Caches a verified payload until its `exp` claim.
+        """
+        exp = payload.get("exp")
+        if exp is None:
+            return  # Tokens without expiry are always verified in full
+        with self._lock:
+            self._entries[digest] = (float(exp), dict(payload))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, digest: str, payload: Dict[str, Any]) -> bool:
+        """
+        Checks the token and its user against the revocation lists.
+        """
+        with self._lock:
+            if digest in self._revoked_tokens:
+                return True
+            revoked = self._revoked_users.get(payload.get("email"))
+            # Tokens without an issue time predate per-user revocation support
+            return revoked is not None and payload.get("iat", 0) <= revoked[0]
+
+    def revoke_token(self, digest: str, exp: float):
+        """
+        Revokes a single token until its expiry.
+        """
+        with self._lock:
+            self._entries.pop(digest, None)
+            self._revoked_tokens[digest] = exp
+            self._purge_revocations()
+
+    def revoke_user(self, email: str, revoked_at: float, expires_at: float):
+        """
+        Revokes every token issued to `email` up to `revoked_at`, remembering it until `expires_at`.
+        """
+        with self._lock:
+            current = self._revoked_users.get(email)
+            if current is not None and current[0] >= revoked_at:
+                return  # A later revocation already covers this one
+            self._revoked_users[email] = (revoked_at, expires_at)
+            for digest in [d for d, (_, p) in self._entries.items() if p.get("email") == email]:
+                del self._entries[digest]
+            self._purge_revocations()
+
+    def _purge_revocations(self):
+        # Called with the lock held; drops revocations that outlived the tokens they cover
+        now = time.time()
+        for digest in [d for d, exp in self._revoked_tokens.items() if exp <= now]:
+            del self._revoked_tokens[digest]
+        for email in [e for e, (_, expires) in self._revoked_users.items() if expires <= now]:
+            del self._revoked_users[email]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "revoked_tokens": len(self._revoked_tokens),
+                "revoked_users": len(self._revoked_users)
+            }
+
+    def apply(self, revocation: Revocation):
+        """Applies a revocation read from the shared RevocationStore."""
+        kind, key, revoked_at, expires_at = revocation
+        if kind == "token":
+            self.revoke_token(key, expires_at)
+        elif kind == "user":
+            self.revoke_user(key, revoked_at, expires_at)
+
+# Process-wide cache used by Auth
+token_cache = TokenCache()
+
+_revocation_store: Optional[RevocationStore] = None
+
+def start_revocation_sync():
+    """
+    Opens the shared revocation store (if the user store is SQLite) and starts replaying
+    revocations made by other workers into this process's token cache.
+    """
+    global _revocation_store
+    if _revocation_store is None:
+        _revocation_store = create_revocation_store_from_env()
+        if _revocation_store is not None:
+            _revocation_store.start(token_cache.apply)
+
+def stop_revocation_sync():
+    """Stops polling and closes the shared revocation store."""
+    global _revocation_store
+    if _revocation_store is not None:
+        _revocation_store.close()
+        _revocation_store = None
+
+def _share_revocation(revocation: Revocation):
+    if _revocation_store is not None:
+        _revocation_store.append(revocation)
+
+# Longest lifetime of any token we issue; bounds how long user revocations are kept
+MAX_TOKEN_LIFETIME_SECONDS = float(os.getenv("MAX_TOKEN_LIFETIME_SECONDS", str(7 * 24 * 3600)))
+
 class Auth:
     """
     A class to handle user authentication, including token generation and verification.
@@ -42,42 +192,83 @@ class Auth:
         Returns:
             str: A signed JWT access token.
         """
-        logger.info(f"Creating access token for payload: {data}")
+        logger.debug("Creating access token for user %s", data.get("user_id") or data.get("email"))
         to_encode = data.copy()
-        expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-        to_encode.update({"exp": expire})
+        now = datetime.utcnow()
+        expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+        # "iat" keeps sub-second precision so tokens issued right after a user revocation stay valid
+        to_encode.update({"exp": expire, "iat": time.time()})
         try:
             token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
             logger.info("Access token successfully created.")
             return token
         except Exception as e:
-            logger.error(f"Error creating access token: {e}")
+            logger.error("Error creating access token: %s", e)
             raise AuthError(f"Failed to create access token: {e}")
 
     @staticmethod
+    @timed("verify_access_token")
     def verify_access_token(token: str) -> Dict[str, str]:
         """
         Verifies and decodes a JWT access token.
+        Tokens verified before are served from the token cache until they expire.
         Args:
             token (str): The JWT access token to verify.
 
         Returns:
             Dict[str, str]: The decoded payload from the token.
 
+        Raises:
+            HTTPException: If the token is invalid, expired or revoked.
+        """
+        digest = token_digest(token)
+        payload = token_cache.get(digest)
+        if payload is None:
+            logger.debug("Verifying access token.")
+            try:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            except jwt.ExpiredSignatureError:
+                logger.error("Token has expired.")
+                raise HTTPException(status_code=401, detail="Token has expired.")
+            except jwt.InvalidTokenError:
+                logger.error("Invalid token.")
+                raise HTTPException(status_code=401, detail="Invalid token.")
+            token_cache.put(digest, payload)
+            logger.debug("Access token successfully verified.")
+
+        if token_cache.is_revoked(digest, payload):
+            logger.warning("Revoked token presented.")
+            raise HTTPException(status_code=401, detail="Token has been revoked.")
+        return payload
+
+    @staticmethod
+    def revoke_token(token: str):
+        """
+        Revokes a single access token (e.g. on logout).
+        Args:
+            token (str): The JWT access token to revoke.
+
         Raises:
             HTTPException: If the token is invalid or expired.
         """
-        logger.info("Verifying access token.")
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            logger.info("Access token successfully verified.")
-            return payload
-        except jwt.ExpiredSignatureError:
-            logger.error("Token has expired.")
-            raise HTTPException(status_code=401, detail="Token has expired.")
-        except jwt.InvalidTokenError:
-            logger.error("Invalid token.")
-            raise HTTPException(status_code=401, detail="Invalid token.")
+        payload = Auth.verify_access_token(token)
+        digest = token_digest(token)
+        expires_at = float(payload.get("exp", time.time() + MAX_TOKEN_LIFETIME_SECONDS))
+        token_cache.revoke_token(digest, expires_at)
+        _share_revocation(("token", digest, time.time(), expires_at))
+        logger.info("Access token revoked.")
+
+    @staticmethod
+    def revoke_user_tokens(email: str):
+        """
+        Revokes every access token issued to a user so far.
+        Args:
+            email (str): The user whose tokens should be invalidated.
+        """
+        now = time.time()
+        token_cache.revoke_user(email, now, now + MAX_TOKEN_LIFETIME_SECONDS)
+        _share_revocation(("user", email, now, now + MAX_TOKEN_LIFETIME_SECONDS))
+        logger.info("All access tokens revoked for user: %s", email)
 
     @staticmethod
     def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, str]:
@@ -92,9 +283,9 @@ class Auth:
         Raises:
             HTTPException: If the token is invalid or expired.
         """
-        logger.info("Getting current user from access token.")
+        logger.debug("Getting current user from access token.")
         try:
             return Auth.verify_access_token(token)
         except Exception as e:
-            logger.error(f"Authentication failed: {e}")
+            logger.error("Authentication failed: %s", e)
             raise HTTPException(status_code=401, detail=str(e))
\ No newline at end of file
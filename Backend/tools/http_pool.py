@@ -0,0 +1,305 @@
+"""
+Process-wide HTTP connection pooling shared by all tool wrappers.
+Keeps TCP/TLS connections alive between tool calls instead of opening a new
+connection for every request.
+"""
+import os
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.tracing import get_tracer
+
+logger = logging.getLogger("http_pool")
+
+def _parse_host_limits(raw: str) -> Dict[str, int]:
+    """
+    Parses "host=size,host2=size" into a dict (used for HTTP_HOST_POOL_SIZES).
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        host, _, size = item.partition("=")
+        try:
+            limits[host.strip().lower()] = int(size)
+        except ValueError:
+            logger.warning("Ignoring invalid pool size entry: %s", item)
+    return limits
+
+class _HostStats:
+    """Request counters for a single upstream host."""
+
+    __slots__ = ("requests", "errors", "in_flight", "total_latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+
+class _CountingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that remembers the connection pools it hands out, so connection
+    counts can be read from their public `num_connections` attribute.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._pools_lock = threading.Lock()
+        self._pools = weakref.WeakSet()
+        super().__init__(*args, **kwargs)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        pool = super().get_connection_with_tls_context(request, verify, proxies=proxies, cert=cert)
+        with self._pools_lock:
+            self._pools.add(pool)
+        return pool
+
+    def connections_opened(self) -> int:
+        """Connections opened by the pools this adapter still holds."""
+        with self._pools_lock:
+            pools = list(self._pools)
+        return sum(pool.num_connections for pool in pools)
+
+class HTTPSessionPool:
+    """
+    Shared, keep-alive HTTP connection pools for sync (requests) and async (httpx) callers.
+    Each upstream host gets its own pool whose size can be configured per host.
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: int = 10,
+        host_pool_sizes: Optional[Dict[str, int]] = None,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10.0,
+        keepalive_expiry: float = 30.0,
+        async_max_connections: int = 100,
+        pool_timeout: float = 1.0
+    ):
+        """
+        Args:
+            pool_maxsize (int): Default number of kept-alive connections per host.
+            host_pool_sizes (Optional[Dict[str, int]]): Per-host overrides of pool_maxsize.
+            connect_timeout (float): Seconds to wait for a connection to be established.
+            read_timeout (float): Seconds to wait for response data.
+            keepalive_expiry (float): Seconds an idle async connection is kept open.
+            async_max_connections (int): Maximum concurrent connections per host for async
+                callers, which share one event loop and so need more than the sync pools.
+                The host's pool size still caps how many are kept alive.
+            pool_timeout (float): Seconds an async request waits for a free connection
+                before failing with httpx.PoolTimeout.
+        """
+        self.pool_maxsize = pool_maxsize
+        self.host_pool_sizes = {k.lower(): v for k, v in (host_pool_sizes or {}).items()}
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_expiry = keepalive_expiry
+        self.async_max_connections = async_max_connections
+        self.pool_timeout = pool_timeout
+
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._adapters: Dict[str, _CountingAdapter] = {}
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _HostStats] = {}
+
+    @classmethod
+    def from_env(cls) -> "HTTPSessionPool":
+        """
+        Builds a pool configured from HTTP_POOL_* environment variables.
+        """
+        return cls(
+            pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "10")),
+            host_pool_sizes=_parse_host_limits(os.getenv("HTTP_HOST_POOL_SIZES", "")),
+            connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")),
+            read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "10")),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+            async_max_connections=int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", "100")),
+            pool_timeout=float(os.getenv("HTTP_POOL_TIMEOUT", "1"))
+        )
+
+    def pool_size_for(self, host: str) -> int:
+        return self.host_pool_sizes.get(host.lower(), self.pool_maxsize)
+
+    def _host_stats(self, host: str) -> _HostStats:
+        stats = self._stats.get(host)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(host, _HostStats())
+        return stats
+
+    def _mount_host(self, scheme: str, netloc: str, host: str):
+        """
+        Mounts a dedicated, correctly sized adapter for a host on first use.
+        """
+        prefix = f"{scheme}://{netloc}/"
+        if prefix in self._adapters:
+            return
+        with self._lock:
+            if prefix in self._adapters:
+                return
+            size = self.pool_size_for(host)
+            adapter = _CountingAdapter(pool_connections=1, pool_maxsize=size, pool_block=False)
+            self._session.mount(prefix, adapter)
+            self._adapters[prefix] = adapter
+            logger.debug("Mounted HTTP pool for %s with %d connections", prefix, size)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Issues a request through the shared requests session.
+        A (connect, read) timeout is applied unless the caller passes one.
+        """
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        self._mount_host(parts.scheme, parts.netloc, host)
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout))
+
+        stats = self._host_stats(host)
+        with self._lock:
+            stats.requests += 1
+            stats.in_flight += 1
+        started = time.perf_counter()
+        try:
+            with get_tracer().span(f"HTTP {method}", **{"http.method": method, "http.url": url.split("?")[0]}) as span:
+                response = self._session.request(method, url, **kwargs)
+                if span is not None:
+                    span.set_attribute("http.status_code", response.status_code)
+                return response
+        except requests.RequestException:
+            with self._lock:
+                stats.errors += 1
+            raise
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+                stats.total_latency += time.perf_counter() - started
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        """
+        Returns the shared AsyncClient for the URL's host, creating it on first use.
+        """
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        client = self._async_clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._async_clients.get(key)
+                if client is None:
+                    size = self.pool_size_for(parts.hostname or "")
+                    client = httpx.AsyncClient(
+                        limits=httpx.Limits(
+                            max_connections=max(self.async_max_connections, size),
+                            max_keepalive_connections=size,
+                            keepalive_expiry=self.keepalive_expiry
+                        ),
+                        # Waiting for a free connection gets its own short budget, so a
+                        # saturated pool fails fast instead of queueing for the read timeout
+                        timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout, pool=self.pool_timeout)
+                    )
+                    self._async_clients[key] = client
+        return client
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Issues a request through the host's shared httpx.AsyncClient.
+        """
+        host = urlsplit(url).hostname or ""
+        stats = self._host_stats(host)
+        with self._lock:
+            stats.requests += 1
+            stats.in_flight += 1
+        started = time.perf_counter()
+        try:
+            with get_tracer().span(f"HTTP {method}", **{"http.method": method, "http.url": url.split("?")[0]}) as span:
+                response = await self.async_client(url).request(method, url, **kwargs)
+                if span is not None:
+                    span.set_attribute("http.status_code", response.status_code)
+                return response
+        except httpx.HTTPError:
+            with self._lock:
+                stats.errors += 1
+            raise
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+                stats.total_latency += time.perf_counter() - started
+
+    async def aget(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Returns per-host request counters and connection reuse figures.
+        `connections_opened` counts new TCP connections made by the sync pools;
+        when it stays well below `requests`, keep-alive is doing its job.
+        """
+        with self._lock:
+            hosts = {
+                host: {
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "in_flight": stats.in_flight,
+                    "avg_latency_ms": round(1000 * stats.total_latency / stats.requests, 3) if stats.requests else 0.0
+                }
+                for host, stats in self._stats.items()
+            }
+            adapters = dict(self._adapters)
+            async_hosts = list(self._async_clients)
+
+        for prefix, adapter in adapters.items():
+            host = urlsplit(prefix).hostname or ""
+            entry = hosts.setdefault(host, {})
+            entry["pool_maxsize"] = self.pool_size_for(host)
+            entry["connections_opened"] = entry.get("connections_opened", 0) + adapter.connections_opened()
+
+        return {"hosts": hosts, "async_clients": async_hosts}
+
+    def close(self):
+        """
+        Closes all sync connection pools.
+        """
+        with self._lock:
+            self._session.close()
+            self._adapters.clear()
+            self._session = requests.Session()
+
+    async def aclose(self):
+        """
+        Closes all async clients and sync pools.
+        """
+        with self._lock:
+            clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        for client in clients:
+            await client.aclose()
+        self.close()
+
+_default_pool: Optional[HTTPSessionPool] = None
+_default_pool_lock = threading.Lock()
+
+def http_pool_metrics() -> Optional[Dict[str, Any]]:
+    """
+    Reports the process-wide pool's metrics, or None if nothing has created it yet.
+    """
+    pool = _default_pool
+    return pool.metrics() if pool is not None else None
+
+def get_http_pool() -> HTTPSessionPool:
+    """
+    Returns the process-wide HTTPSessionPool, creating it from the environment on first use.
+    """
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = HTTPSessionPool.from_env()
+    return _default_pool
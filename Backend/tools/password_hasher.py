@@ -0,0 +1,204 @@
+"""
+Off-loop password hashing.
+bcrypt is CPU-bound and deliberately slow, so hashes and verifications run in a
+bounded process pool instead of on the event loop, with admission control to
+shed load during login storms.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.metrics import timed
+
+logger = logging.getLogger("password_hasher")
+
+DEFAULT_BCRYPT_ROUNDS = 12
+
+class HasherOverloadedError(Exception):
+    """Raised when too many hashing jobs are already pending."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# Worker-process side. Contexts are cached per cost so each worker builds them once.
+_contexts: Dict[int, Any] = {}
+
+def _context(rounds: int):
+    context = _contexts.get(rounds)
+    if context is None:
+        from passlib.context import CryptContext
+        context = _contexts[rounds] = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    return context
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, hashed)
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a process pool.
+
+    At most `max_pending` jobs (queued plus running) are admitted; further calls
+    fail fast with HasherOverloadedError so the API can answer 503 instead of
+    letting latency grow without bound.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 64, rounds: int = DEFAULT_BCRYPT_ROUNDS):
+        """
+        Args:
+            max_workers (Optional[int]): Worker processes; defaults to the CPU count.
+            max_pending (int): Maximum jobs queued or running before new ones are rejected.
+            rounds (int): bcrypt cost factor for new hashes. Existing hashes with a
+                different cost are upgraded on the next successful login.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    @classmethod
+    def from_env(cls) -> "PasswordHasher":
+        """
+        Builds a hasher from PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING and BCRYPT_ROUNDS.
+        """
+        workers = os.getenv("PASSWORD_HASH_WORKERS")
+        return cls(
+            max_workers=int(workers) if workers else None,
+            max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64")),
+            rounds=int(os.getenv("BCRYPT_ROUNDS", str(DEFAULT_BCRYPT_ROUNDS)))
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # "spawn" avoids forking a parent that already runs helper threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info("Password hashing pool started with %d workers", self.max_workers)
+            return self._executor
+
+    def _retry_after(self) -> int:
+        # Rough time for the backlog to drain, assuming ~avg latency per job per worker
+        avg = self._latency_total / self.completed if self.completed else 0.25
+        return max(1, int(avg * self.pending / self.max_workers) + 1)
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning("Rejecting password hashing job: %d jobs pending", self.pending)
+            raise HasherOverloadedError("Password hashing capacity exceeded", retry_after=self._retry_after())
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                result = await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # A worker died; shut the broken pool down and replace it so later calls
+                # can succeed. Other jobs on it fail too and may already have swapped it.
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.failed += 1
+                raise
+            except Exception:
+                self.failed += 1
+                raise
+        finally:
+            self.pending -= 1
+
+        # Only successful jobs feed the latency figures that Retry-After is estimated from
+        elapsed = time.perf_counter() - start
+        self.completed += 1
+        self._latency_total += elapsed
+        self._latency_max = max(self._latency_max, elapsed)
+        return result
+
+    @timed("password_hash")
+    async def hash(self, password: str) -> str:
+        """
+        Hashes a password for storing.
+        Raises:
+            HasherOverloadedError: If the pool is saturated.
+        """
+        return await self._submit(_hash, password, self.rounds)
+
+    @timed("password_verify")
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verifies a password against a stored hash.
+        Returns:
+            Tuple[bool, Optional[str]]: Whether it matched, and a replacement hash when the
+            stored one uses an outdated cost factor (None otherwise).
+        Raises:
+            HasherOverloadedError: If the pool is saturated.
+        """
+        return await self._submit(_verify_and_update, password, hashed, self.rounds)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Returns queue depth, throughput and latency figures.
+        """
+        return {
+            "workers": self.max_workers,
+            "rounds": self.rounds,
+            "queue_depth": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "avg_latency_ms": round(self._latency_total / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_latency_ms": round(self._latency_max * 1000, 2)
+        }
+
+    def shutdown(self):
+        """
+        Stops the worker processes.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info("Password hashing pool stopped")
+
+_hasher: Optional[PasswordHasher] = None
+
+def get_password_hasher() -> PasswordHasher:
+    """
+    Returns the process-wide PasswordHasher used by the auth routes.
+    """
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher.from_env()
+    return _hasher
+
+def shutdown_password_hasher():
+    """
+    Stops the shared pool; a new one is created on next use.
+    """
+    global _hasher
+    if _hasher is not None:
+        _hasher.shutdown()
+        _hasher = None
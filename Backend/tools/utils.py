@@ -3,11 +3,6 @@ from datetime import datetime, timezone, timedelta
 import json
 from typing import Any, Dict, Optional
 
-# Configure logging for debugging and monitoring
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger("utils")
 
 def get_current_utc_timestamp() -> str:
@@ -17,7 +12,7 @@ def get_current_utc_timestamp() -> str:
         str: Current UTC timestamp.
     """
     current_time = datetime.now(timezone.utc).isoformat()
-    logger.info(f"Current UTC timestamp: {current_time}")
+    logger.debug("Current UTC timestamp: %s", current_time)
     return current_time
 
 def validate_json(data: str) -> Optional[Dict[str, Any]]:
@@ -31,10 +26,10 @@ def validate_json(data: str) -> Optional[Dict[str, Any]]:
     """
     try:
         json_data = json.loads(data)
-        logger.info("JSON string successfully validated and parsed.")
+        logger.debug("JSON string successfully validated and parsed.")
         return json_data
     except json.JSONDecodeError as e:
-        logger.error(f"Invalid JSON string: {data}. Error: {str(e)}")
+        logger.error("Invalid JSON string: %s. Error: %s", data, e)
         return None
 
 def format_response(status: str, message: str, data: Optional[Any] = None) -> Dict[str, Any]:
@@ -53,7 +48,7 @@ def format_response(status: str, message: str, data: Optional[Any] = None) -> Di
         "message": message,
         "data": data or {}
     }
-    logger.info(f"Formatted response: {response}")
+    logger.debug("Formatted %s response", status)
     return response
 
 def time_difference_in_seconds(start_time: str, end_time: str) -> int:
@@ -70,10 +65,10 @@ def time_difference_in_seconds(start_time: str, end_time: str) -> int:
         start = datetime.fromisoformat(start_time.replace("Z", "+00:00"))
         end = datetime.fromisoformat(end_time.replace("Z", "+00:00"))
         difference = (end - start).total_seconds()
-        logger.info(f"Time difference: {difference} seconds (from {start_time} to {end_time})")
+        logger.info("Time difference: %s seconds (from %s to %s)", difference, start_time, end_time)
         return int(difference)
     except Exception as e:
-        logger.error(f"Error calculating time difference: {str(e)}")
+        logger.error("Error calculating time difference: %s", e)
         raise ValueError(f"Invalid timestamps: {start_time}, {end_time}. Error: {str(e)}")
 
 def add_seconds_to_timestamp(timestamp: str, seconds: int) -> str:
@@ -90,10 +85,10 @@ def add_seconds_to_timestamp(timestamp: str, seconds: int) -> str:
         time_obj = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
         updated_time = time_obj + timedelta(seconds=seconds)
         updated_time_str = updated_time.isoformat()
-        logger.info(f"Timestamp {timestamp} updated by {seconds} seconds to {updated_time_str}")
+        logger.info("Timestamp %s updated by %s seconds to %s", timestamp, seconds, updated_time_str)
         return updated_time_str
     except Exception as e:
-        logger.error(f"Error adding seconds to timestamp: {timestamp}. Error: {str(e)}")
+        logger.error("Error adding seconds to timestamp: %s. Error: %s", timestamp, e)
         raise ValueError(f"Invalid timestamp: {timestamp}. Error: {str(e)}")
 
 def parse_tool_response(tool: str, action: str, response: Any) -> Dict[str, Any]:
@@ -114,10 +109,10 @@ def parse_tool_response(tool: str, action: str, response: Any) -> Dict[str, Any]
             "status": "success",
             "data": response
         }
-        logger.info(f"Tool response parsed successfully for {tool}/{action}")
+        logger.debug("Tool response parsed successfully for %s/%s", tool, action)
         return formatted_response
     except Exception as e:
-        logger.error(f"Error parsing tool response: {str(e)}")
+        logger.error("Error parsing tool response: %s", e)
         return {
             "tool": tool,
             "action": action,
@@ -1,17 +1,110 @@
+import os
 import logging
+import threading
 import requests
-from typing import Dict, Any
+import httpx
+from typing import Dict, Any, Optional, Hashable
+
+from tools.cache import TTLCache
+from tools.http_pool import HTTPSessionPool, get_http_pool
 
-# Configure logging for monitoring
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger("zomato_wrapper")
 
 class ZomatoAPIError(Exception):
     """Custom exception class for Zomato API errors."""
-    pass
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        """
+        Args:
+            message (str): Error description.
+            status_code (Optional[int]): HTTP status of the failed response; None for transport errors.
+            retry_after (Optional[float]): Seconds the upstream asked us to wait (Retry-After header).
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def _api_error(message: str, error: Exception) -> ZomatoAPIError:
+    """
+    Builds a ZomatoAPIError carrying the status and Retry-After hint of a failed
+    requests/httpx response, so retry logic can tell transient failures from fatal ones.
+    """
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    retry_after = None
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            pass
+    return ZomatoAPIError(message, status_code=status_code, retry_after=retry_after)
+
+# Per-endpoint TTLs (in seconds) for cached upstream responses
+CACHE_TTLS = {
+    "search": float(os.getenv("ZOMATO_SEARCH_CACHE_TTL", "300")),
+    "restaurant": float(os.getenv("ZOMATO_DETAILS_CACHE_TTL", "3600"))
+}
+
+# Decimal places coordinates are rounded to in cache keys (3 places is roughly 110 m),
+# so searches from nearby locations share one cache entry
+COORDINATE_PRECISION = int(os.getenv("ZOMATO_CACHE_COORD_PRECISION", "3"))
+
+_response_cache: Optional[TTLCache] = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> TTLCache:
+    """
+    Returns the process-wide Zomato response cache, creating it on first use.
+    """
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = TTLCache(
+                    max_bytes=int(os.getenv("ZOMATO_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+                    max_entries=int(os.getenv("ZOMATO_CACHE_MAX_ENTRIES", "10000"))
+                )
+    return _response_cache
+
+def response_cache_stats() -> Optional[Dict[str, Any]]:
+    """
+    Reports the response cache's counters, or None if nothing has created it yet.
+    """
+    cache = _response_cache
+    return cache.stats() if cache is not None else None
+
+def _bucket_coordinate(value: float) -> float:
+    return round(float(value), COORDINATE_PRECISION)
+
+def _search_cache_key(query: str, lat: float, lon: float, count: int) -> Hashable:
+    normalized_query = " ".join(str(query).lower().split())
+    return ("search", normalized_query, _bucket_coordinate(lat), _bucket_coordinate(lon), int(count))
+
+def _details_cache_key(restaurant_id: int) -> Hashable:
+    return ("restaurant", str(restaurant_id))
+
+def _search_args(params: Dict[str, Any]) -> tuple:
+    """
+    Extracts (query, lat, lon, count) from a planner-provided parameter dict.
+    """
+    return (
+        params.get("query", ""),
+        params.get("lat", 0.0),
+        params.get("lon", 0.0),
+        params.get("count", 10)
+    )
+
+def _simulated_order(restaurant_id: int, items: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Builds the simulated order confirmation shared by the sync and async wrappers.
+    """
+    return {
+        "order_id": "order_12345",
+        "restaurant_id": restaurant_id,
+        "items": items,
+        "status": "confirmed",
+        "delivery_time": "30 minutes"
+    }
 
 class ZomatoAPI:
     """
@@ -21,14 +114,22 @@ class ZomatoAPI:
 
     BASE_URL = "https://developers.zomato.com/api/v2.1"  # Update to the correct API endpoint
 
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, http_pool: Optional[HTTPSessionPool] = None,
+                 cache: Optional[TTLCache] = None):
         """
         Initializes the ZomatoAPI wrapper with the API key.
         Args:
             api_key (str): Zomato API Key to authenticate requests.
+            http_pool (Optional[HTTPSessionPool]): Connection pool to send requests through.
+                Defaults to the process-wide pool.
+            cache (Optional[TTLCache]): Response cache for search and details lookups. Any object
+                providing `get(key)` and `set(key, value, ttl)` can be used. Defaults to the
+                process-wide cache.
         """
         self.api_key = api_key or "demo_api_key"  # Use demo key if not provided
         self.headers = {"user-key": self.api_key}
+        self.http = http_pool or get_http_pool()
+        self.cache = cache if cache is not None else get_response_cache()
 
     def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -39,12 +140,7 @@ class ZomatoAPI:
         Returns:
             Dict[str, Any]: Response data containing matched restaurants.
         """
-        query = params.get("query", "")
-        lat = params.get("lat", 0.0)
-        lon = params.get("lon", 0.0)
-        count = params.get("count", 10)
-        
-        return self.search_restaurants(query, lat, lon, count)
+        return self.search_restaurants(*_search_args(params))
 
     def search_restaurants(self, query: str, lat: float, lon: float, count: int = 10) -> Dict[str, Any]:
         """
@@ -68,16 +164,23 @@ class ZomatoAPI:
             "lon": lon,
             "count": count
         }
+        cache_key = _search_cache_key(query, lat, lon, count)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Cache hit for restaurant search %s", cache_key)
+            return cached
         try:
-            logger.info(f"Searching for restaurants with query '{query}' at location ({lat}, {lon}).")
-            response = requests.get(endpoint, headers=self.headers, params=params)
+            logger.info("Searching for restaurants with query '%s' at location (%s, %s).", query, lat, lon)
+            response = self.http.get(endpoint, headers=self.headers, params=params)
             response.raise_for_status()
-            logger.info("Successfully fetched restaurant search results.")
-            return response.json()
+            logger.debug("Successfully fetched restaurant search results.")
+            data = response.json()
+            self.cache.set(cache_key, data, ttl=CACHE_TTLS["search"])
+            return data
         except requests.RequestException as e:
             error_msg = f"Failed to fetch restaurants: {str(e)}"
             logger.error(error_msg)
-            raise ZomatoAPIError(error_msg)
+            raise _api_error(error_msg, e) from e
 
     def get_restaurant_details(self, restaurant_id: int) -> Dict[str, Any]:
         """
@@ -93,16 +196,23 @@ class ZomatoAPI:
         """
         endpoint = f"{self.BASE_URL}/restaurant"
         params = {"res_id": restaurant_id}
+        cache_key = _details_cache_key(restaurant_id)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Cache hit for restaurant details %s", restaurant_id)
+            return cached
         try:
-            logger.info(f"Fetching restaurant details for ID: {restaurant_id}")
-            response = requests.get(endpoint, headers=self.headers, params=params)
+            logger.info("Fetching restaurant details for ID: %s", restaurant_id)
+            response = self.http.get(endpoint, headers=self.headers, params=params)
             response.raise_for_status()
-            logger.info("Successfully fetched restaurant details.")
-            return response.json()
+            logger.debug("Successfully fetched restaurant details.")
+            data = response.json()
+            self.cache.set(cache_key, data, ttl=CACHE_TTLS["restaurant"])
+            return data
         except requests.RequestException as e:
             error_msg = f"Failed to fetch restaurant details: {str(e)}"
             logger.error(error_msg)
-            raise ZomatoAPIError(error_msg)
+            raise _api_error(error_msg, e) from e
 
     def create_order(self, restaurant_id: int, items: Dict[str, int]) -> Dict[str, Any]:
         """
@@ -118,21 +228,138 @@ class ZomatoAPI:
         Raises:
             ZomatoAPIError: If there is an issue in processing the order.
         """
-        logger.info(f"Creating order for restaurant ID {restaurant_id} with items: {items}")
+        logger.info("Creating order for restaurant ID %s with items: %s", restaurant_id, items)
 
         # In real implementations, you would replace this with actual API integration.
         try:
             # Simulated response for demonstration purposes
-            simulated_response = {
-                "order_id": "order_12345",
-                "restaurant_id": restaurant_id,
-                "items": items,
-                "status": "confirmed",
-                "delivery_time": "30 minutes"
-            }
+            simulated_response = _simulated_order(restaurant_id, items)
             logger.info("Order created successfully.")
             return simulated_response
         except Exception as e:
             error_msg = f"Failed to simulate order creation: {str(e)}"
             logger.error(error_msg)
-            raise ZomatoAPIError(error_msg)
\ No newline at end of file
+            raise ZomatoAPIError(error_msg)
+
+class AsyncZomatoAPI:
+    """
+    Non-blocking counterpart of ZomatoAPI built on the shared httpx connection pools.
+    Safe to share across concurrent tasks running on the same event loop.
+    """
+
+    BASE_URL = ZomatoAPI.BASE_URL
+
+    def __init__(self, api_key: str = None, http_pool: Optional[HTTPSessionPool] = None,
+                 cache: Optional[TTLCache] = None):
+        """
+        Initializes the async ZomatoAPI wrapper.
+        Args:
+            api_key (str): Zomato API Key to authenticate requests.
+            http_pool (Optional[HTTPSessionPool]): Connection pool to send requests through.
+                Defaults to the process-wide pool.
+            cache (Optional[TTLCache]): Response cache for search and details lookups. Any object
+                providing `get(key)` and `set(key, value, ttl)` can be used. Defaults to the
+                process-wide cache.
+        """
+        self.api_key = api_key or "demo_api_key"  # Use demo key if not provided
+        self.headers = {"user-key": self.api_key}
+        self.http = http_pool or get_http_pool()
+        self.cache = cache if cache is not None else get_response_cache()
+
+    async def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Searches for restaurants based on parameters.
+        Args:
+            params (Dict[str, Any]): Search parameters (query, location, etc.).
+
+        Returns:
+            Dict[str, Any]: Response data containing matched restaurants.
+        """
+        return await self.search_restaurants(*_search_args(params))
+
+    async def search_restaurants(self, query: str, lat: float, lon: float, count: int = 10) -> Dict[str, Any]:
+        """
+        Searches for restaurants based on a query string and location coordinates.
+        Args:
+            query (str): Search query (e.g., "pizza").
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            count (int): Number of results to return.
+
+        Returns:
+            Dict[str, Any]: Response data containing matched restaurants.
+
+        Raises:
+            ZomatoAPIError: If the API response indicates an error.
+        """
+        endpoint = f"{self.BASE_URL}/search"
+        params = {
+            "q": query,
+            "lat": lat,
+            "lon": lon,
+            "count": count
+        }
+        cache_key = _search_cache_key(query, lat, lon, count)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Cache hit for restaurant search %s", cache_key)
+            return cached
+        try:
+            logger.info("Searching for restaurants with query '%s' at location (%s, %s).", query, lat, lon)
+            response = await self.http.aget(endpoint, headers=self.headers, params=params)
+            response.raise_for_status()
+            logger.debug("Successfully fetched restaurant search results.")
+            data = response.json()
+            self.cache.set(cache_key, data, ttl=CACHE_TTLS["search"])
+            return data
+        except httpx.HTTPError as e:
+            error_msg = f"Failed to fetch restaurants: {str(e)}"
+            logger.error(error_msg)
+            raise _api_error(error_msg, e) from e
+
+    async def get_restaurant_details(self, restaurant_id: int) -> Dict[str, Any]:
+        """
+        Retrieves details for a specific restaurant.
+        Args:
+            restaurant_id (int): ID of the restaurant to retrieve details for.
+
+        Returns:
+            Dict[str, Any]: Response data containing restaurant details.
+
+        Raises:
+            ZomatoAPIError: If the API response indicates an error.
+        """
+        endpoint = f"{self.BASE_URL}/restaurant"
+        params = {"res_id": restaurant_id}
+        cache_key = _details_cache_key(restaurant_id)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Cache hit for restaurant details %s", restaurant_id)
+            return cached
+        try:
+            logger.info("Fetching restaurant details for ID: %s", restaurant_id)
+            response = await self.http.aget(endpoint, headers=self.headers, params=params)
+            response.raise_for_status()
+            logger.debug("Successfully fetched restaurant details.")
+            data = response.json()
+            self.cache.set(cache_key, data, ttl=CACHE_TTLS["restaurant"])
+            return data
+        except httpx.HTTPError as e:
+            error_msg = f"Failed to fetch restaurant details: {str(e)}"
+            logger.error(error_msg)
+            raise _api_error(error_msg, e) from e
+
+    async def create_order(self, restaurant_id: int, items: Dict[str, int]) -> Dict[str, Any]:
+        """
+        Simulates creating an order with Zomato, mirroring ZomatoAPI.create_order.
+        Args:
+            restaurant_id (int): ID of the restaurant where the order is being placed.
+            items (Dict[str, int]): A dictionary of item IDs and their quantities.
+
+        Returns:
+            Dict[str, Any]: Response data simulating order confirmation.
+        """
+        logger.info("Creating order for restaurant ID %s with items: %s", restaurant_id, items)
+        simulated_response = _simulated_order(restaurant_id, items)
+        logger.info("Order created successfully.")
+        return simulated_response